@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+# Where the files of an app are read from. The tests read them through
+# pathlib-like objects: plain Paths for an app on disk, or SourcePaths for an
+# app read straight from a store of files without extracting it first: the
+# object database of a (possibly bare) git repository at a given commit, or an
+# archive of the app.
+
+import fnmatch
+import io
+import subprocess
+import sys
+import tarfile
+import threading
+import weakref
+import zipfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from pathlib import Path, PurePosixPath
+from typing import IO, Any, BinaryIO, NamedTuple
+
+
+class Entry(NamedTuple):
+    # "file", "dir", "symlink" or "other" (e.g. git submodules)
+    kind: str
+    # Identifies the content within the store
+    key: str
+
+
+class SourceStat(NamedTuple):
+    st_size: int
+
+
+class Store(ABC):
+    """Read-only tree of files, c.f. GitStore and ArchiveStore"""
+
+    # Shown in place of the path of the app
+    name: str = ""
+    # Commit the files come from, if any
+    commit: str | None = None
+    root: Entry
+
+    @abstractmethod
+    def children(self, entry: Entry) -> dict[str, Entry]:
+        """The entries of a directory, by name"""
+
+    @abstractmethod
+    def read(self, entry: Entry) -> bytes:
+        """The content of a file"""
+
+    def size(self, entry: Entry) -> int:
+        return len(self.read(entry))
+
+
+class SourcePath:
+    """The subset of pathlib.Path used by the tests, for the files of a Store"""
+
+    def __init__(self, store: Store, parts: tuple[str, ...] = ()) -> None:
+        self.store = store
+        self.parts = parts
+
+    def __truediv__(self, other: str) -> "SourcePath":
+        return SourcePath(self.store, self.parts + PurePosixPath(other).parts)
+
+    def __str__(self) -> str:
+        return "/".join([self.store.name, *self.parts])
+
+    def __repr__(self) -> str:
+        return f"SourcePath({str(self)!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, SourcePath)
+            and self.store is other.store
+            and self.parts == other.parts
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.parts)
+
+    def __lt__(self, other: "SourcePath") -> bool:
+        return self.parts < other.parts
+
+    @property
+    def name(self) -> str:
+        return self.parts[-1] if self.parts else ""
+
+    @property
+    def suffix(self) -> str:
+        return PurePosixPath(self.name).suffix
+
+    @property
+    def parent(self) -> "SourcePath":
+        return SourcePath(self.store, self.parts[:-1])
+
+    def relative_to(self, other: "SourcePath") -> PurePosixPath:
+        if self.parts[: len(other.parts)] != other.parts:
+            msg = f"{self} is not in the subpath of {other}"
+            raise ValueError(msg)
+        return PurePosixPath(*self.parts[len(other.parts) :])
+
+    def entry(self) -> Entry | None:
+        entry: Entry | None = self.store.root
+        for part in self.parts:
+            if entry is None or entry.kind != "dir":
+                return None
+            entry = self.store.children(entry).get(part)
+        return entry
+
+    def exists(self) -> bool:
+        return self.entry() is not None
+
+    def is_file(self) -> bool:
+        entry = self.entry()
+        return entry is not None and entry.kind == "file"
+
+    def is_dir(self) -> bool:
+        entry = self.entry()
+        return entry is not None and entry.kind == "dir"
+
+    def is_symlink(self) -> bool:
+        entry = self.entry()
+        return entry is not None and entry.kind == "symlink"
+
+    def read_bytes(self) -> bytes:
+        entry = self.entry()
+        if entry is None:
+            raise FileNotFoundError(str(self))
+        if entry.kind == "dir":
+            raise IsADirectoryError(str(self))
+        return self.store.read(entry)
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        return self.read_bytes().decode(encoding)
+
+    def stat(self) -> SourceStat:
+        entry = self.entry()
+        if entry is None:
+            raise FileNotFoundError(str(self))
+        return SourceStat(st_size=self.store.size(entry))
+
+    def open(self, mode: str = "r") -> IO[Any]:
+        if "b" in mode:
+            return io.BytesIO(self.read_bytes())
+        return io.StringIO(self.read_text())
+
+    def iterdir(self) -> Iterator["SourcePath"]:
+        entry = self.entry()
+        if entry is None:
+            raise FileNotFoundError(str(self))
+        if entry.kind != "dir":
+            raise NotADirectoryError(str(self))
+        for name in self.store.children(entry):
+            yield self / name
+
+    def walk(self) -> Iterator["SourcePath"]:
+        """All the paths below this one, symlinks to directories not being followed"""
+        for path in self.iterdir():
+            yield path
+            if path.is_dir():
+                yield from path.walk()
+
+    def glob(self, pattern: str) -> Iterator["SourcePath"]:
+        pattern_parts = PurePosixPath(pattern).parts
+        for path in self.walk():
+            if glob_match(path.parts[len(self.parts) :], pattern_parts):
+                yield path
+
+    def rglob(self, pattern: str) -> Iterator["SourcePath"]:
+        return self.glob(f"**/{pattern}")
+
+
+def glob_match(parts: tuple[str, ...], pattern: tuple[str, ...]) -> bool:
+    if not pattern:
+        return not parts
+    if pattern[0] == "**":
+        return glob_match(parts, pattern[1:]) or (bool(parts) and glob_match(parts[1:], pattern))
+    return (
+        bool(parts)
+        and fnmatch.fnmatchcase(parts[0], pattern[0])
+        and glob_match(parts[1:], pattern[1:])
+    )
+
+
+AppPath = Path | SourcePath
+
+
+def text_files(root: AppPath) -> Iterator[AppPath]:
+    """The files below root, like grep -r: symlinks are not followed, and .git is skipped"""
+    children: list[AppPath] = sorted(root.iterdir(), key=lambda path: path.name)
+    for path in children:
+        if path.is_file() and not path.is_symlink():
+            yield path
+    for path in children:
+        if path.is_dir() and not path.is_symlink() and path.name != ".git":
+            yield from text_files(path)
+
+
+def relative_path(path: AppPath, root: AppPath) -> str:
+    """path relative to root, which must be of the same kind"""
+    if isinstance(path, SourcePath) and isinstance(root, SourcePath):
+        return path.relative_to(root).as_posix()
+    assert isinstance(path, Path)
+    assert isinstance(root, Path)
+    return path.relative_to(root).as_posix()
+
+
+GIT_KINDS = {"40000": "dir", "100644": "file", "100755": "file", "120000": "symlink"}
+
+
+class GitStore(Store):
+    """
+    The files of a commit of a git repository, which may be bare. All the objects are
+    read through a single 'git cat-file --batch' process.
+    """
+
+    def __init__(self, repo: Path, ref: str) -> None:
+        self.name = f"{repo}@{ref}"
+        self.process = subprocess.Popen(
+            ["git", "-C", str(repo), "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        weakref.finalize(self, self.close_process, self.process)
+        # The tests may run in parallel threads
+        self.lock = threading.Lock()
+        self.trees: dict[str, dict[str, Entry]] = {}
+        self.blobs: dict[str, bytes] = {}
+
+        self.repo = repo
+        commit = self.cat(f"{ref}^{{commit}}")
+        if commit is None:
+            msg = f"{ref} is not a commit of the git repository {repo}"
+            raise RuntimeError(msg)
+        self.commit = commit[0]
+        # Length of the raw object ids (sha1 or sha256), which the trees contain
+        self.id_length = len(commit[0]) // 2
+        self.root = self.commit_root(ref)
+
+    def commit_root(self, ref: str) -> Entry:
+        """The root directory of a commit, which may be another one than the store's"""
+        tree = self.cat(f"{ref}^{{tree}}")
+        if tree is None:
+            msg = f"{ref} is not a commit of the git repository {self.repo}"
+            raise RuntimeError(msg)
+        self.trees[tree[0]] = self.parse_tree(tree[1])
+        return Entry("dir", tree[0])
+
+    @staticmethod
+    def close_process(process: subprocess.Popen[bytes]) -> None:
+        assert process.stdin is not None
+        process.stdin.close()
+        process.wait()
+
+    def cat(self, spec: str) -> tuple[str, bytes] | None:
+        """The id and content of an object, None if it doesn't exist"""
+        assert self.process.stdin is not None
+        assert self.process.stdout is not None
+        with self.lock:
+            self.process.stdin.write(f"{spec}\n".encode())
+            self.process.stdin.flush()
+            header = self.process.stdout.readline().decode().split()
+            if len(header) != 3:
+                # "<spec> missing" or "<spec> ambiguous"
+                return None
+            object_id, size = header[0], int(header[2])
+            content = self.process.stdout.read(size + 1)[:-1]
+        return object_id, content
+
+    def parse_tree(self, data: bytes) -> dict[str, Entry]:
+        # Entries are '<mode> <name>\0<raw object id>'
+        id_length = self.id_length
+        entries = {}
+        position = 0
+        while position < len(data):
+            space = data.index(b" ", position)
+            nul = data.index(b"\0", space)
+            mode = data[position:space].decode()
+            name = data[space + 1 : nul].decode("utf-8", errors="surrogateescape")
+            object_id = data[nul + 1 : nul + 1 + id_length].hex()
+            entries[name] = Entry(GIT_KINDS.get(mode, "other"), object_id)
+            position = nul + 1 + id_length
+        return entries
+
+    def children(self, entry: Entry) -> dict[str, Entry]:
+        if entry.key not in self.trees:
+            tree = self.cat(entry.key)
+            self.trees[entry.key] = self.parse_tree(tree[1]) if tree else {}
+        return self.trees[entry.key]
+
+    def read(self, entry: Entry) -> bytes:
+        if entry.key not in self.blobs:
+            blob = self.cat(entry.key)
+            self.blobs[entry.key] = blob[1] if blob else b""
+        return self.blobs[entry.key]
+
+
+# Members bigger than this which look binary (e.g. screenshots, or upstream sources
+# stored in the app) are only kept for their size and first bytes
+LARGE_MEMBER_SIZE = 1024 * 1024
+MEMBER_HEADER_SIZE = 8192
+
+
+def peek(file: BinaryIO, size: int) -> bytes:
+    """The first bytes of file, without consuming them"""
+    if isinstance(file, io.BufferedReader):
+        return file.peek(size)[:size]
+    head = file.read(size)
+    file.seek(0)
+    return head
+
+
+def read_member(file: IO[bytes], size: int) -> bytes:
+    content = file.read(MEMBER_HEADER_SIZE)
+    if size > LARGE_MEMBER_SIZE and b"\0" in content:
+        return content
+    return content + file.read()
+
+
+class ArchiveStore(Store):
+    """
+    The files of a .zip or .tar(.gz|.bz2|.xz) archive of an app. A zip archive is read
+    member by member as the tests need them, while a tar archive is read in a single
+    pass such that it can be streamed.
+    """
+
+    def __init__(self, file: BinaryIO, name: str) -> None:
+        self.name = name
+        self.root = Entry("dir", "")
+        self.trees: dict[str, dict[str, Entry]] = {"": {}}
+        self.sizes: dict[str, int] = {}
+        self.contents: dict[str, bytes] = {}
+        self.zip: zipfile.ZipFile | None = None
+        # Members of the zip archive by key, their names possibly starting with ./ or /
+        self.zip_members: dict[str, zipfile.ZipInfo] = {}
+        self.lock = threading.Lock()
+
+        try:
+            if peek(file, 2) == b"PK":
+                self.index_zip(file)
+            else:
+                self.index_tar(file)
+        except (tarfile.TarError, zipfile.BadZipFile, OSError) as e:
+            msg = f"Can't read the archive {name}: {e}"
+            raise RuntimeError(msg) from e
+
+        # The archive may contain the directory of the app rather than its files
+        top = self.trees[""]
+        if len(top) == 1 and next(iter(top.values())).kind == "dir":
+            self.root = next(iter(top.values()))
+
+    def add(self, name: str, kind: str, size: int = 0) -> str | None:
+        """Add a member to the tree, returns its key or None if it's skipped"""
+        parts = PurePosixPath(name.lstrip("/")).parts
+        parts = tuple(part for part in parts if part != ".")
+        if not parts or ".." in parts:
+            return None
+        for depth in range(1, len(parts) + 1):
+            key, parent = "/".join(parts[:depth]), "/".join(parts[: depth - 1])
+            if depth < len(parts) or kind == "dir":
+                self.trees.setdefault(key, {})
+                self.trees[parent][parts[depth - 1]] = Entry("dir", key)
+            else:
+                self.trees[parent][parts[depth - 1]] = Entry(kind, key)
+                self.sizes[key] = size
+        return "/".join(parts)
+
+    def index_zip(self, file: BinaryIO) -> None:
+        # The index of a zip archive is at the end
+        self.zip = zipfile.ZipFile(file if file.seekable() else io.BytesIO(file.read()))
+        for info in self.zip.infolist():
+            if info.is_dir():
+                self.add(info.filename, "dir")
+            elif (info.external_attr >> 16) & 0o170000 == 0o120000:
+                key = self.add(info.filename, "symlink", info.file_size)
+                if key:
+                    self.contents[key] = self.zip.read(info)
+            else:
+                key = self.add(info.filename, "file", info.file_size)
+                if key:
+                    self.zip_members[key] = info
+
+    def index_tar(self, file: BinaryIO) -> None:
+        with tarfile.open(fileobj=file, mode="r|*") as tar:
+            for info in tar:
+                if info.isdir():
+                    self.add(info.name, "dir")
+                elif info.issym():
+                    key = self.add(info.name, "symlink", len(info.linkname))
+                    if key:
+                        self.contents[key] = info.linkname.encode()
+                elif info.isfile():
+                    key = self.add(info.name, "file", info.size)
+                    member = tar.extractfile(info)
+                    if key and member:
+                        self.contents[key] = read_member(member, info.size)
+                else:
+                    self.add(info.name, "other")
+
+    def children(self, entry: Entry) -> dict[str, Entry]:
+        return self.trees.get(entry.key, {})
+
+    def read(self, entry: Entry) -> bytes:
+        member_info = self.zip_members.get(entry.key)
+        if entry.key not in self.contents and self.zip is not None and member_info is not None:
+            with self.lock, self.zip.open(member_info) as member:
+                self.contents[entry.key] = read_member(member, self.sizes[entry.key])
+        return self.contents.get(entry.key, b"")
+
+    def size(self, entry: Entry) -> int:
+        return self.sizes.get(entry.key, 0)
+
+
+def open_app(path: Path, git_ref: str | None = None) -> AppPath:
+    """
+    Where to read the app from: its directory, an archive of it ('-' for stdin), or its
+    git repository at git_ref
+    """
+    if git_ref is not None:
+        return SourcePath(GitStore(path, git_ref))
+    if str(path) == "-":
+        return SourcePath(ArchiveStore(sys.stdin.buffer, "<stdin>"))
+    if path.is_file():
+        file = path.open("rb")
+        store = ArchiveStore(file, str(path))
+        weakref.finalize(store, file.close)
+        return SourcePath(store)
+    return path
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+# Lint many apps (e.g. the whole catalog), possibly split in shards run on
+# different machines: every shard computes the same partition of the apps on
+# its own, and writes the results of its apps to a file. The files of all the
+# shards are then merged into a single report.
+
+import contextlib
+import gc
+import importlib
+import io
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from lib.app_source import open_app
+from lib.lib_package_linter import (
+    add_sink,
+    config_panel_v1_schema,
+    get_app_list,
+    manifest_v2_schema,
+    remove_sink,
+    reset_reports,
+    schema_validator,
+    spdx_licenses,
+    ssl_context,
+    tests_v1_schema,
+)
+from lib.print import _print, set_output_json
+from lib.results_cache import linter_version
+from lib.results_db import ReportRow, Run, connect, store_runs
+from lib.sinks import ResultSink
+
+# Modules imported on first use by the linter (c.f. the 'noqa: PLC0415' imports)
+LAZY_MODULES = [
+    "jsonschema",
+    "lib.nginxparser.nginxparser",
+    "packaging.version",
+    "urllib.request",
+]
+
+# Results of each app, by app key (c.f. app_key)
+Results = dict[str, dict[str, Any]]
+
+
+def app_key(path: Path) -> str:
+    """
+    The key of the results of an app: its path as given rather than its directory name,
+    such that apps in directories of the same name don't clash, and not resolved, such
+    that the shards running on different machines (given the same paths) agree on it
+    """
+    return str(path)
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    """INDEX/COUNT, INDEX starting at 1"""
+    try:
+        index, count = (int(n) for n in shard.split("/"))
+    except ValueError:
+        msg = f"invalid shard {shard}, expected INDEX/COUNT"
+        raise ValueError(msg) from None
+    if not 1 <= index <= count:
+        msg = f"invalid shard {shard}, INDEX should be between 1 and COUNT"
+        raise ValueError(msg)
+    return index, count
+
+
+def load_costs(path: Path) -> dict[str, float]:
+    """How long linting each app took, according to a previous (merged) report"""
+    apps = json.loads(path.read_text())["apps"]
+    return {name: app["elapsed_s"] for name, app in apps.items() if "elapsed_s" in app}
+
+
+def shard_apps(
+    app_paths: list[Path], index: int, count: int, costs: dict[str, float]
+) -> list[Path]:
+    """
+    The apps of shard index out of count. The apps, most expensive first, each go to the
+    least loaded shard so far, such that the shards take about as long as each other.
+    Only depends on the arguments, so that the shards agree on the partition.
+    """
+    # The apps not linted before are assumed to be average
+    default = sum(costs.values()) / len(costs) if costs else 1.0
+
+    def cost(path: Path) -> float:
+        return costs.get(app_key(path), default)
+
+    loads = [0.0] * count
+    shards: list[list[Path]] = [[] for _ in range(count)]
+    for path in sorted(app_paths, key=lambda path: (-cost(path), app_key(path))):
+        lightest = min(range(count), key=lambda i: (loads[i], i))
+        loads[lightest] += cost(path)
+        shards[lightest].append(path)
+    return sorted(shards[index - 1], key=app_key)
+
+
+def warm_up() -> None:
+    """Load what the apps share (the linter, the catalog, the schemas, ...) once and for all"""
+    from tests.test_app import App  # noqa: F401, PLC0415
+    from tests.test_catalog import fetch_catalog  # noqa: PLC0415
+
+    # The modules the tests only import once they need them
+    for module in LAZY_MODULES:
+        importlib.import_module(module)
+
+    # Whatever fails to load is left for the apps to report
+    with contextlib.suppress(Exception, SystemExit):
+        fetch_catalog()
+        get_app_list()
+    for schema in [manifest_v2_schema, tests_v1_schema, config_panel_v1_schema]:
+        with contextlib.suppress(Exception):
+            schema_validator(schema())
+    with contextlib.suppress(Exception):
+        spdx_licenses()
+    ssl_context()
+
+
+def init_worker() -> None:
+    # Nothing is displayed, the reports are collected and sent back instead
+    set_output_json()
+
+
+def worker_pool(jobs: int) -> ProcessPoolExecutor:
+    """
+    Workers forked from this process once warmed up, which start with the warm state,
+    shared copy-on-write
+    """
+    warm_up()
+    # Such that the garbage collector of the workers doesn't write to (and so copy)
+    # the pages of the objects loaded so far
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=init_worker)
+
+
+def failed_result(error: BaseException | str, elapsed_s: float = 0.0) -> dict[str, Any]:
+    """The result of an app the linter failed on"""
+    if isinstance(error, BaseException):
+        error = f"{type(error).__name__}: {error}"
+    return {
+        "id": None,
+        "level": None,
+        "error": error,
+        "elapsed_s": round(elapsed_s, 3),
+        "reports": [],
+    }
+
+
+def lint_app(path: Path) -> dict[str, Any]:
+    from tests.test_app import App  # noqa: PLC0415
+
+    reset_reports()
+    start = time.monotonic()
+    started_at = time.time()
+    sink = ResultSink()
+    add_sink(sink)
+    result: dict[str, Any]
+    try:
+        app = App(open_app(path, None))
+        # The json report of the app isn't needed
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.analyze()
+        result = {"id": app.manifest["id"], "level": app.level(), "commit": app.linted_commit}
+    except (RuntimeError, SystemExit):
+        # The manifest couldn't even be loaded
+        result = {"id": None, "level": None, "commit": None}
+    # A bug of the linter on an app mustn't lose the results of the others
+    except Exception as e:
+        return failed_result(e, time.monotonic() - start)
+    finally:
+        remove_sink(sink)
+    return result | {
+        "time": started_at,
+        "elapsed_s": round(time.monotonic() - start, 3),
+        "reports": sink.reports,
+    }
+
+
+def run(app_paths: list[Path], jobs: int) -> Results:
+    results: Results = {}
+    with worker_pool(jobs) as executor:
+        futures = {app_key(path): executor.submit(lint_app, path) for path in app_paths}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            # e.g. the worker linting the app died
+            except Exception as e:
+                results[key] = failed_result(e)
+    return results
+
+
+def write_results(path: Path, results: Results, shard: tuple[int, int] | None = None) -> None:
+    data: dict[str, Any] = {"linter_version": linter_version(), "apps": results}
+    if shard is not None:
+        data["shard"] = list(shard)
+    path.write_text(json.dumps(data, indent=1, sort_keys=True))
+
+
+def merge(shard_files: list[Path]) -> tuple[Results, list[str]]:
+    """The results of all the shards, and what's wrong with the set of shards, if anything"""
+    shards = [json.loads(path.read_text()) for path in shard_files]
+    problems = []
+
+    versions = {shard["linter_version"] for shard in shards}
+    if len(versions) > 1:
+        problems.append(f"The shards were linted by different linter versions: {sorted(versions)}")
+
+    counts = {shard.get("shard", [1, 1])[1] for shard in shards}
+    if len(counts) > 1:
+        problems.append(f"The shards are out of different numbers of shards: {sorted(counts)}")
+    else:
+        indexes = [shard.get("shard", [1, 1])[0] for shard in shards]
+        count = counts.pop()
+        missing = sorted(set(range(1, count + 1)) - set(indexes))
+        if missing:
+            problems.append(f"Missing shards: {', '.join(f'{i}/{count}' for i in missing)}")
+        duplicated = sorted({i for i in indexes if indexes.count(i) > 1})
+        if duplicated:
+            problems.append(f"Duplicated shards: {', '.join(f'{i}/{count}' for i in duplicated)}")
+
+    results: Results = {}
+    for shard in shards:
+        results |= shard["apps"]
+    return dict(sorted(results.items())), problems
+
+
+def store_results(db_path: Path, results: Results, version: str) -> None:
+    """
+    Append the runs of the apps to the SQLite database at db_path (c.f. results_db) in a
+    single transaction, but the ones of the apps the linter failed on
+    """
+    runs = [
+        (
+            Run(
+                app=app["id"] or key,
+                commit=app.get("commit"),
+                linter_version=version,
+                # Results written before the start of the runs was recorded
+                time=app.get("time", time.time()),
+                duration_s=app["elapsed_s"],
+                level=app["level"],
+            ),
+            [
+                ReportRow(
+                    report.get("suite", ""),
+                    report["test"],
+                    report["type"],
+                    report["message"],
+                    report.get("path"),
+                    report.get("line"),
+                    report.get("elapsed_s"),
+                )
+                for report in app["reports"]
+            ],
+        )
+        for key, app in results.items()
+        if "error" not in app
+    ]
+    with contextlib.closing(connect(db_path)) as db:
+        store_runs(db, runs)
+
+
+def failures(results: Results) -> dict[str, str]:
+    """The apps the linter failed on, with the error it failed with"""
+    return {key: app["error"] for key, app in results.items() if "error" in app}
+
+
+def display_summary(results: Results) -> None:
+    levels: dict[int | None, int] = {}
+    for app in results.values():
+        levels[app["level"]] = levels.get(app["level"], 0) + 1
+    _print(f"{len(results)} apps linted")
+    for level in sorted(levels, key=lambda level: -1 if level is None else level):
+        _print(f"  level {'unknown' if level is None else level}: {levels[level]} apps")
+    total_s = sum(app["elapsed_s"] for app in results.values())
+    _print(f"  {total_s:.0f}s of linting in total")
+    failed = failures(results)
+    if failed:
+        _print(f"The linter failed on {len(failed)} apps:")
+        for key, error in failed.items():
+            _print(f"  {key}: {error}")
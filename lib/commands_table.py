@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Table of the commands ran by the scripts of an app, built once for all the
+# scripts, such that the rules about the consistency between the scripts (what
+# install does, upgrade and restore should do it too, remove should undo it...)
+# are simple lookups and set operations.
+
+import re
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import NamedTuple
+
+# Tokens after which a new command starts
+COMMAND_SEPARATORS = {"&&", "||", "|", ";", "!", "if", "then", "else", "elif", "do", "while"}
+ASSIGNMENT_RE = re.compile(r"^\w+=")
+# Options of the yunohost command itself taking a value, e.g. 'yunohost --output-as json ...'
+YUNOHOST_OPTIONS_WITH_VALUE = {"--output-as", "--timeout"}
+
+
+class Occurence(NamedTuple):
+    script: str
+    line: int  # Number of the line in the script
+    text: str  # The whole line, as parsed
+
+
+def normalized_commands(tokens: list[str]) -> set[str]:
+    """
+    The commands ran by a line, normalized to their name. Helpers are indexed
+    wherever they appear (they may be wrapped, e.g. in ynh_exec_warn_less or
+    $(...)), and yunohost commands along with their subcommands, e.g.
+    'yunohost service add' (also for 'yunohost --quiet service add').
+    """
+    commands = set()
+    command_start = True
+    for i, token in enumerate(tokens):
+        substitution = token.startswith(("$(", "`"))
+        name = token.lstrip("$(`").rstrip(")`")
+        if name == "yunohost":
+            args = tokens[i + 1 :]
+            # The options of the yunohost command itself come before the subcommands
+            while args and args[0].startswith("-"):
+                args = args[2:] if args[0] in YUNOHOST_OPTIONS_WITH_VALUE else args[1:]
+            subcommands = [t for t in args[:2] if not t.startswith("-")]
+            commands.add(" ".join(["yunohost", *subcommands]))
+        elif name.startswith("ynh_") or (
+            (command_start or substitution)
+            and token not in COMMAND_SEPARATORS
+            and not ASSIGNMENT_RE.match(token)
+        ):
+            commands.add(name)
+
+        if token in COMMAND_SEPARATORS or token.endswith(";"):
+            command_start = True
+        elif not ASSIGNMENT_RE.match(token):
+            command_start = False
+    return commands
+
+
+class CommandsTable:
+    def __init__(self) -> None:
+        # Normalized command -> where it's ran
+        self.occurences: dict[str, list[Occurence]] = defaultdict(list)
+
+    def add_script(self, script: str, lines: Iterable[tuple[int, list[str]]]) -> None:
+        for lineno, tokens in lines:
+            text = " ".join(tokens)
+            for command in normalized_commands(tokens):
+                self.occurences[command].append(Occurence(script, lineno, text))
+
+    def scripts(self, command: str) -> set[str]:
+        """The scripts running command"""
+        return {occurence.script for occurence in self.occurences.get(command, [])}
+
+    def lines(self, command: str, script: str) -> list[str]:
+        """The lines of script running command"""
+        return [o.text for o in self.occurences.get(command, []) if o.script == script]
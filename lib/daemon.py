@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Long-running linter process, serving 'lint this path' requests on a unix
+# socket (c.f. lib/daemon_client.py for the protocol). Besides the imports,
+# the nginx grammar, apps.toml, the cached files and the schema validators are
+# loaded once and stay warm from one request to the next.
+#
+# Requests are served one at a time, as the reports are collected in the
+# global tests_reports.
+
+import contextlib
+import io
+import json
+import signal
+import socketserver
+import sys
+from pathlib import Path
+
+from lib.app_source import open_app
+from lib.daemon_client import DAEMON_SOCKET, Request, Response, is_running
+from lib.lib_package_linter import (
+    json_report,
+    report_to_dict,
+    reset_reports,
+    set_budget,
+    set_catalog_repo,
+    set_github_api,
+    set_jobs,
+    set_max_level_check,
+    set_profile,
+    set_stop_on,
+    set_use_tests_cache,
+    tests_reports,
+)
+from lib.print import _print, set_color, set_output_json, set_output_plain
+from lib.results_cache import linter_version
+from tests.test_app import App
+
+
+def lint(request: Request) -> Response:
+    # The client and the daemon must run the same code
+    if request.get("linter_version") != linter_version():
+        return {"error": "The daemon runs another version of the linter"}
+
+    reset_reports()
+    set_budget(None)
+    set_profile(request.get("profile", "full"))
+    set_jobs(request.get("jobs", 1))
+    set_stop_on(request.get("stop_on", []))
+    set_max_level_check(request.get("max_level_check"))
+    set_catalog_repo(request.get("catalog_repo"))
+    set_github_api(request.get("github_api"))
+    set_use_tests_cache(enabled=request.get("cache", False))
+    set_color(enabled=request.get("color", True))
+    if request.get("json", False):
+        set_output_json()
+    else:
+        set_output_plain()
+
+    try:
+        app_path = open_app(Path(request["path"]), request.get("git_ref"))
+    except RuntimeError as e:
+        return {"error": str(e)}
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            exit_code = App(app_path).analyze(since=request.get("since"))
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+
+    return {
+        "exit_code": exit_code,
+        "output": output.getvalue(),
+        "summary": json_report(),
+        "reports": [
+            report_to_dict(report) for reports in tests_reports.values() for _, report in reports
+        ],
+    }
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        # Just checking whether the daemon is running, c.f. is_running()
+        if not line:
+            return
+        try:
+            response = lint(json.loads(line))
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+def serve(socket_path: Path = DAEMON_SOCKET) -> None:
+    if is_running(socket_path):
+        _print(f"A daemon is already listening on {socket_path}")
+        sys.exit(1)
+
+    # Leftover of a daemon that didn't exit cleanly
+    socket_path.unlink(missing_ok=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    with socketserver.UnixStreamServer(str(socket_path), RequestHandler) as server:
+        socket_path.chmod(0o600)
+        _print(f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socket_path.unlink(missing_ok=True)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+# Client side of the daemon (c.f. lib/daemon.py). This only depends on the
+# standard library, such that asking a running daemon to lint an app doesn't
+# pay for importing and initializing the linter.
+
+import json
+import socket
+from pathlib import Path
+from typing import Any
+
+PACKAGE_LINTER_DIR = Path(__file__).resolve().parent.parent
+DAEMON_SOCKET = PACKAGE_LINTER_DIR / ".daemon.sock"
+
+# Requests and responses are a single json document each, the request being
+# terminated by a newline. A request looks like:
+#   {"path": "/abs/path/to/app", "json": false, "profile": "full", "since": null,
+#    "cache": false, "jobs": 1, "linter_version": "<sha>"}
+# and a response like:
+#   {"exit_code": 0, "output": "<what the linter printed>",
+#    "summary": {"success": [...], ...}, "reports": [{"test", "type", "message"}, ...]}
+# or {"error": "<why the request couldn't be served>"}.
+Request = dict[str, Any]
+Response = dict[str, Any]
+
+
+def is_running(socket_path: Path = DAEMON_SOCKET) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def send(request: Request, socket_path: Path = DAEMON_SOCKET) -> Response | None:
+    """Send a request to the daemon, None if no daemon is listening on socket_path"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile("rb") as response:
+                data = response.read()
+    except OSError:
+        return None
+
+    try:
+        return json.loads(data)  # type: ignore[no-any-return]
+    except ValueError:
+        return None
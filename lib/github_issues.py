@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+# Open issues of the apps on GitHub, restricted to the labels the Issues suite
+# looks at. They're fetched for a single app, or prefetched for the whole
+# catalog with a few search queries into a cache shared by the linter processes
+# (c.f. the 'prefetch-issues' command).
+
+import itertools
+import json
+import time
+import urllib.parse
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from lib import lib_package_linter
+from lib.lib_package_linter import PACKAGE_LINTER_DIR, cache_lock, urlopen
+from lib.print import _print
+
+ISSUES_CACHE = PACKAGE_LINTER_DIR / ".issues_cache.json"
+ISSUES_CACHE_TTL_S = 3600
+
+# The labels of the issues the Issues suite looks at
+LABELS = ["linter error", "linter warning", "bug"]
+
+PER_PAGE = 100
+# The search API doesn't return more than this many results for a query
+SEARCH_MAX_RESULTS = 1000
+# Owners looked up in a single search query
+OWNERS_PER_QUERY = 10
+
+Issue = dict[str, Any]
+
+
+def _slim(issue: Issue) -> Issue:
+    # Only what the Issues suite needs, to keep the cache small
+    return {
+        "number": issue["number"],
+        "title": issue["title"],
+        "labels": [{"name": label["name"]} for label in issue.get("labels", [])],
+    }
+
+
+def _sorted(issues: Iterable[Issue]) -> list[Issue]:
+    # Most recent first, as the GitHub API lists them
+    return sorted(issues, key=lambda issue: issue["number"], reverse=True)
+
+
+def _get_all(
+    endpoint: str, params: dict[str, Any], items: Callable[[Any], list[Issue]]
+) -> tuple[int, list[Issue]]:
+    """All the items of a paginated endpoint of the API, and the HTTP code of the API"""
+    results = []
+    for page in itertools.count(1):
+        query = urllib.parse.urlencode({**params, "per_page": PER_PAGE, "page": page})
+        code, result = urlopen(f"{lib_package_linter.github_api}/{endpoint}?{query}")
+        if not 200 <= code < 300:
+            return code, []
+        page_items = items(json.loads(result))
+        results += page_items
+        if len(page_items) < PER_PAGE:
+            return code, results
+    raise AssertionError
+
+
+def fetch_repo_issues(repo: str) -> tuple[int, list[Issue]]:
+    """
+    The open issues of repo (e.g. "YunoHost-Apps/foo_ynh") having any of LABELS, and the
+    HTTP code of the GitHub API
+    """
+    # The API only filters on the issues having all the labels given: rather than a
+    # query per label, all the open issues are fetched and filtered here, which is
+    # usually a single query
+    code, items = _get_all(f"repos/{repo}/issues", {"state": "open"}, lambda page: page)
+    if not 200 <= code < 300:
+        return code, []
+    issues = [
+        _slim(item)
+        for item in items
+        if "pull_request" not in item
+        and any(label["name"] in LABELS for label in item.get("labels", []))
+    ]
+    return code, _sorted(issues)
+
+
+def _repo_of(issue: Issue) -> str:
+    # repository_url is .../repos/<owner>/<repo>
+    return "/".join(issue["repository_url"].split("/")[-2:]).lower()
+
+
+def _search(query: str) -> list[Issue] | None:
+    """All the results of a search query, None if they couldn't all be retrieved"""
+
+    def items(page: dict[str, Any]) -> list[Issue]:
+        # Past the limit of the search API, the results are truncated
+        if page["total_count"] > SEARCH_MAX_RESULTS or page.get("incomplete_results"):
+            msg = "Too many search results"
+            raise OverflowError(msg)
+        return page["items"]  # type: ignore[no-any-return]
+
+    try:
+        code, found = _get_all("search/issues", {"q": query}, items)
+    except OverflowError:
+        return None
+    return found if 200 <= code < 300 else None
+
+
+def search_issues(repos: Iterable[str]) -> dict[str, list[Issue]]:
+    """
+    The open issues having any of LABELS of each of the repos, by lowercase repo name.
+    The repos whose issues couldn't all be retrieved are left out.
+    """
+    by_owner: dict[str, set[str]] = {}
+    for repo in repos:
+        by_owner.setdefault(repo.split("/")[0].lower(), set()).add(repo.lower())
+    owners = sorted(by_owner)
+
+    issues: dict[str, list[Issue]] = {}
+    for chunk in (
+        owners[i : i + OWNERS_PER_QUERY] for i in range(0, len(owners), OWNERS_PER_QUERY)
+    ):
+        users = " ".join(f"user:{owner}" for owner in chunk)
+        labels = ",".join(f'"{label}"' for label in LABELS)
+        found = _search(f"is:issue is:open label:{labels} {users}")
+        if found is None:
+            # Too many results (or rate limited): a query per label is narrower, an
+            # issue having several of the labels being found by each of them
+            per_label = [_search(f'is:issue is:open label:"{label}" {users}') for label in LABELS]
+            if None in per_label:
+                _print(
+                    f"Couldn't prefetch the issues of the apps of {', '.join(chunk)}, "
+                    "they'll be fetched for each app when it's linted"
+                )
+                continue
+            unique = {issue["url"]: issue for results in per_label for issue in results or []}
+            found = list(unique.values())
+
+        for owner in chunk:
+            issues |= {repo: [] for repo in by_owner[owner]}
+        for issue in found:
+            if "pull_request" not in issue and _repo_of(issue) in issues:
+                issues[_repo_of(issue)].append(_slim(issue))
+    return {repo: _sorted(repo_issues) for repo, repo_issues in issues.items()}
+
+
+def write_cache(issues: dict[str, list[Issue]]) -> None:
+    with cache_lock(ISSUES_CACHE):
+        tmpfile = ISSUES_CACHE.with_name(f"{ISSUES_CACHE.name}.tmp")
+        tmpfile.write_text(json.dumps(issues))
+        tmpfile.replace(ISSUES_CACHE)
+
+
+# Content of the cache as of its last known mtime, such that the daemon doesn't
+# re-read it for every app
+_cache: tuple[float, dict[str, list[Issue]]] | None = None
+
+
+def cached_issues() -> dict[str, list[Issue]]:
+    """The prefetched issues, if they're fresh enough, by lowercase repo name"""
+    global _cache  # noqa: PLW0603
+    if not ISSUES_CACHE.exists():
+        return {}
+    try:
+        with cache_lock(ISSUES_CACHE, shared=True):
+            mtime = ISSUES_CACHE.stat().st_mtime
+            if time.time() - mtime >= ISSUES_CACHE_TTL_S:
+                return {}
+            if _cache is None or _cache[0] != mtime:
+                _cache = (mtime, json.loads(ISSUES_CACHE.read_text()))
+    except (OSError, ValueError):
+        return {}
+    return _cache[1]
+
+
+def repo_issues(repo: str) -> tuple[int, list[Issue]]:
+    """Same as fetch_repo_issues, from the prefetched issues if repo is among them"""
+    prefetched = cached_issues().get(repo.lower())
+    if prefetched is not None:
+        return 200, prefetched
+    return fetch_repo_issues(repo)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+# Official helpers of YunoHost, with the YunoHost version they require, and
+# the helpers deprecated by the packaging v2 and v2.1 along with what
+# replaces them. The versions are parsed once and for all at import.
+#
+# The official helpers are loaded from official_helpers.json, which is
+# generated from a checkout of YunoHost with:
+#   ./package_linter.py generate-helpers-registry /path/to/yunohost/helpers
+
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, NamedTuple
+
+REGISTRY_FILE = Path(__file__).resolve().parent / "official_helpers.json"
+# Version of the format of REGISTRY_FILE, to be bumped on incompatible changes
+REGISTRY_FORMAT = 1
+
+
+class OfficialHelper(NamedTuple):
+    requires: str  # Minimal YunoHost version, "" if unknown
+    requires_version: tuple[int, ...]  # Same, parsed. Empty if unknown
+    deprecated: bool
+    helpers_versions: tuple[str, ...]  # Versions of the helpers providing it, e.g. "1", "2.1"
+
+
+def parse_version(version: str) -> tuple[int, ...]:
+    return tuple(int(i) for i in version.split("."))
+
+
+def load_official_helpers(path: Path = REGISTRY_FILE) -> dict[str, OfficialHelper]:
+    registry = json.loads(path.read_text())
+    if registry["format"] != REGISTRY_FORMAT:
+        msg = f"{path} should be regenerated, its format isn't supported anymore"
+        raise RuntimeError(msg)
+    return {
+        name: OfficialHelper(
+            helper["requires"],
+            parse_version(helper["requires"]) if helper["requires"] else (),
+            helper["deprecated"],
+            tuple(helper["helpers_versions"]),
+        )
+        for name, helper in registry["helpers"].items()
+    }
+
+
+official_helpers = load_official_helpers()
+
+# Helper -> what replaces it
+deprecated_helpers_in_v2: dict[str, str] = {
+    "ynh_clean_setup": "(?)",
+    "ynh_abort_if_errors": "nothing, handled by the core, just get rid of it",
+    "ynh_backup_before_upgrade": "nothing, handled by the core, just get rid of it",
+    "ynh_restore_upgradebackup": "nothing, handled by the core, just get rid of it",
+    "ynh_system_user_create": "the system_user resource",
+    "ynh_system_user_delete": "the system_user resource",
+    "ynh_webpath_register": "the permission resource",
+    "ynh_webpath_available": "the permission resource",
+    "ynh_permission_update": "the permission resource",
+    "ynh_permission_create": "the permission resource",
+    "ynh_permission_exists": "the permission resource",
+    "ynh_legacy_permissions_exists": "the permission resource",
+    "ynh_legacy_permissions_delete_all": "the permission resource",
+    "ynh_install_app_dependencies": "the apt resource",
+    "ynh_install_extra_app_dependencies": "the apt source",
+    "ynh_remove_app_dependencies": "the apt resource",
+    "ynh_psql_test_if_first_run": "the database resource",
+    "ynh_mysql_setup_db": "the database resource",
+    "ynh_psql_setup_db": "the database resource",
+    "ynh_mysql_remove_db": "the database resource",
+    "ynh_psql_remove_db": "the database resource",
+    "ynh_find_port": "the port resource",
+    "ynh_send_readme_to_admin": "the doc/POST_INSTALL.md or POST_UPGRADE.md mechanism",
+}
+
+deprecated_helpers_in_v2p1: dict[str, str] = {
+    "ynh_nodejs_install": "the nodejs resource",
+    "ynh_nodejs_remove": "the nodejs resource",
+    "ynh_ruby_install": "the ruby resource",
+    "ynh_ruby_remove": "the ruby resource",
+    "ynh_go_install": "the go resource",
+    "ynh_go_remove": "the go resource",
+    "ynh_composer_install": "the composer resource",
+}
+
+
+# ############################################################################
+#   Generating the registry
+# ############################################################################
+
+HELPER_DEFINITION_RE = re.compile(r"^(ynh_\w+) *\( *\)")
+REQUIRES_RE = re.compile(r"Requires .*?(\d+(?:\.\d+)+) or higher")
+HELPERS_DIR_RE = re.compile(r"^helpers\.v([\d.]+)\.d$")
+# How the doc of a helper flags it as deprecated, rather than merely mentioning the word
+DEPRECATED_RE = re.compile(r"\[deprecated\]|@deprecated", re.IGNORECASE)
+
+# Not considered as official helpers: the config panel helpers
+# that may legitimately be overwritten from config script
+NOT_INDEXED = {
+    "ynh_app_config_get",
+    "ynh_app_config_show",
+    "ynh_app_config_validate",
+    "ynh_app_config_apply",
+    "ynh_app_action_run",
+    "ynh_app_config_run",
+}
+
+
+def helpers_dirs(path: Path) -> list[tuple[str, Path]]:
+    """The helpers directories in path (or path itself), with their helpers version"""
+    dirs = []
+    for candidate in [path, *sorted(path.iterdir())]:
+        if not candidate.is_dir():
+            continue
+        # Before the helpers v2.1, there was a single helpers.d
+        if candidate.name == "helpers.d":
+            dirs.append(("1", candidate))
+        elif match := HELPERS_DIR_RE.match(candidate.name):
+            dirs.append((match.group(1), candidate))
+    return sorted(dirs, key=lambda d: parse_version(d[0]))
+
+
+def index_helpers(path: Path) -> dict[str, Any]:
+    """Index the helpers defined in the helpers directories in path, in a single pass"""
+    helpers: dict[str, dict[str, Any]] = {}
+
+    for helpers_version, helpers_dir in helpers_dirs(path):
+        for helpers_file in sorted(helpers_dir.iterdir()):
+            if not helpers_file.is_file():
+                continue
+            # The comment block right above the current line
+            comments: list[str] = []
+            for line in helpers_file.read_text(errors="replace").splitlines():
+                if line.startswith("#"):
+                    comments.append(line)
+                    continue
+                match = HELPER_DEFINITION_RE.match(line)
+                if match and match.group(1) not in NOT_INDEXED:
+                    doc = "\n".join(comments)
+                    requires = REQUIRES_RE.search(doc)
+                    helper = helpers.setdefault(
+                        match.group(1),
+                        {"requires": "", "deprecated": False, "helpers_versions": []},
+                    )
+                    # The oldest helpers version tells the oldest requirement
+                    if requires and not helper["requires"]:
+                        helper["requires"] = requires.group(1)
+                    # As far as the doc of the helper tells
+                    helper["deprecated"] |= bool(DEPRECATED_RE.search(doc))
+                    if helpers_version not in helper["helpers_versions"]:
+                        helper["helpers_versions"].append(helpers_version)
+                comments = []
+
+    if not helpers:
+        msg = f"No helpers found in {path}"
+        raise RuntimeError(msg)
+
+    return {
+        "format": REGISTRY_FORMAT,
+        "generated_from": str(path),
+        "generated_on": time.strftime("%Y-%m-%d"),
+        "helpers": helpers,
+    }
+
+
+def write_registry(registry: dict[str, Any], path: Path = REGISTRY_FILE) -> None:
+    path.write_text(json.dumps(registry, indent=4) + "\n")
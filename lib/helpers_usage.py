@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Index of the helpers defined and used by the scripts of an app, built by
+# a single pass over scripts/ and shared by all the helpers-related tests.
+
+import re
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from lib.app_source import AppPath, relative_path, text_files
+
+# Any mention of a helper, which is a definition when followed by '()'
+HELPER_RE = re.compile(r"(ynh_\w+)( *\( *\))?")
+
+
+class Position(NamedTuple):
+    file: str  # Relative to scripts/
+    line: int
+    column: int
+
+
+class HelpersUsage:
+    def __init__(self) -> None:
+        # Helper name -> where it is defined
+        self.definitions: dict[str, list[Position]] = defaultdict(list)
+        # Helper name -> where it is mentioned, definitions included: without
+        # parsing bash, a mention is as good as a call
+        self.calls: dict[str, list[Position]] = defaultdict(list)
+
+    def defined(self) -> set[str]:
+        """Custom helpers, ynh_foo__2 being an alternative version of ynh_foo"""
+        return {helper.split("__")[0] for helper in self.definitions}
+
+    def called(self, files: Iterable[str] | None = None) -> set[str]:
+        """Helpers called in any of the files (all the scripts if None)"""
+        if files is None:
+            return set(self.calls)
+        files = set(files)
+        return {
+            helper
+            for helper, positions in self.calls.items()
+            if any(position.file in files for position in positions)
+        }
+
+    def counts(self, file: str) -> Counter[str]:
+        """Number of calls of each helper in file"""
+        return Counter(
+            {
+                helper: count
+                for helper, positions in self.calls.items()
+                if (count := sum(position.file == file for position in positions))
+            }
+        )
+
+
+def index_helpers_usage(scripts_dir: AppPath) -> HelpersUsage:
+    usage = HelpersUsage()
+    if not scripts_dir.is_dir():
+        return usage
+    for path in text_files(scripts_dir):
+        file = relative_path(path, scripts_dir)
+        content = path.read_bytes()
+        # Binary file
+        if b"\0" in content:
+            continue
+        for lineno, line in enumerate(content.decode("utf-8", errors="replace").split("\n"), 1):
+            for match in HELPER_RE.finditer(line):
+                helper = match.group(1)
+                position = Position(file, lineno, match.start() + 1)
+                usage.calls[helper].append(position)
+                if match.group(2):
+                    usage.definitions[helper].append(position)
+    return usage
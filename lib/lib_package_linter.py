@@ -1,17 +1,34 @@
 #!/usr/bin/env python3
 
+import fcntl
+import fnmatch
+import hashlib
+import json
+import re
+import subprocess
 import sys
+import threading
 import time
 import tomllib
-import urllib.error
-import urllib.request
-from collections.abc import Callable, Generator
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Literal, NotRequired, TypedDict, TypeVar
+from types import CodeType
+from typing import TYPE_CHECKING, Any, Literal, NotRequired, TypedDict, TypeVar
 
-import jsonschema
+from lib import results_cache
+from lib.app_source import AppPath, relative_path, text_files
+from lib.options import GITHUB_API, PROFILES, Profile, level_blockers
+from lib.print import Lazy, _print, section
 
-from lib.print import _print
+# Heavy modules are only imported on first use, to keep the startup fast
+# (c.f. tools/import_time.py)
+if TYPE_CHECKING:
+    import ssl
+
+    import jsonschema
 
 PACKAGE_LINTER_DIR = Path(__file__).resolve().parent.parent
 APPS_CACHE = PACKAGE_LINTER_DIR / ".apps"
@@ -37,11 +54,14 @@ class TestReport:
     style: str
     test_name: str
 
-    def __init__(self, message: str) -> None:
+    def __init__(self, message: str, *, path: str | None = None, line: int | None = None) -> None:
         self.message = message
+        # Where the issue is, when the test knows. The path is relative to the app.
+        self.path = path
+        self.line = line
 
     def display(self, prefix: str = "") -> None:
-        _print(prefix + self.style % self.message)
+        _print(Lazy(prefix + self.style, self.message))
 
 
 class ReportWarning(TestReport):
@@ -64,6 +84,100 @@ class ReportCritical(TestReport):
     style = Color.FAIL + " ✘✘✘ %s" + Color.END
 
 
+REPORT_TYPES: dict[str, type[TestReport]] = {
+    "success": ReportSuccess,
+    "info": ReportInfo,
+    "warning": ReportWarning,
+    "error": ReportError,
+    "critical": ReportCritical,
+}
+
+
+def report_type(report: TestReport) -> str:
+    return report.__class__.__name__.lower().removeprefix("report")
+
+
+def report_to_dict(report: TestReport) -> dict[str, Any]:
+    data: dict[str, Any] = {
+        "test": report.test_name,
+        "type": report_type(report),
+        "message": report.message,
+    }
+    if report.path is not None:
+        data["path"] = report.path
+    if report.line is not None:
+        data["line"] = report.line
+    return data
+
+
+def report_from_dict(data: dict[str, Any]) -> TestReport:
+    report = REPORT_TYPES[data["type"]](
+        data["message"], path=data.get("path"), line=data.get("line")
+    )
+    report.test_name = data["test"]
+    return report
+
+
+class ReportSink:
+    """Receives the reports as soon as the tests yield them (c.f. lib/sinks.py)"""
+
+    def report(self, suite: str, report: TestReport, elapsed_s: float | None) -> None:
+        """elapsed_s is the time since the test started, None for cached reports"""
+
+    def summary(self, summary: dict[str, Any]) -> None:
+        """Called once all the tests ran"""
+
+
+sinks: list[ReportSink] = []
+
+
+def add_sink(sink: ReportSink) -> None:
+    sinks.append(sink)
+
+
+def remove_sink(sink: ReportSink) -> None:
+    sinks.remove(sink)
+
+
+# Types of reports which settle the verdict of the run, such that the
+# remaining tests don't need to run (c.f. --fail-fast and --max-level-check)
+stop_on: frozenset[str] = frozenset()
+verdict_known = threading.Event()
+
+
+def set_stop_on(report_types: Iterable[str]) -> None:
+    global stop_on  # noqa: PLW0603
+    stop_on = frozenset(report_types)
+
+
+# Level the run checks the app can reach (c.f. --max-level-check), failing otherwise
+max_level_check: int | None = None
+
+
+def set_max_level_check(level: int | None) -> None:
+    global max_level_check  # noqa: PLW0603
+    max_level_check = level
+
+
+def level_unreachable() -> list[str]:
+    """The types of the reports making max_level_check unreachable, if any"""
+    if max_level_check is None:
+        return []
+    return [t for t in sorted(level_blockers(max_level_check)) if tests_reports[t]]
+
+
+def emit(suite: str, report: TestReport, elapsed_s: float | None = None) -> None:
+    if report_type(report) in stop_on:
+        verdict_known.set()
+    for sink in sinks:
+        sink.report(suite, report, elapsed_s)
+
+
+def emit_summary(summary: dict[str, Any]) -> None:
+    for sink in sinks:
+        sink.summary(summary)
+
+
 def report_warning_not_reliable(message: str) -> None:
     _print(Color.MAYBE_FAIL + "?", message, Color.END)
 
@@ -72,9 +186,20 @@ def print_happy(message: str) -> None:
     _print(Color.OKGREEN + " ☺ ", message, "♥")
 
 
+@lru_cache(maxsize=1)
+def ssl_context() -> "ssl.SSLContext":
+    # Loading the CA certificates takes a while, not to be done for every request
+    import ssl  # noqa: PLC0415
+
+    return ssl.create_default_context()
+
+
 def urlopen(url: str) -> tuple[int, str]:
+    import urllib.error  # noqa: PLC0415
+    import urllib.request  # noqa: PLC0415
+
     try:
-        conn = urllib.request.urlopen(url)  # noqa: S310
+        conn = urllib.request.urlopen(url, context=ssl_context())  # noqa: S310
     except urllib.error.HTTPError as e:
         return e.code, ""
     except urllib.error.URLError as e:
@@ -84,19 +209,98 @@ def urlopen(url: str) -> tuple[int, str]:
     return 200, conn.read().decode("UTF8")
 
 
-def not_empty(file: Path) -> bool:
+def not_empty(file: AppPath) -> bool:
     return file.is_file() and file.stat().st_size > 0
 
 
+def grep(regex: str, *paths: AppPath, flags: int = 0) -> list[str]:
+    """The lines matching regex in the files, directories being searched recursively
+    (c.f. text_files). Binary files are skipped, like grep -I does."""
+    pattern = re.compile(regex, flags)
+    lines = []
+    for path in paths:
+        for file in text_files(path) if path.is_dir() else [path] if path.is_file() else []:
+            content = file.read_bytes()
+            if b"\0" in content:
+                continue
+            text = content.decode("utf-8", errors="replace")
+            lines += [line for line in text.split("\n") if pattern.search(line)]
+    return lines
+
+
+def git_staged_files(path: Path) -> set[str] | None:
+    """Files staged in the git index, relative to path. None if path isn't in a git repo."""
+    cmd = ["git", "-C", str(path), "diff", "--cached", "--name-only", "--relative"]
+    try:
+        output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode("utf-8")
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    return {line for line in output.split("\n") if line}
+
+
+def git_changed_files(path: Path, ref: str) -> set[str]:
+    """Files changed between ref and the working tree (untracked files included),
+    relative to path"""
+    diff = ["git", "-C", str(path), "diff", "--name-only", "--relative", ref, "--"]
+    untracked = ["git", "-C", str(path), "ls-files", "--others", "--exclude-standard"]
+    output = subprocess.check_output(diff).decode("utf-8")
+    output += subprocess.check_output(untracked).decode("utf-8")
+    return {line for line in output.split("\n") if line}
+
+
+def git_commit(path: Path, ref: str = "HEAD") -> str | None:
+    """The commit ref points to in the git repo of path, None if it can't be resolved"""
+    cmd = ["git", "-C", str(path), "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"]
+    try:
+        output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    return output.decode("utf-8").strip()
+
+
+def git_is_clean(path: Path) -> bool:
+    """Whether the files in path are the ones of the HEAD commit"""
+    cmd = ["git", "-C", str(path), "status", "--porcelain", "--", "."]
+    try:
+        output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+    return not output.strip()
+
+
+@contextmanager
+def cache_lock(cache: Path, *, shared: bool = False) -> Iterator[None]:
+    """
+    Lock on a cache, shared by all the linter processes: a single process refreshes the
+    cache at a time (exclusive) and it isn't read while being refreshed (shared)
+    """
+    with cache.with_name(f"{cache.name}.lock").open("a") as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+
+
 def cache_file(cachefile: Path, ttl_s: int) -> Callable[[Callable[..., str]], Callable[..., str]]:
     def cache_is_fresh() -> bool:
         return cachefile.exists() and time.time() - cachefile.stat().st_mtime < ttl_s
 
+    # Content of the cache file as of its last known mtime, such that a long-running
+    # process (c.f. the daemon) doesn't re-read it on every call
+    loaded: dict[float, str] = {}
+
     def decorator(function: Callable[..., str]) -> Callable[..., str]:
         def wrapper() -> str:
             if not cache_is_fresh():
-                cachefile.write_text(function())
-            return cachefile.read_text()
+                with cache_lock(cachefile):
+                    # Unless another process refreshed it while this one waited for the lock
+                    if not cache_is_fresh():
+                        tmpfile = cachefile.with_name(f"{cachefile.name}.tmp")
+                        tmpfile.write_text(function())
+                        tmpfile.replace(cachefile)
+            mtime = cachefile.stat().st_mtime
+            if mtime not in loaded:
+                loaded.clear()
+                loaded[mtime] = cachefile.read_text()
+            return loaded[mtime]
 
         return wrapper
 
@@ -134,13 +338,20 @@ class CatalogAppDescr(TypedDict):
     url: str
 
 
+_app_list: tuple[float, dict[str, CatalogAppDescr]] | None = None
+
+
 def get_app_list() -> dict[str, CatalogAppDescr]:
+    global _app_list  # noqa: PLW0603
     try:
-        app_list = tomllib.load((APPS_CACHE / "apps.toml").open("rb"))
+        with cache_lock(APPS_CACHE, shared=True):
+            mtime = (APPS_CACHE / "apps.toml").stat().st_mtime
+            if _app_list is None or _app_list[0] != mtime:
+                _app_list = (mtime, tomllib.load((APPS_CACHE / "apps.toml").open("rb")))
     except Exception:
         _print("Failed to read apps.toml :/")
         sys.exit(-1)
-    return app_list
+    return _app_list[1]
 
 
 @cache_file(Path(".config_panel.v1.schema.json"), 3600)
@@ -149,12 +360,17 @@ def config_panel_v1_schema() -> str:
     return urlopen(url)[1]
 
 
+@lru_cache(maxsize=8)
+def schema_validator(schema: str) -> "jsonschema.Draft7Validator":
+    import jsonschema  # noqa: PLC0415
+
+    return jsonschema.Draft7Validator(json.loads(schema))
+
+
 def validate_schema(
-    name: str, schema: dict[str, Any], data: dict[str, Any]
+    name: str, schema: str, data: dict[str, Any]
 ) -> Generator[ReportInfo, None, None]:
-    v = jsonschema.Draft7Validator(schema)
-
-    for error in v.iter_errors(data):
+    for error in schema_validator(schema).iter_errors(data):
         try:
             error_path = " > ".join([str(elt) for elt in error.path])
         except TypeError:
@@ -164,11 +380,121 @@ def validate_schema(
         yield ReportInfo(msg)
 
 
+# ############################################################################
+#   Profiles
+# ############################################################################
+
+
+profile = PROFILES["full"]
+
+
+def set_profile(name: str | Profile) -> None:
+    global profile  # noqa: PLW0603
+    profile = PROFILES[name] if isinstance(name, str) else name
+
+
+# Qualified names of the only tests to run (e.g. "Script.bad_if_syntax"), None
+# to run all of them
+only_tests: frozenset[str] | None = None
+
+
+def set_only_tests(names: Iterable[str] | None) -> None:
+    global only_tests  # noqa: PLW0603
+    only_tests = frozenset(names) if names is not None else None
+
+
+class LatencyBudget:
+    def __init__(self, total_s: float, nb_tests: int) -> None:
+        self.total_s = total_s
+        self.deadline = time.monotonic() + total_s
+        # Each test gets an equal share of the total budget
+        self.share_s = total_s / max(nb_tests, 1)
+        self.overruns: list[tuple[str, float]] = []
+        self.skipped: list[str] = []
+
+    def exhausted(self) -> bool:
+        return time.monotonic() > self.deadline
+
+    def record(self, test_name: str, elapsed_s: float) -> None:
+        if elapsed_s > self.share_s:
+            self.overruns.append((test_name, elapsed_s))
+
+    def display(self) -> None:
+        if not self.overruns and not self.skipped:
+            return
+        _print(
+            f"{Color.MAYBE_FAIL}? Latency budget of {self.total_s}s "
+            f"({self.share_s * 1000:.0f}ms per test):{Color.END}"
+        )
+        for test_name, elapsed_s in self.overruns:
+            _print(f"   - {test_name} took {elapsed_s * 1000:.0f}ms")
+        if self.skipped:
+            _print(f"   - Budget exhausted, skipped: {', '.join(self.skipped)}")
+
+
+budget: LatencyBudget | None = None
+
+
+def set_budget(new_budget: LatencyBudget | None) -> None:
+    global budget  # noqa: PLW0603
+    budget = new_budget
+
+
+# Number of threads running the tests
+jobs = 1
+
+
+def set_jobs(new_jobs: int) -> None:
+    global jobs  # noqa: PLW0603
+    jobs = max(new_jobs, 1)
+
+
+# Where to clone the apps catalog from. None keeps the origin of the existing
+# clone, or APPS_REPO for a new one.
+catalog_repo: str | None = None
+
+
+def set_catalog_repo(url: str | None) -> None:
+    global catalog_repo  # noqa: PLW0603
+    catalog_repo = url
+
+
+# Base URL of the GitHub API, e.g. of a mock of it
+github_api = GITHUB_API
+
+
+def set_github_api(url: str | None) -> None:
+    global github_api  # noqa: PLW0603
+    github_api = (url or GITHUB_API).rstrip("/")
+
+
+use_tests_cache = False
+
+
+def set_use_tests_cache(*, enabled: bool = True) -> None:
+    global use_tests_cache  # noqa: PLW0603
+    use_tests_cache = enabled
+
+
 TestSuiteSelf = TypeVar("TestSuiteSelf", bound="TestSuite")
 TestResult = Generator[TestReport, None, None]
 TestFn = Callable[[TestSuiteSelf], TestResult]
 
-tests: dict[str, list[tuple[TestFn, dict[str, list[str] | None]]]] = {}  # type: ignore[type-arg]
+
+class TestOptions(TypedDict):
+    only: list[str] | None
+    ignore: list[str] | None
+    inputs: list[str] | None
+    optional_inputs: bool
+    manifest: list[str]
+    resources: list[str]
+
+
+# Resources changing on their own, regardless of the app (e.g. the issues being opened or
+# closed): the results of the tests needing them are never reused from a previous run
+VOLATILE_RESOURCES = frozenset({"catalog", "github", "issues"})
+
+tests: dict[str, list[tuple[TestFn, TestOptions]]] = {}  # type: ignore[type-arg]
 tests_reports: dict[str, list[tuple[str, TestReport]]] = {
     "success": [],
     "info": [],
@@ -178,45 +504,254 @@ tests_reports: dict[str, list[tuple[str, TestReport]]] = {
 }
 
 
-def test(
+def reset_reports() -> None:
+    for reports in tests_reports.values():
+        reports.clear()
+    verdict_known.clear()
+
+
+def json_report() -> dict[str, list[str]]:
+    return {level: [test for test, _ in reports] for level, reports in tests_reports.items()}
+
+
+def test(  # noqa: PLR0913
     only: list[str] | None = None,  # noqa: PT028
     ignore: list[str] | None = None,  # noqa: PT028
+    *,
+    inputs: list[str] | None = None,  # noqa: PT028
+    optional_inputs: bool = False,  # noqa: PT028
+    manifest: list[str] | None = None,  # noqa: PT028
+    resources: list[str] | None = None,  # noqa: PT028
 ) -> Callable[[TestFn], TestFn]:  # type: ignore[type-arg]
+    """
+    Register a test of a suite.
+
+    - only / ignore: names of the scripts the test should (not) run on
+    - inputs: globs (relative to the app dir) of the files read by the test, in addition
+      to the default_inputs of the suite. The test is skipped if none of these exist,
+      unless optional_inputs is set (i.e. the test checks that some files are missing)
+    - manifest: dotted keys of the manifest read by the test
+    - resources: external resources needed by the test (spdx, schemas, catalog, issues...)
+
+    Tests whose inputs are all declared and which don't need any resource get their
+    results cached, keyed by a hash of those inputs.
+    """
+
     def decorator(f: TestFn) -> TestFn:  # type: ignore[type-arg]
         clsname = getattr(f, "__qualname__", "unnamed_callable").split(".")[0]
         if clsname not in tests:
             tests[clsname] = []
-        tests[clsname].append((f, {"only": only, "ignore": ignore}))
+        options = TestOptions(
+            only=only,
+            ignore=ignore,
+            inputs=inputs,
+            optional_inputs=optional_inputs,
+            manifest=manifest or [],
+            resources=resources or [],
+        )
+        tests[clsname].append((f, options))
         return f
 
     return decorator
 
 
-class TestSuite:
-    name: str = ""
-    test_suite_name: str
+def glob_matches(path: str, pattern: str) -> bool:
+    # fnmatch's * also matches /, so this is a superset of what Path.glob matches,
+    # which is what we want to decide whether a change may affect a test
+    return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(path, pattern.replace("**/", ""))
+
+
+def code_digest(code: CodeType) -> str:
+    """
+    Hash of the code of a function, the same from one process to the next: unlike their
+    repr, the nested code objects (e.g. of the generator expressions) don't include their
+    address, and the frozensets don't depend on the hash seed
+    """
+    digest = hashlib.sha256()
+
+    def update(value: object) -> None:
+        if isinstance(value, CodeType):
+            digest.update(b"code\0" + value.co_code)
+            digest.update("\0".join(value.co_names).encode() + b"\0")
+            update(value.co_consts)
+        elif isinstance(value, tuple):
+            digest.update(f"tuple {len(value)}\0".encode())
+            for item in value:
+                update(item)
+        elif isinstance(value, frozenset):
+            digest.update(f"frozenset {len(value)}\0".encode())
+            for item in sorted(value, key=repr):
+                update(item)
+        else:
+            digest.update(f"{value!r}\0".encode())
 
-    def run_tests(self) -> None:
+    update(code)
+    return digest.hexdigest()
 
-        reports: list[TestReport] = []
 
+class TestSuite:
+    name: str = ""
+    test_suite_name: str
+    # Directory of the app, to resolve the inputs declared by the tests
+    app_path: AppPath | None = None
+    # Files read by all the tests of the suite. None if they're not declared.
+    default_inputs: tuple[str, ...] | None = None
+
+    def prepare(self) -> None:
+        """
+        Load what the tests need from the network (e.g. the catalog), right before they run:
+        never when the verdict is known beforehand (c.f. --fail-fast)
+        """
+
+    def selected_tests(self) -> Iterator[tuple[TestFn, TestOptions]]:  # type: ignore[type-arg]
         for testfn, options in tests[self.__class__.__name__]:
             if self.name and self.name not in (options["only"] or []):
                 continue
             if self.name and self.name in (options["ignore"] or []):
                 continue
+            if profile.offline and options["resources"]:
+                continue
+            if only_tests is not None and getattr(testfn, "__qualname__", "") not in only_tests:
+                continue
+            yield testfn, options
+
+    def declared_inputs(self, options: TestOptions) -> list[str] | None:
+        """Globs of the files read by a test, None if they're not declared"""
+        if self.default_inputs is None and options["inputs"] is None:
+            return None
+        patterns = [*(self.default_inputs or ()), *(options["inputs"] or [])]
+        return [pattern.format(name=self.name) for pattern in patterns]
+
+    def default_location(self) -> str | None:
+        """The file the reports of the suite are about, if it's a single one"""
+        patterns = [pattern.format(name=self.name) for pattern in self.default_inputs or ()]
+        if len(patterns) == 1 and not any(c in patterns[0] for c in "*?["):
+            return patterns[0]
+        return None
+
+    def input_files(self, patterns: list[str]) -> list[AppPath]:
+        if self.app_path is None:
+            return []
+        return sorted(
+            {file for pattern in patterns for file in self.app_path.glob(pattern) if file.is_file()}
+        )
+
+    def input_manifest(self) -> dict[str, Any]:
+        return {}
+
+    def cache_key(self, testfn: TestFn, options: TestOptions, files: list[AppPath]) -> str:  # type: ignore[type-arg]
+        assert self.app_path is not None
+        code = getattr(testfn, "__code__", None)
+        key = hashlib.sha256()
+        key.update(f"{getattr(testfn, '__qualname__', '')}\0{self.name}\0".encode())
+        if code:
+            key.update(code_digest(code).encode())
+        for file in files:
+            key.update(f"{relative_path(file, self.app_path)}\0".encode())
+            key.update(file.read_bytes() + b"\0")
+        manifest = self.input_manifest()
+        for dotted_key in options["manifest"]:
+            value: Any = manifest
+            for subkey in dotted_key.split("."):
+                value = value.get(subkey) if isinstance(value, dict) else None
+            key.update(json.dumps(value, default=str).encode() + b"\0")
+        return key.hexdigest()
+
+    def affected_by(self, changed_files: set[str]) -> bool:
+        """
+        Whether some of the changed files (relative to the app dir) may change the results,
+        always the case for the suites needing volatile resources
+        """
+        for _, options in self.selected_tests():
+            if VOLATILE_RESOURCES.intersection(options["resources"]):
+                return True
+            patterns = self.declared_inputs(options)
+            if patterns is None:
+                return bool(changed_files)
+            if any(glob_matches(file, pattern) for file in changed_files for pattern in patterns):
+                return True
+        return False
+
+    def run_test(self, testfn: TestFn, options: TestOptions) -> list[TestReport]:  # type: ignore[type-arg]
+        test_name = str(getattr(testfn, "__qualname__", "unnamed_test"))
+
+        patterns = self.declared_inputs(options)
+        files = self.input_files(patterns) if patterns is not None else []
+        if patterns and not files and not options["optional_inputs"]:
+            return []
+
+        key = None
+        if use_tests_cache and patterns is not None and not options["resources"]:
+            key = self.cache_key(testfn, options, files)
+            cached = results_cache.load_test_results(key)
+            if cached is not None:
+                reports = [report_from_dict(report) for report in cached]
+                for report in reports:
+                    emit(self.test_suite_name, report)
+                return reports
+
+        start = time.monotonic()
+        reports = []
+        location = self.default_location()
+        for report in testfn(self):
+            report.test_name = test_name
+            if report.path is None:
+                report.path = location
+            emit(self.test_suite_name, report, time.monotonic() - start)
+            reports.append(report)
+
+        if key:
+            results_cache.store_test_results(key, [report_to_dict(r) for r in reports])
+        return reports
+
+    def run_test_within_budget(self, testfn: TestFn, options: TestOptions) -> list[TestReport]:  # type: ignore[type-arg]
+        test_name = str(getattr(testfn, "__qualname__", "unnamed_test"))
+        if verdict_known.is_set():
+            return []
+        if budget and budget.exhausted():
+            budget.skipped.append(test_name)
+            return []
+
+        start = time.monotonic()
+        reports = self.run_test(testfn, options)
+        if budget:
+            budget.record(test_name, time.monotonic() - start)
+        return reports
+
+    def collect_reports(self) -> list[TestReport]:
+
+        # When running sequentially, tests which only need local files run first and
+        # the ones waiting on the network last. When running in parallel, it's the
+        # opposite so that the network latency is hidden behind the local tests.
+        # Either way the reports are kept in the order the tests are declared.
+        network_first = jobs > 1
+        plan = sorted(
+            enumerate(self.selected_tests()),
+            key=lambda item: bool(item[1][1]["resources"]) != network_first,
+        )
+        reports: dict[int, list[TestReport]] = {}
+
+        if jobs == 1:
+            for index, (testfn, options) in plan:
+                reports[index] = self.run_test_within_budget(testfn, options)
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = {
+                    index: executor.submit(self.run_test_within_budget, testfn, options)
+                    for index, (testfn, options) in plan
+                }
+                reports = {index: future.result() for index, future in futures.items()}
 
-            this_test_reports = list(testfn(self))
-            for report in this_test_reports:
-                report.test_name = str(getattr(testfn, "__qualname__", "unnamed_test"))
-
-            reports += this_test_reports
+        return [report for index in sorted(reports) for report in reports[index]]
 
-        # Display part
+    def display_reports(self, reports: list[TestReport], *, cached: bool = False) -> None:
+        with section():
+            self._display_reports(reports, cached=cached)
 
-        def report_type(report: TestReport) -> str:
-            return report.__class__.__name__.lower().removeprefix("report")
+        for report in reports:
+            tests_reports[report_type(report)].append((report.test_name, report))
 
+    def _display_reports(self, reports: list[TestReport], *, cached: bool) -> None:
         if any(report_type(r) in ["warning", "error", "critical"] for r in reports):
             prefix = Color.WARNING + "! "
         elif any(report_type(r) == "info" for r in reports):
@@ -224,7 +759,8 @@ class TestSuite:
         else:
             prefix = Color.OKGREEN + "✔ "
 
-        _print(f" {Color.BOLD}{prefix}{Color.OKBLUE}{self.test_suite_name}{Color.END}")
+        suffix = " (cached)" if cached else ""
+        _print(f" {Color.BOLD}{prefix}{Color.OKBLUE}{self.test_suite_name}{Color.END}{suffix}")
 
         if len(reports):
             _print("")
@@ -235,17 +771,17 @@ class TestSuite:
         if len(reports):
             _print("")
 
-        for report in reports:
-            tests_reports[report_type(report)].append((report.test_name, report))
+    def run_tests(self) -> list[TestReport]:
+        reports = self.collect_reports()
+        self.display_reports(reports)
+        return reports
 
     def run_single_test(self, test: TestFn) -> None:  # type: ignore[type-arg]
 
-        reports = list(test(self))
-
-        def report_type(report: TestReport) -> str:
-            return report.__class__.__name__.lower().removeprefix("report")
-
-        for report in reports:
+        start = time.monotonic()
+        for report in test(self):
             report.display()
             test_name = getattr(test, "__qualname__", "unnamed_test")
+            report.test_name = test_name
+            emit(self.test_suite_name, report, time.monotonic() - start)
             tests_reports[report_type(report)].append((test_name, report))
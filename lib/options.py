@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# Defaults of the options of the linter, and what they stand for. This only
+# depends on the standard library, such that the command line can be parsed
+# without loading the linter (c.f. lib/daemon_client.py).
+
+from typing import NamedTuple
+
+APPS_REPO = "https://github.com/YunoHost/apps"
+GITHUB_API = "https://api.github.com"
+
+
+class Profile(NamedTuple):
+    # Class names of the test suites to run
+    suites: frozenset[str]
+    # Skip the tests that need a network resource
+    offline: bool = False
+    # Only lint the files staged in git
+    staged_only: bool = False
+    # Total wall-clock budget for running the tests, in seconds
+    budget_s: float | None = None
+
+
+PROFILES = {
+    "full": Profile(
+        suites=frozenset(["Manifest", "Script", "App", "Configurations", "AppCatalog", "Issues"]),
+    ),
+    # Meant to be used as a git pre-commit hook: only the local, cheap checks
+    "precommit": Profile(
+        suites=frozenset(["Manifest", "Script", "Configurations"]),
+        offline=True,
+        staged_only=True,
+        budget_s=1.0,
+    ),
+}
+
+
+def level_blockers(level: int) -> set[str]:
+    """Types of reports which make level unreachable"""
+    # Level 7 requires not even a warning, and level 5 no error
+    if level >= 7:
+        return {"warning", "error", "critical"}
+    if level >= 5:
+        return {"error", "critical"}
+    return set()
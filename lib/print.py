@@ -1,14 +1,86 @@
 #!/usr/bin/env python3
 
-from functools import wraps
+# Output of the linter. What's printed is kept as is, and only turned into text
+# when written, by the renderer of the output: nothing is formatted in json /
+# ndjson modes, and the colors are stripped from the plain text unless wanted.
+# Within a section (e.g. the reports of a suite), everything a thread prints is
+# written at once at the end.
+
+import os
+import re
+import sys
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
 
 output = "plain"
+# c.f. https://no-color.org
+color = not os.environ.get("NO_COLOR")
+
+ANSI_CODES = re.compile(r"\033\[[0-9;]*m")
+
+
+class _Sections(threading.local):
+    """
+    The sections of the current thread: the tests run in threads (c.f. --jobs), and what
+    a thread prints mustn't end up within the section of another one
+    """
+
+    def __init__(self) -> None:
+        # What was printed within the current section: the values, sep and end
+        self.buffer: list[tuple[tuple[object, ...], str, str]] = []
+        self.depth = 0
+
+
+_sections = _Sections()
+# Such that the sections written by different threads don't interleave
+_lock = threading.Lock()
+
+
+class Lazy:
+    """Text formatted with % only if and when it's written"""
+
+    def __init__(self, template: str, *args: Any) -> None:  # noqa: ANN401
+        self.template = template
+        self.args = args
+
+    def __str__(self) -> str:
+        return self.template % self.args
+
+
+def _render(lines: list[tuple[tuple[object, ...], str, str]]) -> str:
+    text = "".join(sep.join(str(value) for value in values) + end for values, sep, end in lines)
+    return text if color else ANSI_CODES.sub("", text)
+
 
+def flush() -> None:
+    lines = _sections.buffer.copy()
+    _sections.buffer.clear()
+    if lines:
+        with _lock:
+            sys.stdout.write(_render(lines))
+            sys.stdout.flush()
 
-@wraps(print)
-def _print(*values: object, **kwargs) -> None:  # type: ignore[no-untyped-def]  # noqa: ANN003
-    if not is_json_output():
-        print(*values, **kwargs)
+
+def _print(*values: object, sep: str = " ", end: str = "\n") -> None:
+    if output != "plain":
+        return
+    _sections.buffer.append((values, sep, end))
+    if not _sections.depth:
+        flush()
+
+
+@contextmanager
+def section() -> Iterator[None]:
+    """Write what's printed within in a single write, at the end"""
+    _sections.depth += 1
+    try:
+        yield
+    finally:
+        _sections.depth -= 1
+        if not _sections.depth:
+            flush()
 
 
 def set_output_json() -> None:
@@ -16,5 +88,24 @@ def set_output_json() -> None:
     output = "json"
 
 
+def set_output_ndjson() -> None:
+    global output  # noqa: PLW0603
+    output = "ndjson"
+
+
+def set_output_plain() -> None:
+    global output  # noqa: PLW0603
+    output = "plain"
+
+
+def set_color(*, enabled: bool) -> None:
+    global color  # noqa: PLW0603
+    color = enabled
+
+
 def is_json_output() -> bool:
     return output == "json"
+
+
+def is_color_output() -> bool:
+    return color
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import subprocess
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+PACKAGE_LINTER_DIR = Path(__file__).resolve().parent.parent
+
+# Results of previous runs, stored:
+# - per app and per commit of the app, such that `--since <ref>` can reuse the
+#   results computed for <ref> for the suites that are not affected by the changes
+#   since then.
+# - per test and per hash of the inputs declared by the test.
+RESULTS_CACHE = PACKAGE_LINTER_DIR / ".results_cache"
+
+# The files of the linter whose changes may change the results: the code, the
+# suites, and the data they read (e.g. lib/official_helpers.json)
+LINTER_FILES = ["package_linter.py", "lib/**/*.py", "lib/**/*.json", "tests/*.py"]
+
+Reports = list[dict[str, Any]]
+
+
+@cache
+def linter_version() -> str:
+    try:
+        cmd = ["git", "-C", str(PACKAGE_LINTER_DIR), "rev-parse", "HEAD"]
+        return subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode("utf-8").strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "unknown"
+
+
+def files_digest(directory: Path) -> str:
+    """Hash of the linter files (c.f. LINTER_FILES) of the linter in directory"""
+    digest = hashlib.sha256()
+    files = {file for pattern in LINTER_FILES for file in directory.glob(pattern)}
+    for file in sorted(files):
+        digest.update(f"{file.relative_to(directory)}\0".encode())
+        digest.update(file.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+@cache
+def linter_digest() -> str:
+    """
+    Hash of the files of this linter: unlike linter_version, it also tells apart the
+    uncommitted changes
+    """
+    return files_digest(PACKAGE_LINTER_DIR)
+
+
+def _load(cachefile: Path) -> Any:  # noqa: ANN401
+    try:
+        data = json.loads(cachefile.read_text())
+    except (OSError, ValueError):
+        return None
+
+    # Results from another version of the linter can't be trusted
+    if data.get("linter_digest") != linter_digest():
+        return None
+    return data["results"]
+
+
+def _store(cachefile: Path, results: Any) -> None:  # noqa: ANN401
+    cachefile.parent.mkdir(parents=True, exist_ok=True)
+    data = {"linter_digest": linter_digest(), "results": results}
+    tmpfile = cachefile.with_name(f".{cachefile.name}.tmp")
+    tmpfile.write_text(json.dumps(data))
+    tmpfile.replace(cachefile)
+
+
+def load_results(app_id: str, commit: str) -> dict[str, Reports] | None:
+    return _load(RESULTS_CACHE / "apps" / app_id / f"{commit}.json")  # type: ignore[no-any-return]
+
+
+def store_results(app_id: str, commit: str, results: dict[str, Reports]) -> None:
+    _store(RESULTS_CACHE / "apps" / app_id / f"{commit}.json", results)
+
+
+def load_test_results(key: str) -> Reports | None:
+    return _load(RESULTS_CACHE / "tests" / key[:2] / f"{key}.json")  # type: ignore[no-any-return]
+
+
+def store_test_results(key: str, results: Reports) -> None:
+    _store(RESULTS_CACHE / "tests" / key[:2] / f"{key}.json", results)
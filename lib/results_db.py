@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# History of the lint runs in a SQLite database (c.f. --results-db), to follow
+# the level of the apps and the reports of the tests over time.
+
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    app TEXT NOT NULL,
+    "commit" TEXT,
+    linter_version TEXT NOT NULL,
+    time REAL NOT NULL,
+    duration_s REAL NOT NULL,
+    level INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_app_time ON runs (app, time);
+
+CREATE TABLE IF NOT EXISTS reports (
+    run INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    suite TEXT NOT NULL,
+    test TEXT NOT NULL,
+    type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    path TEXT,
+    line INTEGER,
+    elapsed_s REAL
+);
+CREATE INDEX IF NOT EXISTS reports_run_test ON reports (run, test);
+CREATE INDEX IF NOT EXISTS reports_test ON reports (test);
+"""
+
+
+class Run(NamedTuple):
+    app: str
+    commit: str | None
+    linter_version: str
+    # Unix timestamp of the start of the run
+    time: float
+    duration_s: float
+    # None when the run didn't include everything needed to tell
+    level: int | None
+
+
+class ReportRow(NamedTuple):
+    suite: str
+    test: str
+    type: str
+    message: str
+    path: str | None
+    line: int | None
+    # None for the reports reused from a cache
+    elapsed_s: float | None
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=60)
+    # Concurrent lints append to the database while it's being read
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute("PRAGMA foreign_keys = ON")
+    if db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        db.executescript(SCHEMA)
+        db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return db
+
+
+def store_runs(db: sqlite3.Connection, runs: Iterable[tuple[Run, list[ReportRow]]]) -> None:
+    """Store the runs and their reports, in a single transaction"""
+    with db:
+        for run, reports in runs:
+            cursor = db.execute(
+                'INSERT INTO runs (app, "commit", linter_version, time, duration_s, level) '
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                run,
+            )
+            db.executemany(
+                "INSERT INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((cursor.lastrowid, *report) for report in reports),
+            )
+
+
+class Regression(NamedTuple):
+    app: str
+    level_before: int
+    level: int
+    commit: str | None
+    time: float
+
+
+def regressions(db: sqlite3.Connection, level: int, since: float) -> list[Regression]:
+    """
+    The apps which were at least at level as of their last run before since, and are below
+    it as of their latest run
+    """
+    query = """
+    WITH ranked AS (
+        SELECT app, level, "commit", time, time <= :since AS before,
+            row_number() OVER (PARTITION BY app, time <= :since ORDER BY time DESC) AS nth
+        FROM runs WHERE level IS NOT NULL
+    )
+    SELECT latest.app, before.level, latest.level, latest."commit", latest.time
+    FROM ranked AS latest
+    JOIN ranked AS before ON before.app = latest.app AND before.before AND before.nth = 1
+    WHERE NOT latest.before AND latest.nth = 1 AND before.level >= :level
+        AND latest.level < :level
+    ORDER BY latest.app
+    """
+    rows = db.execute(query, {"level": level, "since": since})
+    return [Regression(*row) for row in rows]
+
+
+class RuleRun(NamedTuple):
+    time: float
+    commit: str | None
+    # Number of warnings/errors/... the test reported in this run
+    nb_reports: int
+
+
+def rule_history(db: sqlite3.Connection, test: str, app: str) -> list[RuleRun]:
+    """The runs of app, oldest first, with how many times test fired in each"""
+    query = """
+    SELECT runs.time, runs."commit", count(reports.run)
+    FROM runs
+    LEFT JOIN reports ON reports.run = runs.id AND reports.test = :test
+        AND reports.type != 'success'
+    WHERE runs.app = :app
+    GROUP BY runs.id
+    ORDER BY runs.time
+    """
+    return [RuleRun(*row) for row in db.execute(query, {"test": test, "app": app})]
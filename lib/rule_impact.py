@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Preview the impact of a change to some tests: run only these tests across
+# many apps, and diff their reports against the ones of a previous run (e.g.
+# before the change). Only the local checks can be previewed, the network is
+# never hit.
+
+import json
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from lib import lib_package_linter
+from lib.app_source import open_app
+from lib.batch import app_key
+from lib.lib_package_linter import report_to_dict
+from lib.options import Profile
+from lib.print import _print, set_output_json
+
+# Suites which can be run on their own, without the network
+LOCAL_SUITES = ["Manifest", "Script", "App", "Configurations"]
+
+# Reports of each app, by app key (c.f. batch.app_key)
+Results = dict[str, list[dict[str, Any]]]
+# Why the linter failed on each of the apps it failed on, by app key
+Failures = dict[str, str]
+
+
+def _local_tests() -> dict[str, list[str]]:
+    """The tests of LOCAL_SUITES, with the resources they need"""
+    from tests.test_app import App  # noqa: F401, PLC0415  # registers all the tests
+
+    return {
+        getattr(testfn, "__qualname__", ""): options["resources"]
+        for suite in LOCAL_SUITES
+        for testfn, options in lib_package_linter.tests.get(suite, [])
+    }
+
+
+def unknown_tests(names: Iterable[str]) -> list[str]:
+    return sorted(set(names) - set(_local_tests()))
+
+
+def network_tests(names: Iterable[str]) -> list[str]:
+    """The tests which need the network, which are never run and so can't be previewed"""
+    tests = _local_tests()
+    return sorted(name for name in set(names) if tests.get(name))
+
+
+def _init_worker(names: list[str]) -> None:
+    # Nothing is displayed, the reports are collected and sent back instead
+    set_output_json()
+    lib_package_linter.set_only_tests(names)
+    suites = {name.split(".")[0] for name in names}
+    lib_package_linter.set_profile(Profile(suites=frozenset(suites), offline=True))
+
+
+def _lint_app(path: Path, git_ref: str | None) -> tuple[list[dict[str, Any]], str | None]:
+    """The reports of the app, and the error the linter failed with, if it did"""
+    from tests.test_app import App  # noqa: PLC0415
+
+    try:
+        app = App(open_app(path, git_ref))
+    except RuntimeError as e:
+        return [{"test": "App", "type": "critical", "message": str(e)}], None
+    except SystemExit:
+        # The manifest couldn't even be loaded
+        return [{"test": "Manifest", "type": "critical", "message": "Unable to load the app"}], None
+    # A bug of the linter on an app mustn't abort the whole run
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+    try:
+        reports = [report for suite in app.suites() for report in suite.collect_reports()]
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+    return [report_to_dict(report) for report in reports], None
+
+
+def run(
+    names: list[str], app_paths: list[Path], jobs: int, git_ref: str | None = None
+) -> tuple[Results, Failures]:
+    """The reports of the apps, and the apps the linter failed on"""
+    results: Results = {}
+    failures: Failures = {}
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(names,)
+    ) as executor:
+        outcomes = executor.map(partial(_lint_app, git_ref=git_ref), app_paths, chunksize=4)
+        for path, (reports, error) in zip(app_paths, outcomes, strict=True):
+            if error is None:
+                results[app_key(path)] = reports
+            else:
+                failures[app_key(path)] = error
+    return results, failures
+
+
+def _key(report: dict[str, Any]) -> tuple[str, ...]:
+    # The line numbers are left out, so that unrelated changes in the files
+    # don't show up in the diff
+    return (report["test"], report["type"], report.get("path", ""), report["message"])
+
+
+def diff(baseline: Results, results: Results) -> dict[str, tuple[list[str], list[str]]]:
+    """The reports which appeared and disappeared since the baseline, by app"""
+    changes = {}
+    for app in sorted(results):
+        before = {_key(report) for report in baseline.get(app, [])}
+        after = {_key(report) for report in results[app]}
+        added = [" ".join(key[:2]) + f": {key[3]}" for key in sorted(after - before)]
+        removed = [" ".join(key[:2]) + f": {key[3]}" for key in sorted(before - after)]
+        if added or removed:
+            changes[app] = (added, removed)
+    return changes
+
+
+def display_diff(baseline: Results, results: Results) -> None:
+    changes = diff(baseline, results)
+    for app, (added, removed) in changes.items():
+        _print(app)
+        for line in added:
+            _print(f"  + {line}")
+        for line in removed:
+            _print(f"  - {line}")
+
+    def flagged(results: Results, app: str) -> bool:
+        return any(r["type"] != "success" for r in results.get(app, []))
+
+    newly = sum(flagged(results, app) and not flagged(baseline, app) for app in results)
+    no_longer = sum(flagged(baseline, app) and not flagged(results, app) for app in results)
+    _print(
+        f"{len(results)} apps linted, {len(changes)} with different reports: "
+        f"{newly} newly flagged, {no_longer} no longer flagged"
+    )
+
+
+def display_failures(failures: Failures) -> None:
+    if not failures:
+        return
+    _print(f"The linter failed on {len(failures)} apps, left out of the comparison:")
+    for app, error in sorted(failures.items()):
+        _print(f"  {app}: {error}")
+
+
+def load_baseline(path: Path) -> Results | None:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())  # type: ignore[no-any-return]
+
+
+def write_baseline(path: Path, results: Results) -> None:
+    path.write_text(json.dumps(results, indent=1, sort_keys=True))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# Where the reports go, besides the usual output (c.f. ReportSink)
+
+import json
+import sys
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, TextIO
+
+from lib.lib_package_linter import ReportSink, TestReport, report_to_dict, report_type
+from lib.results_cache import linter_version
+from lib.results_db import ReportRow, Run, connect, store_runs
+
+
+class NdjsonSink(ReportSink):
+    """One json record per line, written as soon as the tests yield the reports"""
+
+    def __init__(self, stream: TextIO = sys.stdout) -> None:
+        self.stream = stream
+        # Tests may run concurrently (c.f. --jobs)
+        self.lock = threading.Lock()
+
+    def write(self, record: dict[str, Any]) -> None:
+        with self.lock:
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+
+    def report(self, suite: str, report: TestReport, elapsed_s: float | None) -> None:
+        self.write(
+            {
+                "record": "report",
+                "suite": suite,
+                "test": report.test_name,
+                "type": report_type(report),
+                "message": report.message,
+                "path": report.path,
+                "line": report.line,
+                "elapsed_s": None if elapsed_s is None else round(elapsed_s, 6),
+            }
+        )
+
+    def summary(self, summary: dict[str, Any]) -> None:
+        self.write({"record": "summary", **summary})
+
+
+SARIF_LEVELS = {"critical": "error", "error": "error", "warning": "warning", "info": "note"}
+
+
+class SarifSink(ReportSink):
+    """A SARIF log (https://sarifweb.azurewebsites.net/), for code scanning tools"""
+
+    def __init__(self, output: Path, app_path: Path) -> None:
+        self.output = output
+        self.app_path = app_path
+        self.rules: dict[str, int] = {}
+        self.results: list[dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def report(self, suite: str, report: TestReport, elapsed_s: float | None) -> None:  # noqa: ARG002
+        level = SARIF_LEVELS.get(report_type(report))
+        # Successes aren't findings
+        if level is None:
+            return
+
+        result: dict[str, Any] = {
+            "ruleId": report.test_name,
+            "level": level,
+            "message": {"text": report.message},
+        }
+        if report.path is not None:
+            location: dict[str, Any] = {
+                "artifactLocation": {"uri": report.path, "uriBaseId": "APPROOT"}
+            }
+            if report.line is not None:
+                location["region"] = {"startLine": report.line}
+            result["locations"] = [{"physicalLocation": location}]
+
+        with self.lock:
+            result["ruleIndex"] = self.rules.setdefault(report.test_name, len(self.rules))
+            self.results.append(result)
+
+    def summary(self, summary: dict[str, Any]) -> None:  # noqa: ARG002
+        sarif = {
+            "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+            "version": "2.1.0",
+            "runs": [
+                {
+                    "tool": {
+                        "driver": {
+                            "name": "package_linter",
+                            "informationUri": "https://github.com/YunoHost/package_linter",
+                            "rules": [{"id": rule} for rule in self.rules],
+                        }
+                    },
+                    "originalUriBaseIds": {
+                        "APPROOT": {"uri": self.app_path.resolve().as_uri() + "/"}
+                    },
+                    "results": self.results,
+                }
+            ],
+        }
+        self.output.write_text(json.dumps(sarif, indent=2) + "\n")
+
+
+class SqliteSink(ReportSink):
+    """The run, with its reports and timings, appended to a SQLite database (c.f. results_db)"""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self.start = time.time()
+        self.reports: list[ReportRow] = []
+        self.lock = threading.Lock()
+
+    def report(self, suite: str, report: TestReport, elapsed_s: float | None) -> None:
+        row = ReportRow(
+            suite,
+            report.test_name,
+            report_type(report),
+            report.message,
+            report.path,
+            report.line,
+            elapsed_s,
+        )
+        with self.lock:
+            self.reports.append(row)
+
+    def summary(self, summary: dict[str, Any]) -> None:
+        run = Run(
+            app=summary["app"],
+            commit=summary["commit"],
+            linter_version=linter_version(),
+            time=self.start,
+            duration_s=time.time() - self.start,
+            level=summary["level"],
+        )
+        with closing(connect(self.db_path)) as db:
+            store_runs(db, [(run, self.reports)])
+
+
+class ResultSink(ReportSink):
+    """The reports, with their suite and timings, kept for the results of a batch run"""
+
+    def __init__(self) -> None:
+        self.reports: list[dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def report(self, suite: str, report: TestReport, elapsed_s: float | None) -> None:
+        data = report_to_dict(report) | {"suite": suite}
+        if elapsed_s is not None:
+            data["elapsed_s"] = round(elapsed_s, 6)
+        with self.lock:
+            self.reports.append(data)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# Queue of apps to lint, in a directory which workers on one or more machines
+# share. Each app is a file, which moves from todo/ to claimed/ when a worker
+# claims it (rename being atomic, a single worker gets it), and whose result
+# is written to done/. The worker keeps touching the claim while linting the
+# app, such that the claims which are no longer touched (i.e. the worker
+# crashed) are put back in todo/ by the other workers. The apps whose workers
+# crashed MAX_ATTEMPTS times are given up on, with a failure as result.
+
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from lib.batch import Results, app_key, failed_result, lint_app, worker_pool
+
+HEARTBEAT_S = 10
+# Claims not touched for that long are considered abandoned
+CLAIM_TIMEOUT_S = 60
+# How often idle workers check whether the apps claimed by others need to be requeued
+POLL_S = 2
+# How many times an app is claimed before it's given up on
+MAX_ATTEMPTS = 3
+
+
+class WorkQueue:
+    def __init__(self, path: Path) -> None:
+        self.todo = path / "todo"
+        self.claimed = path / "claimed"
+        self.done = path / "done"
+
+    def create(self, app_paths: list[Path], costs: dict[str, float]) -> None:
+        """Queue the apps, most expensive first, such that the long ones don't come last"""
+        for directory in [self.todo, self.claimed, self.done]:
+            directory.mkdir(parents=True, exist_ok=True)
+        default = sum(costs.values()) / len(costs) if costs else 1.0
+        ordered = sorted(
+            app_paths, key=lambda path: (-costs.get(app_key(path), default), app_key(path))
+        )
+        for rank, path in enumerate(ordered):
+            # The name orders the apps and counts the attempts at them, and the content
+            # tells which app it is and where it is
+            item = {"app": app_key(path), "path": str(path.resolve())}
+            tmpfile = self.todo / f".{rank:06d}.tmp"
+            tmpfile.write_text(json.dumps(item))
+            tmpfile.replace(self.todo / f"{rank:06d}.0")
+
+    @staticmethod
+    def read(item: Path) -> dict[str, str] | None:
+        """The app of an item, None if the item is gone (e.g. done by another worker)"""
+        try:
+            return json.loads(item.read_text())  # type: ignore[no-any-return]
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def rank(item: Path) -> str:
+        # Items are named <rank>.<attempts so far>
+        return item.name.split(".")[0]
+
+    def requeue_abandoned(self) -> None:
+        for claim in self.claimed.glob("[!.]*"):
+            # Done or requeued by another worker meanwhile
+            with contextlib.suppress(FileNotFoundError):
+                if time.time() - claim.stat().st_mtime <= CLAIM_TIMEOUT_S:
+                    continue
+                attempts = int(claim.name.split(".")[1]) + 1
+                if attempts < MAX_ATTEMPTS:
+                    claim.rename(self.todo / f"{self.rank(claim)}.{attempts}")
+                    continue
+                # Several workers giving up on the app at once write the same result
+                item = self.read(claim)
+                if item is not None:
+                    error = f"the workers linting the app stopped responding {attempts} times"
+                    self.complete(claim, item["app"], failed_result(error))
+
+    def claim(self) -> Path | None:
+        """Claim the next app, waiting for the apps claimed by others to be done, if needed.
+        None once all the apps are done."""
+        while True:
+            self.requeue_abandoned()
+            for item in sorted(self.todo.glob("[!.]*")):
+                claim = self.claimed / item.name
+                try:
+                    # The mtime is kept by rename: refresh it beforehand, such that the
+                    # claim isn't taken for an abandoned one once in claimed/
+                    os.utime(item)
+                    item.rename(claim)
+                # Claimed by another worker meanwhile
+                except FileNotFoundError:
+                    continue
+                # Requeued while its worker was completing it
+                if (self.done / f"{self.rank(claim)}.json").exists():
+                    claim.unlink(missing_ok=True)
+                    continue
+                return claim
+            if not any(self.claimed.glob("[!.]*")):
+                return None
+            time.sleep(POLL_S)
+
+    def complete(self, claim: Path, app: str, result: dict[str, Any]) -> None:
+        rank = self.rank(claim)
+        tmpfile = self.done / f".{rank}.json.tmp.{os.getpid()}"
+        tmpfile.write_text(json.dumps({"app": app, "result": result}))
+        tmpfile.replace(self.done / f"{rank}.json")
+        claim.unlink(missing_ok=True)
+
+    def results(self) -> Results:
+        done = [json.loads(path.read_text()) for path in self.done.glob("*.json")]
+        return dict(sorted((record["app"], record["result"]) for record in done))
+
+    def pending(self) -> list[str]:
+        """The apps not done yet"""
+        items = [*self.todo.glob("[!.]*"), *self.claimed.glob("[!.]*")]
+        return sorted(item["app"] for item in map(self.read, items) if item is not None)
+
+
+def _heartbeat(claim: Path, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_S):
+        # The claim is gone if it was requeued
+        with contextlib.suppress(OSError):
+            os.utime(claim)
+
+
+def _work(queue_path: Path) -> int:
+    """Lint the apps of the queue until there are none left, returns how many were linted"""
+    queue = WorkQueue(queue_path)
+    linted = 0
+    while (claim := queue.claim()) is not None:
+        item = queue.read(claim)
+        # Requeued by another worker meanwhile
+        if item is None:
+            continue
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(claim, stop), daemon=True)
+        heartbeat.start()
+        start = time.monotonic()
+        try:
+            result = lint_app(Path(item["path"]))
+        # Recorded, such that the app isn't claimed over and over again
+        except Exception as e:
+            result = failed_result(e, time.monotonic() - start)
+        finally:
+            stop.set()
+            heartbeat.join()
+        queue.complete(claim, item["app"], result)
+        linted += 1
+    return linted
+
+
+def work(queue_path: Path, jobs: int) -> int:
+    with worker_pool(jobs) as executor:
+        return sum(executor.map(_work, [queue_path] * jobs))
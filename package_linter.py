@@ -1,21 +1,141 @@
 #!/usr/bin/env python3
 
 import argparse
+import itertools
+import os
+import sys
 import textwrap
+import time
+from collections.abc import Callable
 from pathlib import Path
 
-from lib.print import _print, set_output_json
-from tests.test_app import App
+# Only what's needed to parse the command line and ask the daemon to lint: the
+# linter itself is only loaded when linting in this process
+from lib.daemon_client import DAEMON_SOCKET, send
+from lib.options import APPS_REPO, GITHUB_API, PROFILES, level_blockers
+from lib.print import (
+    _print,
+    is_color_output,
+    set_color,
+    set_output_json,
+    set_output_ndjson,
+)
+from lib.results_cache import linter_version
 
 
-def main() -> None:
+def lint_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
-    parser.add_argument("app_path", type=Path, help="The path to the app to lint")
-    parser.add_argument("--json", action="store_true", help="Output json instead of plain text")
-    args = parser.parse_args()
+    parser.add_argument(
+        "app_path",
+        type=Path,
+        help="The path to the app to lint, or to a .zip/.tar(.gz) archive of it ('-' to read "
+        "the archive from stdin)",
+    )
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--json", action="store_true", help="Output json instead of plain text")
+    output.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Output each report as a json line as soon as it is produced, followed by a summary",
+    )
+    parser.add_argument(
+        "--no-color",
+        action="store_true",
+        help="Output plain text without colors (also when NO_COLOR is set)",
+    )
+    parser.add_argument(
+        "--sarif",
+        type=Path,
+        metavar="FILE",
+        help="Also write the reports to FILE, in the SARIF format used by code scanning tools",
+    )
+    parser.add_argument(
+        "--results-db",
+        type=Path,
+        metavar="FILE",
+        help="Also append the run, with its reports and timings, to the SQLite database FILE "
+        "(c.f. the 'query-results' command)",
+    )
+    parser.add_argument(
+        "--git-ref",
+        metavar="REF",
+        help="Lint the app as of this commit, reading it from the git repository at app_path "
+        "(which may be bare) rather than from the files on disk",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=list(PROFILES),
+        default="full",
+        help="Set of checks to run. 'precommit' only runs the local, cheap checks on the files "
+        "staged in git, within a latency budget",
+    )
+    parser.add_argument(
+        "--since",
+        metavar="REF",
+        help="Only lint what changed since this git ref, reusing the results cached for REF "
+        "for everything else",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse the results of the tests whose declared inputs didn't change since a "
+        "previous run",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of tests to run concurrently. The output is the same as when running "
+        "them one after another",
+    )
+    parser.add_argument(
+        "--catalog-repo",
+        metavar="URL",
+        help=f"Git repository of the apps catalog (default: {APPS_REPO}, or the origin of the "
+        "existing clone)",
+    )
+    parser.add_argument(
+        "--github-api",
+        metavar="URL",
+        help=f"Base URL of the GitHub API (default: {GITHUB_API})",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Stop at the first error, skipping the tests which didn't run yet",
+    )
+    parser.add_argument(
+        "--max-level-check",
+        type=int,
+        metavar="N",
+        help="Fail if the app can't reach level N, stopping as soon as that's known and "
+        "skipping the tests which didn't run yet",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Lint in this process even if a daemon is running (c.f. the 'daemon' command)",
+    )
+    parser.add_argument(
+        "--daemon-socket",
+        type=Path,
+        default=DAEMON_SOCKET,
+        help="Socket the daemon listens on",
+    )
+    return parser
+
+
+def lint(argv: list[str]) -> int:
+    parser = lint_parser()
+    args = parser.parse_args(argv)
 
     if args.json:
         set_output_json()
+    if args.ndjson:
+        set_output_ndjson()
+    if args.no_color:
+        set_color(enabled=False)
 
     msg = """\
             [YunoHost App Package Linter]
@@ -29,8 +149,477 @@ def main() -> None:
     """
     _print(textwrap.dedent(msg))
 
-    app = App(args.app_path)
-    app.analyze()
+    stop_on = set()
+    if args.fail_fast:
+        stop_on |= {"error", "critical"}
+    if args.max_level_check is not None:
+        stop_on |= level_blockers(args.max_level_check)
+
+    # The reports only reach the sinks when linting in-process, and the daemon
+    # can't read our stdin
+    from_stdin = str(args.app_path) == "-"
+    use_sinks = args.ndjson or args.sarif or args.results_db
+    if not args.no_daemon and not use_sinks and not from_stdin:
+        request = {
+            "path": str(args.app_path.resolve()),
+            "json": args.json,
+            "color": is_color_output(),
+            "git_ref": args.git_ref,
+            "profile": args.profile,
+            "since": args.since,
+            "cache": args.cache,
+            "jobs": args.jobs,
+            "stop_on": sorted(stop_on),
+            "max_level_check": args.max_level_check,
+            "catalog_repo": args.catalog_repo,
+            "github_api": args.github_api,
+            "linter_version": linter_version(),
+        }
+        response = send(request, args.daemon_socket)
+        if response is not None and "error" not in response:
+            sys.stdout.write(response["output"])
+            return int(response["exit_code"])
+
+    # No daemon to do the job: only now pay for loading the whole linter
+    from lib.app_source import open_app  # noqa: PLC0415
+    from lib.lib_package_linter import (  # noqa: PLC0415
+        add_sink,
+        set_catalog_repo,
+        set_github_api,
+        set_jobs,
+        set_max_level_check,
+        set_profile,
+        set_stop_on,
+        set_use_tests_cache,
+    )
+    from tests.test_app import App  # noqa: PLC0415
+
+    if args.ndjson:
+        from lib.sinks import NdjsonSink  # noqa: PLC0415
+
+        add_sink(NdjsonSink())
+    if args.sarif:
+        from lib.sinks import SarifSink  # noqa: PLC0415
+
+        add_sink(SarifSink(args.sarif, args.app_path))
+    if args.results_db:
+        from lib.sinks import SqliteSink  # noqa: PLC0415
+
+        add_sink(SqliteSink(args.results_db))
+
+    set_profile(args.profile)
+    set_use_tests_cache(enabled=args.cache)
+    set_jobs(args.jobs)
+    set_stop_on(stop_on)
+    set_max_level_check(args.max_level_check)
+    set_catalog_repo(args.catalog_repo)
+    set_github_api(args.github_api)
+
+    try:
+        app_path = open_app(args.app_path, args.git_ref)
+    except RuntimeError as e:
+        parser.error(str(e))
+    app = App(app_path)
+    return app.analyze(since=args.since)
+
+
+def daemon(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py daemon",
+        description="Keep the linter loaded, and lint the apps on behalf of package_linter.py",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=DAEMON_SOCKET,
+        help="Socket to listen on",
+    )
+    args = parser.parse_args(argv)
+
+    from lib.daemon import serve  # noqa: PLC0415
+
+    serve(args.socket)
+    return 0
+
+
+def generate_helpers_registry(argv: list[str]) -> int:
+    from lib.helpers_registry import REGISTRY_FILE, index_helpers, write_registry  # noqa: PLC0415
+
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py generate-helpers-registry",
+        description="Regenerate the list of official helpers from a checkout of YunoHost",
+    )
+    parser.add_argument(
+        "helpers_path",
+        type=Path,
+        help="Path to the helpers of YunoHost, containing helpers.v*.d/ (or helpers.d/)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=REGISTRY_FILE,
+        help="Where to write the registry",
+    )
+    args = parser.parse_args(argv)
+
+    registry = index_helpers(args.helpers_path)
+    write_registry(registry, args.output)
+    _print(f"Indexed {len(registry['helpers'])} helpers into {args.output}")
+    return 0
+
+
+def rule_impact(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py rule-impact",
+        description="Run some tests across many apps, and show how their reports changed since "
+        "a baseline run",
+    )
+    parser.add_argument("app_paths", type=Path, nargs="+", help="Directories of the apps")
+    parser.add_argument(
+        "-t",
+        "--test",
+        dest="tests",
+        action="append",
+        required=True,
+        metavar="SUITE.TEST",
+        help="Test to run (e.g. Script.bad_if_syntax), can be repeated",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        required=True,
+        metavar="FILE",
+        help="Reports of a previous run to compare with. Created if it doesn't exist",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Replace the baseline with the reports of this run",
+    )
+    parser.add_argument(
+        "--git-ref",
+        metavar="REF",
+        help="Lint the apps as of this commit, reading them from their git repositories "
+        "(which may be bare) rather than from the files on disk",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of apps to lint concurrently",
+    )
+    args = parser.parse_args(argv)
+
+    from lib import rule_impact  # noqa: PLC0415
+
+    unknown = rule_impact.unknown_tests(args.tests)
+    if unknown:
+        suites = ", ".join(rule_impact.LOCAL_SUITES)
+        parser.error(f"unknown tests {', '.join(unknown)} (only the tests of {suites} can run)")
+    network = rule_impact.network_tests(args.tests)
+    if network:
+        parser.error(
+            f"the tests {', '.join(network)} need the network, which rule-impact never hits"
+        )
+
+    app_paths = [path for path in args.app_paths if path.is_dir()]
+    results, failures = rule_impact.run(args.tests, app_paths, args.jobs, args.git_ref)
+
+    baseline = rule_impact.load_baseline(args.baseline)
+    if baseline is None:
+        rule_impact.write_baseline(args.baseline, results)
+        _print(f"Stored the reports of {len(results)} apps as the baseline in {args.baseline}")
+    else:
+        rule_impact.display_diff(baseline, results)
+        if args.update_baseline:
+            rule_impact.write_baseline(args.baseline, results)
+    rule_impact.display_failures(failures)
+    return 1 if failures else 0
+
+
+def batch(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py batch",
+        description="Lint many apps, possibly only a shard of them, and write their results to "
+        "a file (c.f. the 'merge' command)",
+    )
+    parser.add_argument("app_paths", type=Path, nargs="+", help="Directories of the apps")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        required=True,
+        metavar="FILE",
+        help="Where to write the results of the apps",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="INDEX/COUNT",
+        help="Only lint the INDEX-th (starting at 1) of COUNT shards of the apps. All the "
+        "shards must be given the same apps and --timings",
+    )
+    parser.add_argument(
+        "--timings",
+        type=Path,
+        metavar="FILE",
+        help="Results of a previous run, to balance the shards according to how long each "
+        "app took to lint",
+    )
+    parser.add_argument(
+        "--results-db",
+        type=Path,
+        metavar="FILE",
+        help="Also append the runs of the apps to the SQLite database FILE "
+        "(c.f. the 'query-results' command)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of apps to lint concurrently",
+    )
+    args = parser.parse_args(argv)
+
+    from lib import batch  # noqa: PLC0415
+
+    app_paths = [path for path in args.app_paths if path.is_dir()]
+    shard = None
+    if args.shard:
+        try:
+            shard = batch.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        costs = batch.load_costs(args.timings) if args.timings else {}
+        app_paths = batch.shard_apps(app_paths, *shard, costs)
+
+    results = batch.run(app_paths, args.jobs)
+    batch.write_results(args.output, results, shard)
+    if args.results_db:
+        batch.store_results(args.results_db, results, linter_version())
+    batch.display_summary(results)
+    return 1 if batch.failures(results) else 0
+
+
+def merge(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py merge",
+        description="Merge the results of the shards of a 'batch' run",
+    )
+    parser.add_argument("shard_files", type=Path, nargs="+", help="Results of the shards")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        required=True,
+        metavar="FILE",
+        help="Where to write the results of all the apps",
+    )
+    parser.add_argument(
+        "--results-db",
+        type=Path,
+        metavar="FILE",
+        help="Also append the runs of the apps to the SQLite database FILE "
+        "(c.f. the 'query-results' command)",
+    )
+    args = parser.parse_args(argv)
+
+    from lib import batch  # noqa: PLC0415
+
+    results, problems = batch.merge(args.shard_files)
+    for problem in problems:
+        _print(problem)
+    batch.write_results(args.output, results)
+    if args.results_db:
+        batch.store_results(args.results_db, results, linter_version())
+    batch.display_summary(results)
+    return 1 if problems or batch.failures(results) else 0
+
+
+def queue(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py queue",
+        description="Lint many apps with workers, possibly on several machines, taking the apps "
+        "one at a time from a queue in a shared directory",
+    )
+    parser.add_argument("queue", type=Path, help="Directory of the queue")
+    actions = parser.add_subparsers(dest="action", required=True)
+    create = actions.add_parser("create", help="Queue the apps")
+    create.add_argument("app_paths", type=Path, nargs="+", help="Directories of the apps")
+    create.add_argument(
+        "--timings",
+        type=Path,
+        metavar="FILE",
+        help="Results of a previous run, to queue the apps which take the longest first",
+    )
+    work = actions.add_parser("work", help="Lint the apps of the queue until there are none left")
+    work.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of apps to lint concurrently",
+    )
+    collect = actions.add_parser("collect", help="Write the results of the apps linted")
+    collect.add_argument(
+        "--output",
+        type=Path,
+        required=True,
+        metavar="FILE",
+        help="Where to write the results of the apps",
+    )
+    collect.add_argument(
+        "--results-db",
+        type=Path,
+        metavar="FILE",
+        help="Also append the runs of the apps to the SQLite database FILE "
+        "(c.f. the 'query-results' command)",
+    )
+    args = parser.parse_args(argv)
+
+    from lib import batch  # noqa: PLC0415
+    from lib.work_queue import WorkQueue  # noqa: PLC0415
+    from lib.work_queue import work as work_on  # noqa: PLC0415
+
+    if args.action == "create":
+        app_paths = [path for path in args.app_paths if path.is_dir()]
+        costs = batch.load_costs(args.timings) if args.timings else {}
+        WorkQueue(args.queue).create(app_paths, costs)
+        _print(f"Queued {len(app_paths)} apps in {args.queue}")
+        return 0
+
+    if args.action == "work":
+        linted = work_on(args.queue, args.jobs)
+        _print(f"Linted {linted} apps")
+        return 0
+
+    work_queue = WorkQueue(args.queue)
+    results = work_queue.results()
+    batch.write_results(args.output, results)
+    if args.results_db:
+        batch.store_results(args.results_db, results, linter_version())
+    batch.display_summary(results)
+    pending = work_queue.pending()
+    if pending:
+        _print(f"{len(pending)} apps are not linted yet: {', '.join(pending)}")
+    return 1 if pending or batch.failures(results) else 0
+
+
+def prefetch_issues(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py prefetch-issues",
+        description="Fetch at once the issues of all the apps of the catalog hosted on GitHub, "
+        "for the linters run within the next hour to reuse",
+    )
+    parser.add_argument(
+        "--catalog-repo",
+        metavar="URL",
+        help=f"Git repository of the apps catalog (default: {APPS_REPO}, or the origin of the "
+        "existing clone)",
+    )
+    parser.add_argument(
+        "--github-api",
+        metavar="URL",
+        help=f"Base URL of the GitHub API (default: {GITHUB_API})",
+    )
+    args = parser.parse_args(argv)
+
+    from lib.github_issues import ISSUES_CACHE, search_issues, write_cache  # noqa: PLC0415
+    from lib.lib_package_linter import (  # noqa: PLC0415
+        get_app_list,
+        set_catalog_repo,
+        set_github_api,
+    )
+    from tests.test_catalog import fetch_catalog  # noqa: PLC0415
+
+    set_catalog_repo(args.catalog_repo)
+    set_github_api(args.github_api)
+    fetch_catalog()
+    repos = [
+        app["url"].replace("https://github.com/", "")
+        for app in get_app_list().values()
+        if "github.com" in app["url"]
+    ]
+    issues = search_issues(repos)
+    write_cache(issues)
+    _print(f"Prefetched the issues of {len(issues)}/{len(repos)} apps into {ISSUES_CACHE}")
+    return 0
+
+
+def query_results(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="package_linter.py query-results",
+        description="Query the history of the runs stored with --results-db",
+    )
+    parser.add_argument("db", type=Path, help="The SQLite database")
+    queries = parser.add_subparsers(dest="query", required=True)
+    regressions = queries.add_parser(
+        "regressions", help="The apps which fell below a level since some days ago"
+    )
+    regressions.add_argument("--level", type=int, default=7, help="The level they were at")
+    regressions.add_argument("--days", type=float, default=7, help="Number of days ago")
+    rule_history = queries.add_parser(
+        "rule-history", help="How long a test has been reporting warnings/errors for an app"
+    )
+    rule_history.add_argument("test", help="The test, e.g. Script.bad_if_syntax")
+    rule_history.add_argument("app", help="The app id")
+    args = parser.parse_args(argv)
+
+    from contextlib import closing  # noqa: PLC0415
+
+    from lib import results_db  # noqa: PLC0415
+
+    if not args.db.exists():
+        parser.error(f"{args.db} doesn't exist")
+
+    def date(timestamp: float) -> str:
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+    with closing(results_db.connect(args.db)) as db:
+        if args.query == "regressions":
+            since = time.time() - args.days * 86400
+            for regression in results_db.regressions(db, args.level, since):
+                _print(
+                    f"{regression.app}: level {regression.level_before} -> {regression.level} "
+                    f"(commit {regression.commit or 'unknown'}, {date(regression.time)})"
+                )
+            return 0
+
+        history = results_db.rule_history(db, args.test, args.app)
+        if not history:
+            _print(f"No run of {args.app}")
+            return 0
+        for run in history:
+            _print(f"{date(run.time)}  {run.commit or 'unknown':40}  {run.nb_reports}")
+        # The runs, up to the latest one, in which the test fired
+        streak = list(itertools.takewhile(lambda run: run.nb_reports, reversed(history)))
+        if streak:
+            _print(
+                f"{args.test} has been firing for {args.app} in the last {len(streak)} runs, "
+                f"since {date(streak[-1].time)}"
+            )
+        else:
+            _print(f"{args.test} doesn't fire for {args.app} as of the latest run")
+    return 0
+
+
+COMMANDS: dict[str, Callable[[list[str]], int]] = {
+    "batch": batch,
+    "daemon": daemon,
+    "generate-helpers-registry": generate_helpers_registry,
+    "merge": merge,
+    "prefetch-issues": prefetch_issues,
+    "queue": queue,
+    "query-results": query_results,
+    "rule-impact": rule_impact,
+}
+
+
+def main() -> None:
+    # An app (or archive) named like a command is linted: the command can still be
+    # ran from another directory
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS and not Path(sys.argv[1]).exists():
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
+    sys.exit(lint(sys.argv[1:]))
 
 
 if __name__ == "__main__":
@@ -2,26 +2,53 @@
 
 import copy
 import json
-import subprocess
-import sys
+import re
 import tomllib
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from pathlib import Path
-
+from typing import Any
+
+from lib import lib_package_linter
+from lib.app_source import AppPath, SourcePath, relative_path, text_files
+from lib.commands_table import CommandsTable
+from lib.helpers_registry import (
+    deprecated_helpers_in_v2,
+    deprecated_helpers_in_v2p1,
+    official_helpers,
+    parse_version,
+)
+from lib.helpers_usage import HelpersUsage, index_helpers_usage
 from lib.lib_package_linter import (
+    LatencyBudget,
     ReportError,
     ReportInfo,
     ReportSuccess,
     ReportWarning,
+    TestReport,
     TestResult,
     TestSuite,
     config_panel_v1_schema,
+    emit,
+    emit_summary,
+    git_changed_files,
+    git_commit,
+    git_is_clean,
+    git_staged_files,
+    grep,
+    json_report,
     not_empty,
+    report_from_dict,
+    report_to_dict,
+    set_budget,
     test,
     tests_reports,
     validate_schema,
 )
-from lib.print import _print, is_json_output
+from lib.options import PROFILES
+from lib.print import _print, is_json_output, section
+from lib.results_cache import load_results, store_results
 from tests.test_catalog import AppCatalog
 from tests.test_configurations import Configurations
 from tests.test_issues import Issues
@@ -31,286 +58,227 @@ from tests.test_scripts import Script
 scriptnames = ["_common.sh", "install", "remove", "upgrade", "backup", "restore"]
 
 
-# ############################################################################
-#  Helper list
-# ############################################################################
-
-# Generated May 20 2024 using:
-# cat /path/to/yunohost/data/helpers.d/* | grep  "^ynh_" | tr -d '(){ ' > helperlist 2>/dev/null
-# for HELPER in $(cat helperlist); do
-#    REQUIRE=$(
-#        grep -whB5 "^$HELPER" /path/to/yunohost/data/helpers.d/* 2>/dev/null \
-#        | grep "Requires .* or higher\." \
-#        | grep -o -E "[0-9].[0-9].[0-9]"
-#     )
-#     echo "'$HELPER': '$REQUIRE'",
-# done | tr "'" '"'
-
-official_helpers = {
-    "ynh_install_apps": "",
-    "ynh_remove_apps": "",
-    "ynh_spawn_app_shell": "",
-    "ynh_wait_dpkg_free": "3.3.1",
-    "ynh_package_is_installed": "2.2.4",
-    "ynh_package_version": "2.2.4",
-    "ynh_apt": "2.4.0",
-    "ynh_package_update": "2.2.4",
-    "ynh_package_install": "2.2.4",
-    "ynh_package_remove": "2.2.4",
-    "ynh_package_autoremove": "2.2.4",
-    "ynh_package_autopurge": "2.7.2",
-    "ynh_package_install_from_equivs": "2.2.4",
-    "ynh_install_app_dependencies": "2.6.4",
-    "ynh_add_app_dependencies": "3.8.1",
-    "ynh_remove_app_dependencies": "2.6.4",
-    "ynh_install_extra_app_dependencies": "3.8.1",
-    "ynh_install_extra_repo": "3.8.1",
-    "ynh_remove_extra_repo": "3.8.1",
-    "ynh_add_repo": "3.8.1",
-    "ynh_pin_repo": "3.8.1",
-    "ynh_backup": "2.4.0",
-    "ynh_restore": "2.6.4",
-    "ynh_restore_file": "2.6.4",
-    "ynh_store_file_checksum": "2.6.4",
-    "ynh_backup_if_checksum_is_different": "2.6.4",
-    "ynh_delete_file_checksum": "3.3.1",
-    "ynh_backup_archive_exists": "",
-    "ynh_backup_before_upgrade": "2.7.2",
-    "ynh_restore_upgradebackup": "2.7.2",
-    "ynh_app_config_get_one": "",
-    # Commenting out config panel helpers
-    # that may legitimately be overwritten from config script
-    # "ynh_app_config_get": "",
-    # "ynh_app_config_show": "",
-    # "ynh_app_config_validate": "",
-    "ynh_app_config_apply_one": "",
-    # "ynh_app_config_apply": "",
-    # "ynh_app_action_run": "",
-    # "ynh_app_config_run": "",
-    "ynh_add_fail2ban_config": "4.1.0",
-    "ynh_remove_fail2ban_config": "3.5.0",
-    "ynh_handle_getopts_args": "3.2.2",
-    "ynh_go_try_bash_extension": "",
-    "ynh_use_go": "",
-    "ynh_install_go": "",
-    "ynh_remove_go": "",
-    "ynh_cleanup_go": "",
-    "ynh_get_ram": "3.8.1",
-    "ynh_require_ram": "3.8.1",
-    "ynh_die": "2.4.0",
-    "ynh_print_info": "3.2.0",
-    "ynh_print_log": "3.2.0",
-    "ynh_print_warn": "3.2.0",
-    "ynh_print_err": "3.2.0",
-    "ynh_exec_err": "3.2.0",
-    "ynh_exec_warn": "3.2.0",
-    "ynh_exec_warn_less": "3.2.0",
-    "ynh_exec_quiet": "3.2.0",
-    "ynh_exec_fully_quiet": "3.2.0",
-    "ynh_exec_and_print_stderr_only_if_error": "",
-    "ynh_print_OFF": "3.2.0",
-    "ynh_print_ON": "3.2.0",
-    "ynh_script_progression": "3.5.0",
-    "ynh_return": "3.6.0",
-    "ynh_use_logrotate": "2.6.4",
-    "ynh_remove_logrotate": "2.6.4",
-    "ynh_multimedia_build_main_dir": "",
-    "ynh_multimedia_addfolder": "",
-    "ynh_multimedia_addaccess": "",
-    "ynh_mysql_connect_as": "2.2.4",
-    "ynh_mysql_execute_as_root": "2.2.4",
-    "ynh_mysql_execute_file_as_root": "2.2.4",
-    "ynh_mysql_create_db": "2.2.4",
-    "ynh_mysql_drop_db": "2.2.4",
-    "ynh_mysql_dump_db": "2.2.4",
-    "ynh_mysql_create_user": "2.2.4",
-    "ynh_mysql_user_exists": "2.2.4",
-    "ynh_mysql_drop_user": "2.2.4",
-    "ynh_mysql_setup_db": "2.6.4",
-    "ynh_mysql_remove_db": "2.6.4",
-    "ynh_find_port": "2.6.4",
-    "ynh_port_available": "3.8.0",
-    "ynh_validate_ip": "2.2.4",
-    "ynh_validate_ip4": "2.2.4",
-    "ynh_validate_ip6": "2.2.4",
-    "ynh_add_nginx_config": "4.1.0",
-    "ynh_remove_nginx_config": "2.7.2",
-    "ynh_change_url_nginx_config": "11.1.9",
-    "ynh_use_nodejs": "2.7.1",
-    "ynh_install_nodejs": "2.7.1",
-    "ynh_remove_nodejs": "2.7.1",
-    "ynh_cron_upgrade_node": "2.7.1",
-    "ynh_permission_create": "3.7.0",
-    "ynh_permission_delete": "3.7.0",
-    "ynh_permission_exists": "3.7.0",
-    "ynh_permission_url": "3.7.0",
-    "ynh_permission_update": "3.7.0",
-    "ynh_permission_has_user": "3.7.1",
-    "ynh_legacy_permissions_exists": "4.1.2",
-    "ynh_legacy_permissions_delete_all": "4.1.2",
-    "ynh_add_fpm_config": "4.1.0",
-    "ynh_remove_fpm_config": "2.7.2",
-    "ynh_get_scalable_phpfpm": "",
-    "ynh_composer_exec": "",
-    "ynh_install_composer": "",
-    "ynh_psql_connect_as": "3.5.0",
-    "ynh_psql_execute_as_root": "3.5.0",
-    "ynh_psql_execute_file_as_root": "3.5.0",
-    "ynh_psql_create_db": "3.5.0",
-    "ynh_psql_drop_db": "3.5.0",
-    "ynh_psql_dump_db": "3.5.0",
-    "ynh_psql_create_user": "3.5.0",
-    "ynh_psql_user_exists": "3.5.0",
-    "ynh_psql_database_exists": "3.5.0",
-    "ynh_psql_drop_user": "3.5.0",
-    "ynh_psql_setup_db": "2.7.1",
-    "ynh_psql_remove_db": "2.7.1",
-    "ynh_psql_test_if_first_run": "2.7.1",
-    "ynh_redis_get_free_db": "",
-    "ynh_redis_remove_db": "",
-    "ynh_use_ruby": "",
-    "ynh_install_ruby": "",
-    "ynh_remove_ruby": "",
-    "ynh_cleanup_ruby": "",
-    "ynh_ruby_try_bash_extension": "",
-    "ynh_app_setting_get": "2.2.4",
-    "ynh_app_setting_set": "2.2.4",
-    "ynh_app_setting_delete": "2.2.4",
-    "ynh_app_setting": "",
-    "ynh_webpath_available": "2.6.4",
-    "ynh_webpath_register": "2.6.4",
-    "ynh_string_random": "2.2.4",
-    "ynh_replace_string": "2.6.4",
-    "ynh_replace_special_string": "2.7.7",
-    "ynh_sanitize_dbid": "2.2.4",
-    "ynh_normalize_url_path": "2.6.4",
-    "ynh_add_systemd_config": "4.1.0",
-    "ynh_remove_systemd_config": "2.7.2",
-    "ynh_systemd_action": "3.5.0",
-    "ynh_clean_check_starting": "3.5.0",
-    "ynh_user_exists": "2.2.4",
-    "ynh_user_get_info": "2.2.4",
-    "ynh_user_list": "2.4.0",
-    "ynh_system_user_exists": "2.2.4",
-    "ynh_system_group_exists": "3.5.0",
-    "ynh_system_user_create": "2.6.4",
-    "ynh_system_user_delete": "2.6.4",
-    "ynh_exec_as": "4.1.7",
-    "ynh_exit_properly": "2.6.4",
-    "ynh_abort_if_errors": "2.6.4",
-    "ynh_setup_source": "2.6.4",
-    "ynh_local_curl": "2.6.4",
-    "ynh_add_config": "4.1.0",
-    "ynh_replace_vars": "4.1.0",
-    "ynh_read_var_in_file": "",
-    "ynh_write_var_in_file": "",
-    "ynh_render_template": "",
-    "ynh_get_debian_release": "2.7.1",
-    "ynh_secure_remove": "2.6.4",
-    "ynh_read_manifest": "3.5.0",
-    "ynh_app_upstream_version": "3.5.0",
-    "ynh_app_package_version": "3.5.0",
-    "ynh_check_app_version_changed": "3.5.0",
-    "ynh_compare_current_package_version": "3.8.0",
-}
-
-deprecated_helpers_in_v2 = [
-    ("ynh_clean_setup", "(?)"),
-    ("ynh_abort_if_errors", "nothing, handled by the core, just get rid of it"),
-    ("ynh_backup_before_upgrade", "nothing, handled by the core, just get rid of it"),
-    ("ynh_restore_upgradebackup", "nothing, handled by the core, just get rid of it"),
-    ("ynh_system_user_create", "the system_user resource"),
-    ("ynh_system_user_delete", "the system_user resource"),
-    ("ynh_webpath_register", "the permission resource"),
-    ("ynh_webpath_available", "the permission resource"),
-    ("ynh_permission_update", "the permission resource"),
-    ("ynh_permission_create", "the permission resource"),
-    ("ynh_permission_exists", "the permission resource"),
-    ("ynh_legacy_permissions_exists", "the permission resource"),
-    ("ynh_legacy_permissions_delete_all", "the permission resource"),
-    ("ynh_install_app_dependencies", "the apt resource"),
-    ("ynh_install_extra_app_dependencies", "the apt source"),
-    ("ynh_remove_app_dependencies", "the apt resource"),
-    ("ynh_psql_test_if_first_run", "the database resource"),
-    ("ynh_mysql_setup_db", "the database resource"),
-    ("ynh_psql_setup_db", "the database resource"),
-    ("ynh_mysql_remove_db", "the database resource"),
-    ("ynh_psql_remove_db", "the database resource"),
-    ("ynh_find_port", "the port resource"),
-    (
-        "ynh_send_readme_to_admin",
-        "the doc/POST_INSTALL.md or POST_UPGRADE.md mechanism",
-    ),
-]
-
-deprecated_helpers_in_v2p1 = [
-    ("ynh_nodejs_install", "the nodejs resource"),
-    ("ynh_nodejs_remove", "the nodejs resource"),
-    ("ynh_ruby_install", "the ruby resource"),
-    ("ynh_ruby_remove", "the ruby resource"),
-    ("ynh_go_install", "the go resource"),
-    ("ynh_go_remove", "the go resource"),
-    ("ynh_composer_install", "the composer resource"),
-]
-
-
 class App(TestSuite):
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: AppPath) -> None:
 
         _print(f"  Analyzing app {path}...")
         self.path = path
         self.manifest_ = Manifest(self.path)
         self.manifest = self.manifest_.manifest
         self.scripts = {f: Script(self.path, f, self.manifest.get("id", "")) for f in scriptnames}
+        # The other scripts may call the functions defined in _common.sh
+        for name, script in self.scripts.items():
+            if name != "_common.sh":
+                script.common = self.scripts["_common.sh"]
         self.configurations = Configurations(self)
-        self.app_catalog = AppCatalog(self.manifest["id"])
-        self.issues = Issues(self.manifest["id"])
+        self.app_path = path
 
         self.test_suite_name = "General stuff, misc helper usage"
 
         _print()
 
-    def analyze(self) -> None:
-
-        self.manifest_.run_tests()
-
-        for script in [self.scripts[s] for s in scriptnames if self.scripts[s].exists]:
-            script.run_tests()
-
-        self.run_tests()
-        self.configurations.run_tests()
-        self.app_catalog.run_tests()
-        self.issues.run_tests()
-
-        self.report()
-
-    def report(self) -> None:
-
-        _print(" =======")
+    def input_manifest(self) -> dict[str, Any]:
+        return self.manifest
+
+    # The catalog and issues suites only hit the network once prepared (i.e. right
+    # before they run), and are only created when the profile runs them
+    @cached_property
+    def app_catalog(self) -> AppCatalog:
+        return AppCatalog(self.manifest["id"])
+
+    @cached_property
+    def issues(self) -> Issues:
+        return Issues(self.manifest["id"])
+
+    @cached_property
+    def helpers_usage(self) -> HelpersUsage:
+        return index_helpers_usage(self.path / "scripts")
+
+    @cached_property
+    def commands(self) -> CommandsTable:
+        table = CommandsTable()
+        for name, script in self.scripts.items():
+            if script.exists:
+                table.add_script(name, zip(script.line_numbers, script.lines, strict=True))
+        return table
+
+    def suites(self) -> list[TestSuite]:
+        profile = lib_package_linter.profile
+
+        # Only an app on disk has a git index
+        staged = None
+        if profile.staged_only and isinstance(self.path, Path):
+            staged = git_staged_files(self.path)
+            if staged is None:
+                _print(" Not in a git repository, linting all files instead of the staged ones")
+
+        def is_staged(*prefixes: str) -> bool:
+            return staged is None or any(f.startswith(prefixes) for f in staged)
+
+        suites: list[TestSuite] = []
+        if "Manifest" in profile.suites and is_staged("manifest.toml"):
+            suites.append(self.manifest_)
+        if "Script" in profile.suites:
+            suites += [
+                self.scripts[s]
+                for s in scriptnames
+                if self.scripts[s].exists and is_staged(f"scripts/{s}")
+            ]
+        if "App" in profile.suites:
+            suites.append(self)
+        if "Configurations" in profile.suites and is_staged("conf/", "tests.toml"):
+            suites.append(self.configurations)
+        if "AppCatalog" in profile.suites:
+            suites.append(self.app_catalog)
+        if "Issues" in profile.suites:
+            suites.append(self.issues)
+        return suites
+
+    def analyze(self, since: str | None = None) -> int:
+
+        profile = lib_package_linter.profile
+        suites = self.suites()
+
+        if profile.budget_s is not None:
+            nb_tests = sum(len(list(suite.selected_tests())) for suite in suites)
+            set_budget(LatencyBudget(profile.budget_s, nb_tests))
+
+        # Reuse the results computed for the 'since' commit, for the suites
+        # that are not affected by the files changed since then
+        cached = None
+        changed_files: set[str] = set()
+        if since and isinstance(self.path, Path):
+            since_commit = git_commit(self.path, since)
+            cached = load_results(self.manifest["id"], since_commit) if since_commit else None
+            if cached is None:
+                _print(f" No cached results for {since}, linting everything")
+            else:
+                changed_files = git_changed_files(self.path, since)
+
+        def is_cached(suite: TestSuite) -> bool:
+            return (
+                cached is not None
+                and suite.test_suite_name in cached
+                and not suite.affected_by(changed_files)
+            )
+
+        # The scripts are independent from each other, so they can be linted
+        # concurrently, while still being displayed in order
+        with ThreadPoolExecutor(max_workers=lib_package_linter.jobs) as executor:
+            scripts_reports = {
+                suite.test_suite_name: executor.submit(suite.collect_reports)
+                for suite in suites
+                if isinstance(suite, Script)
+                and not is_cached(suite)
+                and lib_package_linter.jobs > 1
+            }
+
+            results: dict[str, list[TestReport]] = {}
+            for suite in suites:
+                if cached is not None and is_cached(suite):
+                    reports = [report_from_dict(r) for r in cached[suite.test_suite_name]]
+                    for report in reports:
+                        emit(suite.test_suite_name, report)
+                    suite.display_reports(reports, cached=True)
+                elif suite.test_suite_name in scripts_reports:
+                    reports = scripts_reports[suite.test_suite_name].result()
+                    suite.display_reports(reports)
+                elif lib_package_linter.verdict_known.is_set():
+                    continue
+                else:
+                    suite.prepare()
+                    reports = suite.run_tests()
+                results[suite.test_suite_name] = reports
+
+        # Partial runs can't be reused later on
+        head_commit = self.linted_commit
+        if (
+            head_commit
+            and profile == PROFILES["full"]
+            and not lib_package_linter.verdict_known.is_set()
+        ):
+            store_results(
+                self.manifest["id"],
+                head_commit,
+                {suite: [report_to_dict(r) for r in reports] for suite, reports in results.items()},
+            )
+
+        return self.report()
+
+    @cached_property
+    def linted_commit(self) -> str | None:
+        """The commit whose files are linted, None if they're not the ones of a commit"""
+        # The files read from a git repository are always the ones of the commit
+        if isinstance(self.path, SourcePath):
+            return self.path.store.commit
+        head_commit = git_commit(self.path)
+        return head_commit if head_commit and git_is_clean(self.path) else None
+
+    def report(self) -> int:
+
+        # The verdict is displayed at once
+        with section():
+            _print(" =======")
+
+            if lib_package_linter.budget:
+                lib_package_linter.budget.display()
+
+            if lib_package_linter.verdict_known.is_set():
+                _print(" Stopped early, the remaining tests couldn't change the verdict")
+
+            # These are meant to be the last stuff running, they are based on
+            # previously computed errors/warning/successes
+            # The level only makes sense when running the whole set of suites
+            if (
+                "AppCatalog" in lib_package_linter.profile.suites
+                and not lib_package_linter.verdict_known.is_set()
+            ):
+                self.run_single_test(App.qualify_for_level_7)
+                self.run_single_test(App.qualify_for_level_8)
+                self.run_single_test(App.qualify_for_level_9)
+
+            # The verdict of --max-level-check, which the exit code also tells
+            level = lib_package_linter.max_level_check
+            if level is not None:
+                if blockers := lib_package_linter.level_unreachable():
+                    _print(
+                        f" Level {level} can't be reached, because of the "
+                        f"{'/'.join(blockers)} reports"
+                    )
+                else:
+                    _print(f" Level {level} can still be reached, as far as the linter can tell")
 
-        # These are meant to be the last stuff running, they are based on
-        # previously computed errors/warning/successes
-        self.run_single_test(App.qualify_for_level_7)
-        self.run_single_test(App.qualify_for_level_8)
-        self.run_single_test(App.qualify_for_level_9)
+        emit_summary(
+            {"app": self.manifest["id"], "commit": self.linted_commit}
+            | {level: len(reports) for level, reports in tests_reports.items()}
+            | {"level": self.level()}
+        )
 
         if is_json_output():
-            print(
-                json.dumps(
-                    {
-                        "success": [test for test, _ in tests_reports["success"]],
-                        "info": [test for test, _ in tests_reports["info"]],
-                        "warning": [test for test, _ in tests_reports["warning"]],
-                        "error": [test for test, _ in tests_reports["error"]],
-                        "critical": [test for test, _ in tests_reports["critical"]],
-                    },
-                    indent=4,
-                )
-            )
-            return
+            print(json.dumps(json_report(), indent=4))
+            return 1 if lib_package_linter.level_unreachable() else 0
 
-        if tests_reports["error"] or tests_reports["critical"]:
-            sys.exit(1)
+        failed = tests_reports["error"] or tests_reports["critical"]
+        return 1 if failed or lib_package_linter.level_unreachable() else 0
+
+    def level(self) -> int | None:
+        """
+        The highest level the results of the linter allow, the CI tests having the
+        final say. None when the linter didn't run everything needed to tell.
+        """
+        if "AppCatalog" not in lib_package_linter.profile.suites:
+            return None
+        # Level 5 requires no error from the linter
+        if tests_reports["critical"] or tests_reports["error"]:
+            return 4
+
+        successes = {test.split(".")[-1] for test, _ in tests_reports["success"]}
+        level = 6
+        for next_level in [7, 8, 9]:
+            if f"qualify_for_level_{next_level}" not in successes:
+                break
+            level = next_level
+        return level
 
     def qualify_for_level_7(self) -> Generator[ReportSuccess, None, None]:
 
@@ -372,7 +340,7 @@ class App(TestSuite):
     #                                       #
     #########################################
 
-    @test()
+    @test(inputs=["LICENSE", "README.md", "scripts/*"], optional_inputs=True)
     def mandatory_scripts(self) -> TestResult:
         filenames = (
             "LICENSE",
@@ -394,7 +362,7 @@ class App(TestSuite):
             if "File containing the license of your package" in license_content:
                 yield ReportError("You should put an actual license in LICENSE...")
 
-    @test()
+    @test(inputs=["doc/**/*"], optional_inputs=True)
     def doc_dir(self) -> TestResult:
 
         if not (self.path / "doc").exists():
@@ -415,10 +383,11 @@ class App(TestSuite):
             )
 
         if (self.path / "doc" / "screenshots").exists():
-            du_output = subprocess.check_output(
-                ["du", "-sb", self.path / "doc" / "screenshots"], shell=False
+            screenshots_size = sum(
+                file.stat().st_size
+                for file in (self.path / "doc" / "screenshots").rglob("*")
+                if file.is_file()
             )
-            screenshots_size = int(du_output.split()[0])
             if screenshots_size > 1024 * 1000:
                 yield ReportWarning(
                     "Please keep the content of doc/screenshots under ~512Kb. Having screenshots "
@@ -434,7 +403,7 @@ class App(TestSuite):
 
             for file in (self.path / "doc" / "screenshots").rglob("*"):
                 filename = file.name
-                if Path.is_dir(file):
+                if file.is_dir():
                     continue
                 if filename == "example.jpg":
                     yield ReportWarning(
@@ -453,7 +422,7 @@ class App(TestSuite):
                     )
                     break
 
-    @test()
+    @test(inputs=["doc/**/*"])
     def doc_dir_v2(self) -> TestResult:
 
         if (self.path / "doc").exists() and not (self.path / "doc" / "DESCRIPTION.md").exists():
@@ -508,15 +477,14 @@ class App(TestSuite):
                 "with the corresponding 'foobar' setting."
             )
 
-    @test()
+    @test(inputs=["doc/**/*"], manifest=["id"])
     def admin_has_to_finish_install(self) -> TestResult:
 
         # Mywebapp has a legit use case for this
         if self.manifest.get("id") == "my_webapp":
             return
 
-        cmd = f"grep -q -IhEr '__DB_PWD__' '{self.path}/doc/'"
-        if (self.path / "doc").exists() and subprocess.call(cmd, shell=True) == 0:
+        if grep("__DB_PWD__", self.path / "doc"):
             yield ReportWarning(
                 "(doc folder) It looks like this app requires the admin to finish the install "
                 "by entering DB credentials. Unless it's absolutely not easily automatizable, "
@@ -524,32 +492,30 @@ class App(TestSuite):
                 "or (CLI tools provided by the upstream maybe ?)."
             )
 
-    @test()
+    @test(inputs=["doc/**/*"])
     def disclaimer_wording_or_placeholder(self) -> TestResult:
         if (self.path / "doc").exists():
-            cmd = (
-                r"grep -nr -q 'Any known limitations, constrains or stuff not working, such as"
-                rf"\|Other infos that people should be' {self.path}/doc/"
+            regex = (
+                "Any known limitations, constrains or stuff not working, such as"
+                "|Other infos that people should be"
             )
-            if subprocess.call(cmd, shell=True) == 0:
+            if grep(regex, self.path / "doc"):
                 yield ReportWarning(
                     "In DISCLAIMER.md: 'Any known limitations [...] such as' and "
                     "'Other infos [...] such as' are supposed to be placeholder sentences meant "
                     "to explain to packagers what is the expected content, but is not an "
                     "appropriate wording for end users :/"
                 )
-            cmd = rf"grep -nr -q 'This is a dummy\|Ceci est une fausse' {self.path}/doc/"
-            if subprocess.call(cmd, shell=True) == 0:
+            if grep("This is a dummy|Ceci est une fausse", self.path / "doc"):
                 yield ReportWarning(
                     "The doc/ folder seems to still contain some dummy, placeholder messages in "
                     "the .md markdown files. If those files are not useful in the context of your "
                     "app, simply remove them."
                 )
 
-    @test()
+    @test(inputs=["scripts/**/*"])
     def custom_python_version(self) -> TestResult:
-        cmd = f"grep -q -IhEr '^[^#]*install_python' '{self.path}/scripts/'"
-        if subprocess.call(cmd, shell=True) == 0:
+        if grep("^[^#]*install_python", self.path / "scripts"):
             yield ReportWarning(
                 "It looks like this app installs a custom version of Python which is heavily "
                 "discouraged, both because it takes a shitload amount of time to compile Python "
@@ -557,7 +523,7 @@ class App(TestSuite):
                 "gets upgraded to newer Debian versions..."
             )
 
-    @test()
+    @test(inputs=["scripts/change_url"], optional_inputs=True, manifest=["install"])
     def change_url_script(self) -> TestResult:
 
         keyandargs = copy.deepcopy(self.manifest["install"])
@@ -573,7 +539,15 @@ class App(TestSuite):
                 "reached"
             )
 
-    @test()
+    @test(
+        inputs=[
+            "config_panel.json",
+            "config_panel.toml.example",
+            "config_panel.toml",
+            "scripts/config",
+        ],
+        resources=["schemas"],
+    )
     def config_panel(self) -> TestResult:
 
         if not_empty(self.path / "config_panel.json"):
@@ -616,11 +590,11 @@ class App(TestSuite):
 
             yield from validate_schema(
                 "config_panel",
-                json.loads(config_panel_v1_schema()),
+                config_panel_v1_schema(),
                 tomllib.load((self.path / "config_panel.toml").open("rb")),
             )
 
-    @test()
+    @test(inputs=["README.md"], manifest=["id"])
     def badges_in_readme(self) -> TestResult:
 
         id_ = self.manifest["id"]
@@ -652,14 +626,12 @@ class App(TestSuite):
 
     @test()
     def remaining_replacebyyourapp(self) -> TestResult:
-        cmd = f"grep -I -qr 'REPLACEBYYOURAPP' {self.path} 2>/dev/null"
-        if subprocess.call(cmd, shell=True) == 0:
+        if grep("REPLACEBYYOURAPP", self.path):
             yield ReportError("You should replace all occurences of REPLACEBYYOURAPP.")
 
     @test()
     def supervisor_usage(self) -> TestResult:
-        cmd = rf"grep -I -qr '^\s*supervisorctl' {self.path} 2>/dev/null"
-        if subprocess.call(cmd, shell=True) == 0:
+        if grep(r"^\s*supervisorctl", self.path):
             yield ReportWarning(
                 "Please don't rely on supervisor to run services. YunoHost is about "
                 "standardization and the standard is to use systemd units..."
@@ -667,12 +639,17 @@ class App(TestSuite):
 
     @test()
     def bad_encoding(self) -> TestResult:
-        for file in self.path.rglob("**/*"):
-            cmd = ["file", "--mime-encoding", str(file)]
-            encoding = subprocess.check_output(cmd).decode("utf-8").strip().split()[1]
-            if encoding in ["iso-8859-1", "unknown-8bit"]:
+        for file in text_files(self.path):
+            # Text (no NUL byte) which isn't valid utf-8
+            content = file.read_bytes()
+            if b"\0" in content:
+                continue
+            try:
+                content.decode("utf-8")
+            except UnicodeDecodeError:
+                path = relative_path(file, self.path)
                 msg = (
-                    f"{file.relative_to(self.path)} appears to be encoded as latin-1 / iso-8859-1. "
+                    f"{path} appears to be encoded as latin-1 / iso-8859-1. "
                     "Please convert it to utf-8 to avoid funky issues. Something like "
                     "'iconv -f iso-8859-1 -t utf-8 SOURCE > DEST' should do the trick."
                 )
@@ -689,67 +666,45 @@ class App(TestSuite):
     #               |_|                   #
     #######################################
 
-    @test()
+    @test(inputs=["scripts/**/*"])
     def helpers_now_official(self) -> TestResult:
-        cmd = f"grep -IhEro 'ynh_\\w+ *\\( *\\)' '{self.path}/scripts' | tr -d '() '"
-        custom_helpers = (
-            subprocess.check_output(cmd, shell=True).decode("utf-8").strip().split("\n")
-        )
-        custom_helpers = [c.split("__")[0] for c in custom_helpers]
+        custom_helpers = sorted(self.helpers_usage.defined())
 
         for custom_helper in custom_helpers:
             if custom_helper in official_helpers:
-                version = official_helpers[custom_helper] or "?"
+                version = official_helpers[custom_helper].requires or "?"
                 yield ReportInfo(
                     f"{custom_helper} is now an official helper since version '{version}'"
                 )
 
-    @test()
+    @test(inputs=["scripts/install", "scripts/_common.sh"])
     def git_clone_usage(self) -> TestResult:
-        cmd = (
-            f"grep -I 'git clone' '{self.path}'/scripts/install '{self.path}'/scripts/_common.sh "
-            "2>/dev/null"
-            r" | grep -qv 'xxenv\|rbenv\|oracledb'"
-        )
-        if subprocess.call(cmd, shell=True) == 0:
+        scripts = [self.path / "scripts" / "install", self.path / "scripts" / "_common.sh"]
+        if any(not re.search("xxenv|rbenv|oracledb", line) for line in grep("git clone", *scripts)):
             yield ReportWarning(
                 "Using 'git clone' is not recommended... most forge do provide the ability to "
                 "download a proper archive of the code for a specific commit. Please use the "
                 "'sources' resource in the manifest.toml in combination with ynh_setup_source."
             )
 
-    @test()
+    @test(inputs=["scripts/**/*"], manifest=["integration.yunohost"])
     def helpers_version_requirement(self) -> TestResult:
 
-        cmd = f"grep -IhEro 'ynh_\\w+ *\\( *\\)' '{self.path}/scripts' | tr -d '() '"
-        custom_helpers = (
-            subprocess.check_output(cmd, shell=True).decode("utf-8").strip().split("\n")
-        )
-        custom_helpers = [c.split("__")[0] for c in custom_helpers]
+        custom_helpers = self.helpers_usage.defined()
 
         yunohost_version_req = self.manifest.get("integration", {}).get("yunohost", "").strip(">= ")
 
-        cmd = f"grep -IhEro 'ynh_\\w+' '{self.path}/scripts'"
-        helpers_used = subprocess.check_output(cmd, shell=True).decode("utf-8").strip().split("\n")
-        helpers_used = sorted(set(helpers_used))
-
-        manifest_req = [int(i) for i in yunohost_version_req.split(".")] + [0, 0, 0]
+        helpers_used = sorted(self.helpers_usage.called())
 
-        def validate_version_requirement(helper_req: str) -> bool:
-            if helper_req == "":
-                return True
-            helper_req_list = [int(i) for i in helper_req.split(".")]
-            for i in range(len(helper_req_list)):
-                if helper_req_list[i] == manifest_req[i]:
-                    continue
-                return helper_req_list[i] <= manifest_req[i]
-            return True
+        manifest_req = (*parse_version(yunohost_version_req), 0, 0, 0)
 
         for helper in [h for h in helpers_used if h in official_helpers]:
             if helper in custom_helpers:
                 continue
-            helper_req = official_helpers[helper]
-            if not validate_version_requirement(helper_req):
+            helper_req = official_helpers[helper].requires
+            helper_req_version = official_helpers[helper].requires_version
+            # Only compare as many components as the helper requirement has
+            if helper_req_version > manifest_req[: len(helper_req_version)]:
                 major_diff = manifest_req[0] > int(helper_req[0])
                 message = (
                     f"Using official helper {helper} implies requiring at least version "
@@ -757,81 +712,69 @@ class App(TestSuite):
                 )
                 yield ReportError(message) if major_diff else ReportWarning(message)
 
-    @test()
+    @test(
+        inputs=[
+            "scripts/install",
+            "scripts/remove",
+            "scripts/upgrade",
+            "scripts/backup",
+            "scripts/restore",
+        ]
+    )
     def helpers_deprecated_in_v2(self) -> TestResult:
 
-        cmd = (
-            f"grep -IhEro 'ynh_\\w+' '{self.path}/scripts/install' '{self.path}/scripts/remove' "
-            f"'{self.path}/scripts/upgrade' '{self.path}/scripts/backup' "
-            f"'{self.path}/scripts/restore' || true"
+        helpers_used = sorted(
+            self.helpers_usage.called(["install", "remove", "upgrade", "backup", "restore"])
         )
-        helpers_used = subprocess.check_output(cmd, shell=True).decode("utf-8").strip().split("\n")
-        helpers_used = sorted(set(helpers_used))
-
-        deprecated_helpers_in_v2_ = {k: v for k, v in deprecated_helpers_in_v2}
-        deprecated_helpers_in_v2p1_ = {k: v for k, v in deprecated_helpers_in_v2p1}
 
-        for helper in [h for h in helpers_used if h in deprecated_helpers_in_v2_]:
+        for helper in [h for h in helpers_used if h in deprecated_helpers_in_v2]:
             yield ReportWarning(
                 f"Using helper {helper} is deprecated when using packaging v2... "
-                f"It is replaced by: {deprecated_helpers_in_v2_[helper]}"
+                f"It is replaced by: {deprecated_helpers_in_v2[helper]}"
             )
 
-        for helper in [h for h in helpers_used if h in deprecated_helpers_in_v2p1_]:
+        for helper in [h for h in helpers_used if h in deprecated_helpers_in_v2p1]:
             yield ReportWarning(
                 f"Using helper {helper} is now deprecated (assuming you're using packaging "
-                f"v2.1)... It is replaced by: {deprecated_helpers_in_v2p1_[helper]}. Note that a "
+                f"v2.1)... It is replaced by: {deprecated_helpers_in_v2p1[helper]}. Note that a "
                 "PR should have been automatically created via yunohost-bot to help with "
                 "the transition"
             )
 
-    @test()
+    @test(inputs=["scripts/**/*"])
     def helper_consistency_apt_deps(self) -> TestResult:
         """
         Check if ynh_install_app_dependencies is present in install/upgrade/restore
         so dependencies are up to date after restoration or upgrade
         """
 
-        install_script = self.scripts["install"]
-        if install_script.contains("ynh_install_app_dependencies"):
+        scripts_with_deps = self.commands.scripts("ynh_install_app_dependencies")
+        if "install" in scripts_with_deps:
             for name in ["upgrade", "restore"]:
-                if self.scripts[name].exists and not self.scripts[name].contains(
-                    "ynh_install_app_dependencies"
-                ):
+                if self.scripts[name].exists and name not in scripts_with_deps:
                     yield ReportWarning(
                         f"ynh_install_app_dependencies should also be in {name} script"
                     )
 
-        cmd = (
-            f'grep -IhEr "install_extra_app_dependencies" {self.path}/scripts '
-            '| grep -v "key" | grep -q "http://"'
-        )
-        if subprocess.call(cmd, shell=True) == 0:
+        if any(
+            "key" not in line and "http://" in line
+            for line in grep("install_extra_app_dependencies", self.path / "scripts")
+        ):
             yield ReportWarning(
                 "When installing dependencies from extra repository, please include a `--key` "
                 "argument (yes, even if it's official debian repos such as backports - because "
                 "systems like Raspbian do not ship Debian's key by default!"
             )
 
-    @test()
+    @test(
+        inputs=["scripts/install", "scripts/upgrade", "scripts/restore", "scripts/remove"],
+        optional_inputs=True,
+    )
     def helper_consistency_service_add(self) -> TestResult:
 
         occurences = {
-            "install": (
-                self.scripts["install"].occurences("yunohost service add")
-                if self.scripts["install"].exists
-                else []
-            ),
-            "upgrade": (
-                self.scripts["upgrade"].occurences("yunohost service add")
-                if self.scripts["upgrade"].exists
-                else []
-            ),
-            "restore": (
-                self.scripts["restore"].occurences("yunohost service add")
-                if self.scripts["restore"].exists
-                else []
-            ),
+            name: self.commands.lines("yunohost service add", name)
+            for name in ["install", "upgrade", "restore"]
         }
 
         occurences = {
@@ -867,13 +810,14 @@ class App(TestSuite):
                 "relevant anymore"
             )
 
-        if occurences["install"] and not self.scripts["remove"].contains("yunohost service remove"):
+        scripts_removing_services = self.commands.scripts("yunohost service remove")
+        if occurences["install"] and "remove" not in scripts_removing_services:
             yield ReportError(
                 "You used 'yunohost service add' in the install script, "
                 "but not 'yunohost service remove' in the remove script."
             )
 
-    @test()
+    @test(inputs=["scripts/*"])
     def references_to_superold_stuff(self) -> TestResult:
         if any(script.contains("jessie") for script in self.scripts.values() if script.exists):
             yield ReportError(
@@ -909,14 +853,12 @@ class App(TestSuite):
 
     @test()
     def conf_json_persistent_tweaking(self) -> TestResult:
-        cmd = (
-            f"grep -nr '/etc/ssowat/conf.json.persistent' {self.path} "
-            f"| grep -vq '^{self.path}/doc' 2>/dev/null"
-        )
-        if subprocess.call(cmd, shell=True) == 0:
+        # Mentions in the doc are fine
+        paths = [path for path in self.path.iterdir() if not path.name.startswith("doc")]
+        if grep("/etc/ssowat/conf.json.persistent", *paths):
             yield ReportError("Don't do black magic with /etc/ssowat/conf.json.persistent!")
 
-    @test()
+    @test(inputs=["scripts/**/*"])
     def app_data_in_unofficial_dir(self) -> TestResult:
 
         allowed_locations = [
@@ -925,10 +867,12 @@ class App(TestSuite):
             "/home/yunohost.backup",
             "/home/yunohost.multimedia",
         ]
-        cmd = f"grep -IhEro '/home/yunohost[^/ ]*/|/home/\\$app' {self.path}/scripts || true"
-        home_locations = (
-            subprocess.check_output(cmd, shell=True).decode("utf-8").strip().split("\n")
-        )
+        regex = r"/home/yunohost[^/ ]*/|/home/\$app"
+        home_locations = [
+            location
+            for line in grep(regex, self.path / "scripts")
+            for location in re.findall(regex, line)
+        ]
 
         forbidden_locations = set(
             [
@@ -951,8 +895,7 @@ class App(TestSuite):
 
         ldap_flag_in_manifest = self.manifest.get("integration", {}).get("ldap")
 
-        ldap_conf_clue_cmd = rf"grep -qIri '^[^#]*dc=yunohost,\s*dc=org' {self.path}/"
-        ldap_conf_clue = subprocess.call(ldap_conf_clue_cmd, shell=True) == 0
+        ldap_conf_clue = bool(grep(r"^[^#]*dc=yunohost,\s*dc=org", self.path, flags=re.IGNORECASE))
         if ldap_flag_in_manifest is True and ldap_conf_clue is False:
             yield ReportWarning(
                 "The manifest contains 'ldap = true', but it looks like this apps doesn't actually "
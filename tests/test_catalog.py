@@ -6,9 +6,12 @@ import subprocess
 import time
 import tomllib
 from collections.abc import Generator
-from functools import wraps
+from functools import cached_property, wraps
+from pathlib import Path
 from types import ModuleType
 
+from lib import lib_package_linter
+from lib.app_source import Entry, GitStore
 from lib.lib_package_linter import (
     APPS_CACHE,
     PACKAGE_LINTER_DIR,
@@ -20,10 +23,12 @@ from lib.lib_package_linter import (
     ReportWarning,
     TestResult,
     TestSuite,
+    cache_lock,
     get_app_list,
     test,
     urlopen,
 )
+from lib.options import APPS_REPO
 from lib.print import _print
 
 ########################################
@@ -39,6 +44,10 @@ from lib.print import _print
 ########################################
 
 
+# is_long_term_good_quality looks at the past 12 months of the catalog
+CATALOG_HISTORY = datetime.timedelta(days=400)
+
+
 @wraps(subprocess.check_output)
 def git(*args: str, **kwargs) -> str:  # type: ignore[no-untyped-def]  # noqa: ANN003
     cmd = ["git", "-C", str(APPS_CACHE), *args]
@@ -46,63 +55,153 @@ def git(*args: str, **kwargs) -> str:  # type: ignore[no-untyped-def]  # noqa: A
     return str(output).strip()
 
 
-class AppCatalog(TestSuite):
-    def __init__(self, app_id: str) -> None:
-        self.app_id = app_id
-        self.test_suite_name = "Catalog infos"
+def catalog_commits(since: datetime.datetime) -> list[tuple[str, int]]:
+    """
+    The commits of the catalog, most recent first, with their date. A shallow clone is
+    deepened to have the commit the catalog was at at the 'since' date.
+    """
 
-        self._fetch_app_repo()
+    def log() -> list[tuple[str, int]]:
+        lines = git("log", "--format=%H %ct", "main").split("\n")
+        return [(commit, int(date)) for commit, date in (line.split() for line in lines)]
 
-        self.app_list = get_app_list()
+    with cache_lock(APPS_CACHE):
+        commits = log()
+        if (
+            min(date for _, date in commits) <= since.timestamp()
+            or git("rev-parse", "--is-shallow-repository") != "true"
+        ):
+            return commits
+        # The commits since then, and the one before them, i.e. the one at that date
+        timestamp = int(since.timestamp())
+        git("fetch", "--quiet", "--no-tags", f"--shallow-since=@{timestamp}", "origin", "main")
+        if git("rev-parse", "--is-shallow-repository") == "true":
+            git("fetch", "--quiet", "--no-tags", "--deepen=1", "origin", "main")
+        return log()
+
+
+def prefetch_blobs(commits: list[str], blobs: set[str]) -> None:
+    """
+    Fetch at once the blobs the (blobless) clone of the catalog doesn't have yet,
+    rather than one by one as they're read
+    """
+    if not commits:
+        return
+    objects = git("rev-list", "--objects", "--missing=print", "--no-walk", *commits)
+    missing = {line[1:] for line in objects.split("\n") if line.startswith("?")} & blobs
+    if missing:
+        with cache_lock(APPS_CACHE):
+            git(
+                "fetch", "--quiet", "--no-tags", "--no-write-fetch-head", "origin", *sorted(missing)
+            )
 
-        invalid_app = CatalogAppDescr(url="invalid", state="notworking")
-        self.catalog_infos = self.app_list.get(app_id, invalid_app)
 
-    def _fetch_app_repo(self) -> None:
-        flagfile = PACKAGE_LINTER_DIR / ".apps_git_clone_cache"
-        if (
+def fetch_catalog() -> None:
+    """Clone the apps catalog in APPS_CACHE, or update it if it's more than an hour old"""
+    flagfile = PACKAGE_LINTER_DIR / ".apps_git_clone_cache"
+
+    def is_fresh() -> bool:
+        return (
             APPS_CACHE.exists()
             and flagfile.exists()
             and time.time() - flagfile.stat().st_mtime < 3600
-        ):
-            return
+        )
+
+    if is_fresh():
+        return
+
+    with cache_lock(APPS_CACHE):
+        # Unless another process refreshed it while this one waited for the lock
+        if not is_fresh():
+            _refresh_catalog()
+            flagfile.touch()
+
+
+def catalog_url() -> str:
+    repo = lib_package_linter.catalog_repo or APPS_REPO
+    # Cloning from a plain local path ignores --filter and --shallow-since
+    if "://" not in repo and Path(repo).exists():
+        return Path(repo).resolve().as_uri()
+    return repo
+
+
+def _refresh_catalog() -> None:
+    if not APPS_CACHE.exists():
+        # Only the history is_long_term_good_quality looks at, without the
+        # blobs, which are fetched as they're read. Only the top-level files
+        # (i.e. apps.toml) are checked out.
+        since = datetime.datetime.now(tz=datetime.UTC) - CATALOG_HISTORY
+        cmd = [
+            "git",
+            "clone",
+            "--quiet",
+            "--filter=blob:none",
+            f"--shallow-since={since:%Y-%m-%d}",
+            "--single-branch",
+            "--branch=main",
+            "--no-tags",
+            "--sparse",
+            catalog_url(),
+            str(APPS_CACHE),
+        ]
+        subprocess.check_call(cmd)
+    else:
+        if lib_package_linter.catalog_repo:
+            git("remote", "set-url", "origin", catalog_url())
+        # Only the new commits
+        git("fetch", "--quiet", "--no-tags", "origin", "main")
+        git("reset", "origin/main", "--hard", "--quiet")
 
-        if not APPS_CACHE.exists():
-            cmd = ["git", "clone", "https://github.com/YunoHost/apps", str(APPS_CACHE), "--quiet"]
-            subprocess.check_call(cmd)
-        else:
-            git("fetch", "--quiet")
-            git("reset", "origin/main", "--hard", "--quiet")
 
-        flagfile.touch()
+class AppCatalog(TestSuite):
+    # Only depends on the app id and the catalog, which changes on its own: never reused
+    default_inputs = ()
+
+    def __init__(self, app_id: str) -> None:
+        self.app_id = app_id
+        self.test_suite_name = "Catalog infos"
+
+    def prepare(self) -> None:
+        # Loaded beforehand rather than by the first of the tests running concurrently
+        self.catalog_infos  # noqa: B018
+
+    @cached_property
+    def app_list(self) -> dict[str, CatalogAppDescr]:
+        fetch_catalog()
+        return get_app_list()
+
+    @cached_property
+    def catalog_infos(self) -> CatalogAppDescr:
+        invalid_app = CatalogAppDescr(url="invalid", state="notworking")
+        return self.app_list.get(self.app_id, invalid_app)
 
-    @test()
+    @test(resources=["catalog"])
     def is_in_catalog(self) -> TestResult:
         if self.catalog_infos["url"] == "invalid":
             yield ReportCritical("This app is not in YunoHost's application catalog")
 
-    @test()
+    @test(resources=["catalog"])
     def revision_is_HEAD(self) -> TestResult:  # noqa: N802
         if self.catalog_infos.get("revision", "HEAD") != "HEAD":
             yield ReportError(
                 "You should make sure that the revision used in YunoHost's apps catalog is HEAD..."
             )
 
-    @test()
+    @test(resources=["catalog"])
     def state_is_working(self) -> TestResult:
         if self.catalog_infos.get("state", "working") != "working":
             yield ReportError(
                 "The application is not flagged as working in YunoHost's apps catalog"
             )
 
-    @test()
+    @test(resources=["catalog"])
     def has_category(self) -> TestResult:
         if not self.catalog_infos.get("category"):
             yield ReportWarning(
                 "The application has no associated category in YunoHost's apps catalog"
             )
 
-    @test()
+    @test(resources=["catalog", "github"])
     def is_in_github_org(self) -> TestResult:
         repo_org = f"https://github.com/YunoHost-Apps/{self.app_id}_ynh"
         repo_brique = f"https://github.com/labriqueinternet/{self.app_id}_ynh"
@@ -132,7 +231,7 @@ class AppCatalog(TestSuite):
                     "the community to contribute more easily"
                 )
 
-    @test()
+    @test(resources=["catalog"])
     def is_long_term_good_quality(self) -> TestResult:
         #
         # This analyzes the (git) history of apps.json in the past year and
@@ -168,25 +267,35 @@ class AppCatalog(TestSuite):
             count: int,
         ) -> Generator[tuple[datetime.datetime, CatalogAppDescr | None], None, None]:
 
-            for timepoint in list(_time_points_until_today())[(-1 * count) :]:
-                loader: ModuleType
+            timepoints = list(_time_points_until_today())[(-1 * count) :]
+            commits = catalog_commits(timepoints[0])
 
-                # Fetch apps.json content at this date
-                time_str = timepoint.strftime("%b %d %Y")
-                commit = git("rev-list", "-1", f"--before='{time_str}'", "main")
-                try:
-                    git("cat-file", "-e", f"{commit}:apps.json", stderr=subprocess.PIPE)
-                    raw_catalog_at_this_date = git("show", f"{commit}:apps.json")
-                    loader = json
-                except subprocess.CalledProcessError:
-                    try:
-                        git("cat-file", "-e", f"{commit}:apps.toml", stderr=subprocess.PIPE)
-                        raw_catalog_at_this_date = git("show", f"{commit}:apps.toml")
-                        loader = tomllib
-                    except subprocess.CalledProcessError:
-                        msg = "No apps.json/toml at this point in history?"
-                        raise RuntimeError(msg) from None
+            # All the commits are read through a single git process
+            store = GitStore(APPS_CACHE, commits[0][0])
 
+            # The catalog file at each of the time points
+            catalog_files: list[tuple[datetime.datetime, str, str, Entry]] = []
+            roots: dict[str, Entry] = {}
+            for timepoint in timepoints:
+                commit = next((c for c, date in commits if date <= timepoint.timestamp()), None)
+                # Before the catalog even existed
+                if commit is None:
+                    yield (timepoint, None)
+                    continue
+                if commit not in roots:
+                    roots[commit] = store.commit_root(commit)
+                files = store.children(roots[commit])
+                name = next((name for name in ["apps.json", "apps.toml"] if name in files), None)
+                if name is None:
+                    msg = "No apps.json/toml at this point in history?"
+                    raise RuntimeError(msg)
+                catalog_files.append((timepoint, name, commit, files[name]))
+
+            prefetch_blobs(list(roots), {entry.key for _, _, _, entry in catalog_files})
+
+            for timepoint, name, commit, entry in catalog_files:
+                loader: ModuleType = json if name == "apps.json" else tomllib
+                raw_catalog_at_this_date = store.read(entry).decode("utf-8")
                 try:
                     catalog_at_this_date: dict[str, CatalogAppDescr] = loader.loads(
                         raw_catalog_at_this_date
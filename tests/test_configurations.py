@@ -1,15 +1,11 @@
 #!/usr/bin/env python3
 
-import json
 import re
-import subprocess
 import tomllib
 from collections.abc import Generator
-from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
-from packaging import version
-
+from lib.app_source import relative_path
 from lib.lib_package_linter import (
     ReportError,
     ReportInfo,
@@ -17,15 +13,16 @@ from lib.lib_package_linter import (
     TestReport,
     TestResult,
     TestSuite,
+    grep,
     not_empty,
     test,
     tests_v1_schema,
     validate_schema,
 )
-from lib.nginxparser import nginxparser
 from lib.print import _print
 
 if TYPE_CHECKING:
+    from lib.app_source import AppPath
     from tests.test_app import App
 
 
@@ -33,8 +30,12 @@ class Configurations(TestSuite):
     def __init__(self, app: "App") -> None:
 
         self.app = app
+        self.app_path = app.path
         self.test_suite_name = "Configuration files"
 
+    def input_manifest(self) -> dict[str, Any]:
+        return self.app.manifest
+
     ############################
     #    _____             __  #
     #   / ____|           / _| #
@@ -45,7 +46,7 @@ class Configurations(TestSuite):
     #                          #
     ############################
 
-    @test()
+    @test(inputs=["tests.toml"], optional_inputs=True, resources=["schemas"])
     def tests_toml(self) -> TestResult:
         tests_toml_file = self.app.path / "tests.toml"
         if not not_empty(tests_toml_file):
@@ -56,11 +57,11 @@ class Configurations(TestSuite):
         else:
             yield from validate_schema(
                 "tests.toml",
-                json.loads(tests_v1_schema()),
+                tests_v1_schema(),
                 tomllib.load(tests_toml_file.open("rb")),
             )
 
-    @test()
+    @test(inputs=["conf/php-fpm.conf"])
     def encourage_extra_php_conf(self) -> TestResult:
         php_conf = self.app.path / "conf" / "php-fpm.conf"
         if not_empty(php_conf):
@@ -74,7 +75,7 @@ class Configurations(TestSuite):
                 "with --usage/--footprint is legitimately a bit unclear ;))"
             )
 
-    @test()
+    @test(inputs=["sources/*"])
     def misc_source_management(self) -> TestResult:
         source_dir = self.app.path / "sources"
 
@@ -92,9 +93,9 @@ class Configurations(TestSuite):
                 "https://github.com/YunoHost/issues/issues/201#issuecomment-391549262"
             )
 
-    @test()
+    @test(inputs=["conf/*.service"])
     def systemd_config_specific_user(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -139,9 +140,9 @@ class Configurations(TestSuite):
                     "commands it can use!)"
                 )
 
-    @test()
+    @test(inputs=["conf/*.service"])
     def systemd_config_harden_security(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -150,18 +151,14 @@ class Configurations(TestSuite):
             if not file.name.endswith(".service"):
                 continue
 
-            cmd = rf"grep -Eqi '^\s*Environment=.*(pass|secret|key)' '{file}'"
-            if subprocess.call(cmd, shell=True) == 0:
+            if grep(r"^\s*Environment=.*(pass|secret|key)", file, flags=re.IGNORECASE):
                 yield ReportError(
                     "Systemd configurations are world-readable and should not contain cleartext "
                     "password/secrets T_T"
                 )
 
             matches = ["CapabilityBoundingSet", "Protect.*", "SystemCallFilter", "PrivateTmp"]
-            if any(
-                subprocess.call(rf"grep -q '^\s{match}=' '{file}'", shell=True) != 0
-                for match in matches
-            ):
+            if any(not grep(rf"^\s{match}=", file) for match in matches):
                 yield ReportInfo(
                     "You are encouraged to harden the security of the systemd configuration "
                     f"{file.name}. You can have a look at "
@@ -169,9 +166,9 @@ class Configurations(TestSuite):
                     " for a baseline."
                 )
 
-    @test()
+    @test(inputs=["conf/php*.conf"])
     def php_config_specific_user(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -202,9 +199,9 @@ class Configurations(TestSuite):
                     "user for this app!"
                 )
 
-    @test()
+    @test(inputs=["conf/nginx.conf"])
     def nginx_http_host(self) -> TestResult:
-        nginx_conf: Path = self.app.path / "conf" / "nginx.conf"
+        nginx_conf: AppPath = self.app.path / "conf" / "nginx.conf"
         if not nginx_conf.exists():
             return
 
@@ -214,9 +211,9 @@ class Configurations(TestSuite):
                 "In nginx.conf : please don't use $http_host but $host instead. C.f. https://github.com/yandex/gixy/blob/master/docs/en/plugins/hostspoofing.md"
             )
 
-    @test()
+    @test(inputs=["conf/*nginx*"])
     def nginx_https_redirect(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -234,14 +231,14 @@ class Configurations(TestSuite):
                     "Yunohost-behind-reverse-proxy use case)"
                 )
 
-    @test()
+    @test(inputs=["conf/*nginx*"])
     def misc_nginx_add_header(self) -> TestResult:
         #
         # Analyze nginx conf
         # - Deprecated usage of 'add_header' in nginx conf
         # - Spot path traversal issue vulnerability
         #
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -259,9 +256,9 @@ class Configurations(TestSuite):
                     "and https://github.com/openresty/headers-more-nginx-module#more_set_headers )"
                 )
 
-    @test()
+    @test(inputs=["conf/*nginx*"])
     def misc_nginx_more_set_headers(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -290,9 +287,9 @@ class Configurations(TestSuite):
                         f"\nOffending line(s) [{lines}]"
                     )
 
-    @test()
+    @test(inputs=["conf/*nginx*"])
     def misc_nginx_check_regex_in_location(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -301,16 +298,15 @@ class Configurations(TestSuite):
             if not file.is_file() or "nginx" not in file.name:
                 continue
 
-            cmd = f'grep -q -IhEro "location ~ __PATH__" {file}'
-            if subprocess.call(cmd, shell=True) == 0:
+            if grep("location ~ __PATH__", file):
                 yield ReportWarning(
                     "When using regexp in the nginx location field (location ~ __PATH__), start "
                     "the path with ^ (location ~ ^__PATH__)."
                 )
 
-    @test()
+    @test(inputs=["conf/*nginx*"])
     def misc_nginx_path_traversal(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -374,6 +370,9 @@ class Configurations(TestSuite):
                         ):
                             yield location
 
+            # Importing the parser builds its grammar, which is slow
+            from lib.nginxparser import nginxparser  # noqa: PLC0415
+
             try:
                 nginxconf: list[Any] = nginxparser.load(file.open())
             except Exception as e:
@@ -389,9 +388,9 @@ class Configurations(TestSuite):
                     "  https://github.com/YunoHost/example_ynh/blob/main/conf/nginx.conf"
                 )
 
-    @test()
+    @test(inputs=["conf/nginx.conf"])
     def nginx_uwsgi(self) -> TestResult:
-        nginx_conf: Path = self.app.path / "conf" / "nginx.conf"
+        nginx_conf: AppPath = self.app.path / "conf" / "nginx.conf"
         if not nginx_conf.exists():
             return
 
@@ -404,8 +403,14 @@ class Configurations(TestSuite):
                 "to, for example, a gunicorn-based architecture with regular proxy_pass instead."
             )
 
-    @test()
+    # Also warns about the sso flag when there's no nginx conf at all
+    @test(
+        inputs=["conf/*nginx*"],
+        optional_inputs=True,
+        manifest=["integration.yunohost", "integration.sso"],
+    )
     def tests_nginx_reverse_proxy_params_and_sso_consistency(self) -> TestResult:
+        from packaging import version  # noqa: PLC0415
 
         yunohost_version_req = (
             self.app.manifest.get("integration", {}).get("yunohost", "").strip(">= ")
@@ -416,7 +421,7 @@ class Configurations(TestSuite):
         ):
             return
 
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -429,37 +434,33 @@ class Configurations(TestSuite):
             if not file.is_file() or "nginx" not in file.name:
                 continue
 
-            cmd = rf"grep -Iq '^\s*proxy_pass\s\|^\s*fastcgi_pass\s' '{file}'"
-            has_reverse_proxy_statement = subprocess.call(cmd, shell=True) == 0
-
-            cmd = (
-                rf"grep -Iq '^\s*include\s*proxy_params_no_auth;"
-                rf"\|^\s*include\s*fastcgi_params_no_auth;' '{file}'"
+            has_reverse_proxy_statement = bool(grep(r"^\s*proxy_pass\s|^\s*fastcgi_pass\s", file))
+            include_params_no_auth = bool(
+                grep(
+                    r"^\s*include\s*proxy_params_no_auth;|^\s*include\s*fastcgi_params_no_auth;",
+                    file,
+                )
             )
-            include_params_no_auth = subprocess.call(cmd, shell=True) == 0
-
-            cmd = (
-                rf"grep -Iq '^\s*include\s*proxy_params_with_auth;"
-                rf"\|^\s*include\s*fastcgi_params_with_auth;' '{file}'"
+            include_params_with_auth = bool(
+                grep(
+                    r"^\s*include\s*proxy_params_with_auth;"
+                    r"|^\s*include\s*fastcgi_params_with_auth;",
+                    file,
+                )
             )
-            include_params_with_auth = subprocess.call(cmd, shell=True) == 0
 
             if include_params_with_auth:
                 include_params_with_auth_at_last_in_one_conf = True
 
-            manual_reverse_proxy_params = (
-                subprocess.check_output(
-                    rf"grep -IhrEo '^\s*(proxy_set_header|fastcgi_param)\s+[a-zA-Z_-]+\s+.*;' "
-                    rf"'{file}' | sed -E -e 's/^\s*proxy_set_header\s*//g' -e "
-                    rf"'s/^\s*fastcgi_param\s+//g' -e 's/\s+/ /g' -e 's/;.*//g' | sort | uniq",
-                    shell=True,
-                )
-                .decode()
-                .strip()
-            )
-            manual_reverse_proxy_params_list = (
-                manual_reverse_proxy_params.split("\n") if manual_reverse_proxy_params else []
-            )
+            # The parameters set manually, as '<name> <value>'
+            manual_reverse_proxy_params = set()
+            regex = r"^\s*(proxy_set_header|fastcgi_param)\s+[a-zA-Z_-]+\s+.*;"
+            for line in grep(regex, file):
+                param = re.sub(r"^\s*proxy_set_header\s*", "", line)
+                param = re.sub(r"^\s*fastcgi_param\s+", "", param)
+                param = re.sub(r";.*", "", re.sub(r"\s+", " ", param))
+                manual_reverse_proxy_params.add(param)
+            manual_reverse_proxy_params_list = sorted(manual_reverse_proxy_params)
             manual_reverse_proxy_params_dict = {
                 i.split(" ")[0]: i.split(" ")[1] for i in manual_reverse_proxy_params_list
             }
@@ -587,9 +588,9 @@ class Configurations(TestSuite):
                 "suggest maybe it does?"
             )
 
-    @test()
+    @test(inputs=["conf/**/*"])
     def bind_public_ip(self) -> TestResult:
-        conf_dir: Path = self.app.path / "conf"
+        conf_dir: AppPath = self.app.path / "conf"
         if not conf_dir.exists():
             return
 
@@ -606,16 +607,19 @@ class Configurations(TestSuite):
                 yield ReportWarning(f"Can't open/read {file}: {e}")
                 continue
 
+            path = relative_path(file, self.app.path)
             for number, line in enumerate(content.split("\n"), 1):
                 comment = ("#", "//", ";", "/*", "*")
                 if ("0.0.0.0" in line or "::" in line) and not line.strip().startswith(comment):
                     for ip in re.split(r"[ \t,='\"(){}\[\]]", line):
                         if ip == "::" or ip.startswith("0.0.0.0"):
                             yield ReportInfo(
-                                f"{file.relative_to(self.app.path)}:{number}: "
+                                f"{path}:{number}: "
                                 "Binding to '0.0.0.0' or '::' can result in a security issue "
                                 "as the reverse proxy and the SSO can be bypassed by knowing "
                                 "a public IP (typically an IPv6) and the app port. "
                                 "Please be sure that this behavior is intentional. "
-                                "Maybe use '127.0.0.1' or '::1' instead."
+                                "Maybe use '127.0.0.1' or '::1' instead.",
+                                path=path,
+                                line=number,
                             )
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
-import json
 
+from lib.github_issues import repo_issues
 from lib.lib_package_linter import (
     CatalogAppDescr,
     ReportError,
@@ -11,18 +11,21 @@ from lib.lib_package_linter import (
     get_app_list,
     report_warning_not_reliable,
     test,
-    urlopen,
 )
 
 
 class Issues(TestSuite):
+    # Only depends on the app id and GitHub, which changes on its own: never reused
+    default_inputs = ()
+
     def __init__(self, app: str) -> None:
         self.app = app
         self.test_suite_name = "Issues"
 
+    def prepare(self) -> None:
         self.app_list = get_app_list()
         invalid_app = CatalogAppDescr(url="invalid", state="notworking")
-        repo_url = self.app_list.get(app, invalid_app)["url"]
+        repo_url = self.app_list.get(self.app, invalid_app)["url"]
         # init blank in case lines below fail
         self.issues: list[dict] = []  # type: ignore[type-arg]  # ty: ignore[missing-type-argument]
         if "github.com" not in repo_url:
@@ -32,18 +35,17 @@ class Issues(TestSuite):
             )
             return
         repo = repo_url.replace("https://github.com/", "")
-        issues_uri = f"https://api.github.com/repos/{repo}/issues?state=open"
 
-        code, issues_result = urlopen(issues_uri)
+        code, issues = repo_issues(repo)
         if 200 <= code < 300:
-            self.issues = json.loads(issues_result)
+            self.issues = issues
         else:
             report_warning_not_reliable(
                 f"Can't check if there are any blocking issues pending got {code} error."
             )
             return
 
-    @test()
+    @test(resources=["issues"])
     def issue_marked_as_linter_error(self) -> TestResult:
         issues = [
             f"#{issue['number']} : {issue['title']}"
@@ -59,7 +61,7 @@ class Issues(TestSuite):
                 f"{issues_str}"
             )
 
-    @test()
+    @test(resources=["issues"])
     def issue_marked_as_linter_warning(self) -> TestResult:
         issues = [
             f"#{issue['number']} : {issue['title']}"
@@ -75,7 +77,7 @@ class Issues(TestSuite):
                 f"{issues_str}"
             )
 
-    @test()
+    @test(resources=["issues"])
     def small_bug(self) -> TestResult:
         ignored_labels = {
             "wontfix",
@@ -1,13 +1,12 @@
 #!/usr/bin/env python3
 
 import copy
-import json
 import re
 import sys
 import tomllib
 from collections.abc import Callable
-from pathlib import Path
 
+from lib.app_source import AppPath
 from lib.lib_package_linter import (
     Color,
     ReportCritical,
@@ -73,9 +72,12 @@ VERSION_PATTERN = r"""
 
 
 class Manifest(TestSuite):
-    def __init__(self, path: Path) -> None:
+    default_inputs = ("manifest.toml",)
+
+    def __init__(self, path: AppPath) -> None:
 
         self.path = path
+        self.app_path = path
         self.test_suite_name = "manifest"
 
         manifest_path = path / "manifest.toml"
@@ -270,7 +272,7 @@ class Manifest(TestSuite):
         if not self.manifest.get("upstream", {}).get("license"):
             yield ReportError("Missing 'license' key in the upstream section")
 
-    @test()
+    @test(resources=["spdx"])
     def license(self) -> TestResult:
 
         # Turns out there may be multiple licenses... (c.f. Seafile)
@@ -555,6 +557,6 @@ class Manifest(TestSuite):
                 "permission to have the app ready to be accessed right after installation."
             )
 
-        @test()
-        def manifest_schema(self: "Manifest") -> TestResult:
-            yield from validate_schema("manifest", json.loads(manifest_v2_schema()), self.manifest)
+    @test(resources=["schemas"])
+    def manifest_schema(self) -> TestResult:
+        yield from validate_schema("manifest", manifest_v2_schema(), self.manifest)
@@ -3,24 +3,26 @@
 import re
 import shlex
 import statistics
-import subprocess
 from collections.abc import Generator
-from pathlib import Path
+from functools import cached_property
 
+from lib.app_source import AppPath
 from lib.lib_package_linter import (
     ReportCritical,
     ReportError,
     ReportInfo,
     ReportWarning,
+    TestFn,
+    TestOptions,
     TestResult,
     TestSuite,
+    grep,
     not_empty,
     report_warning_not_reliable,
     test,
 )
 from lib.print import _print
 
-
 ##################################
 #   _____           _       _    #
 #  / ____|         (_)     | |   #
@@ -31,34 +33,70 @@ from lib.print import _print
 #                    | |         #
 #                    |_|         #
 ##################################
+FUNCTION_DEFINITION_RE = re.compile(
+    r"^(?:function\s+([\w:.-]+)\s*(?:\(\s*\))?|([\w:.-]+)\s*\(\s*\))\s*(?:\{.*)?$"
+)
+
+
+def command_name(token: str) -> str:
+    """The name of the command token may be, e.g. foo for $(foo or foo;"""
+    return token.lstrip("$(`").rstrip(")`;")
+
+
 class Script(TestSuite):
-    def __init__(self, app: Path, name: str, app_id: str) -> None:
+    default_inputs = ("scripts/{name}",)
+    # The _common.sh of the app, whose functions the script may call
+    common: "Script | None" = None
+
+    def __init__(self, app: AppPath, name: str, app_id: str) -> None:
         self.name = name
         self.app = app
+        self.app_path = app
         self.app_id = app_id
         self.path = app / "scripts" / name
         self.exists = not_empty(self.path)
         if not self.exists:
             return
-        self.lines = list(self.read_file())
+        # The parsed lines, the line number in the file where each of them starts,
+        # and the lines joined back once and for all for contains() and co.
+        self.line_numbers, self.lines = [], []
+        for lineno, line in self.read_file():
+            self.line_numbers.append(lineno)
+            self.lines.append(line)
+        self.joined_lines = [" ".join(line) for line in self.lines]
         self.test_suite_name = "scripts/" + self.name
 
-    def read_file(self) -> Generator[list[str], None, None]:
-        lines = self.path.open().readlines()
+    def cache_key(self, testfn: TestFn, options: TestOptions, files: list[AppPath]) -> str:  # type: ignore[type-arg]
+        # Some tests also depend on the app id
+        return f"{super().cache_key(testfn, options, files)}-{self.app_id}"
+
+    def read_file(self) -> Generator[tuple[int, list[str]], None, None]:
+        """Yield the parsed lines, along with the number of the line they start at"""
+        lines = list(enumerate(self.path.open().readlines(), 1))
 
         # Remove trailing spaces, empty lines and comment lines
-        lines = [line.strip() for line in lines]
-        lines = [line for line in lines if line and not line.startswith("#")]
+        lines = [(lineno, line.strip()) for lineno, line in lines]
+        lines = [(lineno, line) for lineno, line in lines if line and not line.startswith("#")]
 
         # Merge lines when ending with \
-        lines = "\n".join(lines).replace("\\\n", "").split("\n")
+        merged_lines: list[tuple[int, str]] = []
+        continued: tuple[int, str] | None = None
+        for lineno, line in lines:
+            start, merged = (
+                (lineno, line) if continued is None else (continued[0], continued[1] + line)
+            )
+            continued = (start, merged[:-1]) if merged.endswith("\\") else None
+            if continued is None:
+                merged_lines.append((start, merged))
+        if continued is not None:
+            merged_lines.append((continued[0], continued[1] + "\\"))
 
         some_parsing_failed = False
 
-        for line in lines:
+        for lineno, line in merged_lines:
             try:
                 splitted_line = shlex.split(line, comments=True)
-                yield splitted_line
+                yield lineno, splitted_line
             except Exception as e:
                 ignore_pattern = [
                     "/etc/cron",
@@ -85,24 +123,101 @@ class Script(TestSuite):
 
                 report_warning_not_reliable(f"{e} : {line}")
 
+    @cached_property
+    def functions(self) -> dict[str, range]:
+        """Functions defined in the script -> indexes of their lines in self.lines"""
+        functions = {}
+        current, start, depth, opened = None, 0, 0, False
+        for i, line in enumerate(self.lines):
+            if current is None:
+                match = FUNCTION_DEFINITION_RE.match(" ".join(line))
+                if not match:
+                    continue
+                current, start, depth, opened = match.group(1) or match.group(2), i, 0, False
+            # The lines have been unquoted, so only consider the braces where they
+            # can delimit a block, and not e.g. in echo "{"
+            opens = line[0] == "{" or (i == start and "{" in line)
+            closes = line[0] in ("}", "};") or (opens and len(line) > 1 and line[-1] in ("}", "};"))
+            depth += opens - closes
+            opened = opened or opens
+            if opened and depth <= 0:
+                functions[current] = range(start, i + 1)
+                current = None
+        return functions
+
+    @cached_property
+    def call_graph(self) -> dict[str, set[str]]:
+        """Functions defined in the script -> functions of the script they call"""
+        return {
+            function: {
+                command_name(token)
+                for i in lines
+                # Not the name of the function itself on its definition line
+                for token in self.lines[i][1 if i == lines.start else 0 :]
+                if command_name(token) in self.functions
+            }
+            for function, lines in self.functions.items()
+        }
+
+    def reachable_functions(self, functions: set[str]) -> set[str]:
+        """The functions, and the functions they (indirectly) call"""
+        reached: set[str] = set()
+        to_visit = list(functions)
+        while to_visit:
+            function = to_visit.pop()
+            if function not in reached:
+                reached.add(function)
+                to_visit.extend(self.call_graph.get(function, ()))
+        return reached
+
+    @cached_property
+    def expanded_lines(self) -> list[str]:
+        """
+        The lines of the script, followed by the lines of the functions of
+        _common.sh it (indirectly) calls. Each function is included once no
+        matter how many times it's called, to keep this linear.
+        """
+        common = self.common
+        if common is None or not common.exists:
+            return self.joined_lines
+        called = {
+            command_name(token)
+            for line in self.lines
+            for token in line
+            if command_name(token) in common.functions
+        }
+        return self.joined_lines + [
+            common.joined_lines[i]
+            for function in sorted(common.reachable_functions(called))
+            for i in common.functions[function]
+        ]
+
     def occurences(self, command: str) -> list[str]:
-        return [line for line in [" ".join(line) for line in self.lines] if command in line]
+        return [line for line in self.joined_lines if command in line]
 
-    def contains(self, command: str) -> bool:
+    def contains(self, command: str, *, expand: bool = False) -> bool:
         """
         Iterate on lines to check if command is contained in line
 
         For instance, "app setting" is contained in "yunohost app setting $app..."
+
+        With expand, also look into the functions of _common.sh called by the script
+        (the test should then declare scripts/_common.sh as an input)
         """
-        return any(command in line for line in [" ".join(line) for line in self.lines])
+        lines = self.expanded_lines if expand else self.joined_lines
+        return any(command in line for line in lines)
 
-    def containsregex(self, regex: str) -> bool:
+    def containsregex(self, regex: str, *, expand: bool = False) -> bool:
         """
         Iterate on lines to check if command is contained in line
 
         For instance, "app setting" is contained in "yunohost app setting $app..."
+
+        With expand, also look into the functions of _common.sh called by the script
+        (the test should then declare scripts/_common.sh as an input)
         """
-        return any(re.search(regex, line) for line in [" ".join(line) for line in self.lines])
+        lines = self.expanded_lines if expand else self.joined_lines
+        return any(re.search(regex, line) for line in lines)
 
     @test()
     def error_handling(self) -> TestResult:
@@ -182,8 +297,7 @@ class Script(TestSuite):
 
     @test(only=["install"])
     def deprecated_YNH_APP_ARG(self) -> TestResult:  # noqa: N802
-        cmd = f"grep 'YNH_APP_ARG' '{self.path}' | grep -vq 'YNH_APP_ARG_PASSWORD'"
-        if subprocess.call(cmd, shell=True) == 0:
+        if any("YNH_APP_ARG_PASSWORD" not in line for line in grep("YNH_APP_ARG", self.path)):
             yield ReportWarning(
                 "Using the YNH_APP_ARG_ syntax is deprecated and will be removed in the future. "
                 "(Except for password-type question which is a specific case). Questions are "
@@ -193,11 +307,8 @@ class Script(TestSuite):
 
     @test(only=["install", "upgrade"])
     def deprecated_replace_string(self) -> TestResult:
-        cmd1 = f"grep -Ec 'ynh_replace_string' '{self.path}' || true"
-        cmd2 = f"grep -Ec 'ynh_replace_string.*__\\w+__' '{self.path}' || true"
-
-        count1 = int(subprocess.check_output(cmd1, shell=True).decode("utf-8").strip())
-        count2 = int(subprocess.check_output(cmd2, shell=True).decode("utf-8").strip())
+        count1 = len(grep("ynh_replace_string", self.path))
+        count2 = len(grep(r"ynh_replace_string.*__\w+__", self.path))
 
         if count2 > 0 or count1 >= 5:
             yield ReportInfo(
@@ -208,15 +319,13 @@ class Script(TestSuite):
     @test()
     def bad_if_syntax(self) -> TestResult:
 
-        cmd = (
-            r"grep -Po '\[\s*\!?\s*"
-            '"'
-            r"?(\$\(|`).*(\)|`)"
-            '"'
-            rf"?\s\](\s*)(;?(\s*then\s*)$|\s*&&|\s*$)' '{self.path}' "
-            rf"| grep -v ' == \| != \| = ' || true"
-        )
-        res = subprocess.check_output(cmd, shell=True).decode("utf-8").strip()
+        regex = r'\[\s*\!?\s*"?(\$\(|`).*(\)|`)"?\s\](\s*)(;?(\s*then\s*)$|\s*&&|\s*$)'
+        res = "\n".join(
+            match.group(0)
+            for line in grep(regex, self.path)
+            for match in re.finditer(regex, line)
+            if not any(operator in match.group(0) for operator in [" == ", " != ", " = "])
+        ).strip()
         if res:
             yield ReportWarning(
                 "Syntaxes like « if [ $(cmd) ] » is pretty much a nonsense in bash and probably "
@@ -228,11 +337,8 @@ class Script(TestSuite):
 
     @test()
     def bad_ynh_exec_syntax(self) -> TestResult:
-        cmd = (
-            f'grep -q -IhEro "ynh_exec_(err|warn|warn_less|quiet|fully_quiet) '
-            f'(\\"|\').*(\\"|\')$" {self.path}'
-        )
-        if subprocess.call(cmd, shell=True) == 0:
+        regex = r"ynh_exec_(err|warn|warn_less|quiet|fully_quiet) (\"|').*(\"|')$"
+        if grep(regex, self.path):
             yield ReportWarning(
                 "(Requires Yunohost 4.3) When using ynh_exec_*, please don't wrap your command "
                 "between quotes (typically DONT write ynh_exec_warn_less 'foo --bar --baz')"
@@ -240,8 +346,7 @@ class Script(TestSuite):
 
     @test()
     def ynh_setup_source_keep_with_absolute_path(self) -> TestResult:
-        cmd = f'grep -q -IhEro "ynh_setup_source.*keep.*install_dir" {self.path}'
-        if subprocess.call(cmd, shell=True) == 0:
+        if grep("ynh_setup_source.*keep.*install_dir", self.path):
             yield ReportInfo(
                 "The --keep option of ynh_setup_source expects relative paths, not absolute "
                 "path... you do not need to prefix everything with '$install_dir' in the "
@@ -400,7 +505,7 @@ class Script(TestSuite):
 
         systemctl_enable = [
             line
-            for line in [" ".join(line) for line in self.lines]
+            for line in self.joined_lines
             if re.search(r"^\s*systemctl.*(enable|disable)", line)
         ]
 
@@ -412,9 +517,7 @@ class Script(TestSuite):
     @test()
     def quiet_wget(self) -> TestResult:
 
-        wget_cmds = [
-            line for line in [" ".join(line) for line in self.lines] if re.search(r"^wget ", line)
-        ]
+        wget_cmds = [line for line in self.joined_lines if re.search(r"^wget ", line)]
 
         if any(" -q " not in cmd and "--quiet" not in cmd and "2>" not in cmd for cmd in wget_cmds):
             message = "Please redirect wget's stderr to stdout with 2>&1 to avoid unecessary "
@@ -431,7 +534,7 @@ class Script(TestSuite):
                 " domain=$1...) Instead, use 'name=$YNH_APP_ARG_NAME'"
             )
 
-    @test(only=["install"])
+    @test(only=["install"], inputs=["scripts/_common.sh"])
     def sources_list_tweaking(self) -> TestResult:
         common_sh = self.app / "scripts" / "_common.sh"
         if self.contains("/etc/apt/sources.list") or (
@@ -445,9 +548,11 @@ class Script(TestSuite):
                 "need to install dependencies from a custom apt repo."
             )
 
-    @test()
+    @test(inputs=["scripts/{name}", "scripts/_common.sh"])
     def firewall_consistency(self) -> TestResult:
-        if self.contains("yunohost firewall allow") and not self.contains("--needs_exposed_ports"):
+        if self.contains("yunohost firewall allow") and not self.contains(
+            "--needs_exposed_ports", expand=True
+        ):
             yield ReportInfo(
                 "You used 'yunohost firewall allow' to expose a port on the outside but did not "
                 "use 'yunohost service add' with '--needs_exposed_ports'... If you are ABSOLUTELY "
@@ -457,7 +562,9 @@ class Script(TestSuite):
                 "keep the damn port closed !"
             )
 
-        if self.contains("Configuring firewall") and not self.contains("yunohost firewall allow"):
+        if self.contains("Configuring firewall") and not self.contains(
+            "yunohost firewall allow", expand=True
+        ):
             yield ReportWarning(
                 "Some message is talking about 'Configuring firewall' but there's no mention of "
                 "'yunohost firewall allow'... If you're only finding an available port for "
@@ -483,23 +590,25 @@ class Script(TestSuite):
         # Dirty hack to check only the 10 last lines for ssowatconf
         # (the "bad" practice being using this at the very end of the script, but some apps
         # legitimately need this in the middle of the script)
-        oldlines = list(self.lines)
-        self.lines = self.lines[-10:]
-        if self.contains("yunohost app ssowatconf"):
+        # (Not touching self.lines since other tests may be running concurrently)
+        last_lines = self.joined_lines[-10:]
+
+        def contains(command: str) -> bool:
+            return any(command in line for line in last_lines)
+
+        if contains("yunohost app ssowatconf"):
             yield ReportWarning(
                 "You probably don't need to run 'yunohost app ssowatconf' in the app self. "
                 "It's supposed to be ran automatically after the script."
             )
 
         if self.name not in ["change_url", "restore"]:  # noqa: SIM102
-            if self.contains("ynh_systemd_action --service_name=nginx --action=reload"):
+            if contains("ynh_systemd_action --service_name=nginx --action=reload"):
                 yield ReportWarning(
                     "You should not need to reload nginx at the end of the script... it's already "
                     "taken care of by ynh_add_nginx_config"
                 )
 
-        self.lines = oldlines
-
     @test()
     def sed(self) -> TestResult:
         if self.containsregex(r"sed\s+(-i|--in-place)\s+(-r\s+)?s") or self.containsregex(
@@ -556,9 +665,9 @@ class Script(TestSuite):
                 "'ynh_string_random'"
             )
 
-    @test(only=["install"])
+    @test(only=["install"], inputs=["scripts/{name}", "scripts/_common.sh"])
     def progression(self) -> TestResult:
-        if not self.contains("ynh_script_progression"):
+        if not self.contains("ynh_script_progression", expand=True):
             yield ReportWarning(
                 "Please add a few messages for the user using 'ynh_script_progression' "
                 "to explain what is going on (in friendly, not-too-technical terms) "
@@ -643,11 +752,19 @@ class Script(TestSuite):
 
     @test()
     def helpers_sourcing_after_official(self) -> TestResult:
-        helpers_after_official = subprocess.check_output(
-            f"head -n 30 '{self.path}' | grep -A 10 '^ *source */usr/share/yunohost/helpers' "
-            "| grep '^ *source ' | tail -n +2",
-            shell=True,
-        ).decode("utf-8")
+        # The 'source' lines among the 10 lines following the sourcing of the
+        # official helpers, in the first 30 lines of the script
+        head = self.path.read_text().split("\n")[:30]
+        following = sorted(
+            {
+                index
+                for start, line in enumerate(head)
+                if re.search(r"^ *source */usr/share/yunohost/helpers", line)
+                for index in range(start, min(start + 11, len(head)))
+            }
+        )
+        sourcing = [head[index] for index in following if re.search("^ *source ", head[index])]
+        helpers_after_official = "".join(f"{line}\n" for line in sourcing[1:])
         helpers_after_official = (
             helpers_after_official.replace("source", "").replace(" ", "").strip()
         )
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import subprocess
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from lib.app_source import open_app, relative_path
+from lib.lib_package_linter import reset_reports, set_profile
+from lib.options import Profile
+from tests.test_app import App
+
+
+def test_zip_with_prefixed_members(tmp_path: Path) -> None:
+    archive = tmp_path / "app.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("./manifest.toml", 'id = "foo"\n')
+        zip_file.writestr("./scripts/install", "#!/bin/bash\n")
+        zip_file.writestr("/conf/nginx.conf", "location / {}\n")
+
+    app = open_app(archive)
+
+    assert (app / "manifest.toml").read_text() == 'id = "foo"\n'
+    assert (app / "scripts" / "install").read_text() == "#!/bin/bash\n"
+    assert (app / "conf" / "nginx.conf").read_text() == "location / {}\n"
+
+
+MANIFEST = """packaging_format = 2
+id = "foo"
+name = "Foo"
+description.en = "Foo"
+version = "1.0~ynh1"
+maintainers = []
+
+[upstream]
+license = "MIT"
+
+[integration]
+yunohost = ">= 11.2"
+helpers_version = "2.1"
+architectures = "all"
+multi_instance = true
+ldap = false
+sso = false
+disk = "50M"
+ram.build = "50M"
+ram.runtime = "50M"
+
+[install]
+
+[resources]
+"""
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.check_output(["git", "-C", str(repo), *args], text=True).strip()
+
+
+def test_git_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    for variable in ["GIT_AUTHOR", "GIT_COMMITTER"]:
+        monkeypatch.setenv(f"{variable}_NAME", "Test")
+        monkeypatch.setenv(f"{variable}_EMAIL", "test@example.org")
+    repo = tmp_path / "foo_ynh"
+    (repo / "scripts").mkdir(parents=True)
+    (repo / "manifest.toml").write_text(MANIFEST)
+    (repo / "scripts" / "install").write_text("#!/bin/bash\n")
+    _git(repo, "init", "--quiet")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "--quiet", "-m", "v1")
+    _git(repo, "tag", "v1")
+    commit = _git(repo, "rev-parse", "HEAD")
+    # Neither the later commits nor the working tree are linted
+    (repo / "scripts" / "remove").write_text("#!/bin/bash\n")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "--quiet", "-m", "v2")
+    (repo / "manifest.toml").write_text(MANIFEST.replace('id = "foo"', 'id = "bar"'))
+
+    app = open_app(repo, "v1")
+
+    files = sorted(relative_path(file, app) for file in app.rglob("*") if file.is_file())
+    assert files == ["manifest.toml", "scripts/install"]
+    assert (app / "manifest.toml").read_text() == MANIFEST
+    assert (app / "scripts").is_dir()
+    assert not (app / "scripts" / "remove").exists()
+
+    set_profile(Profile(suites=frozenset(["Manifest", "Script", "App"]), offline=True))
+    try:
+        linted = App(app)
+        linted.analyze()
+    finally:
+        set_profile("full")
+        reset_reports()
+    assert linted.manifest["id"] == "foo"
+    assert linted.linted_commit == commit
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import json
+from pathlib import Path
+
+from lib.batch import app_key, load_costs, merge, shard_apps, write_results
+
+COUNT = 4
+APPS = [Path(f"apps/app{i:02d}_ynh") for i in range(23)]
+
+
+def test_shards_partition_the_apps() -> None:
+    shards = [shard_apps(APPS, index, COUNT, {}) for index in range(1, COUNT + 1)]
+
+    # Each app in exactly one shard
+    assert sorted(app for shard in shards for app in shard) == sorted(APPS)
+    # Whatever the order the apps are given in
+    assert shards == [shard_apps(APPS[::-1], index, COUNT, {}) for index in range(1, COUNT + 1)]
+    # As many apps in each, all being average
+    assert sorted(len(shard) for shard in shards) == [5, 6, 6, 6]
+
+
+def test_shards_balanced_by_costs(tmp_path: Path) -> None:
+    # One app takes as long as all the others together
+    timings = tmp_path / "last.json"
+    elapsed = {app_key(app): 1.0 for app in APPS[1:]} | {app_key(APPS[0]): 22.0}
+    write_results(timings, {key: {"elapsed_s": s} for key, s in elapsed.items()})
+    costs = load_costs(timings)
+    assert costs == elapsed
+
+    # Otherwise split in halves
+    assert sorted(len(shard_apps(APPS, index, 2, {})) for index in [1, 2]) == [11, 12]
+    shards = [shard_apps(APPS, index, 2, costs) for index in [1, 2]]
+    assert sorted(shards, key=len) == [[APPS[0]], APPS[1:]]
+
+
+def _shard(path: Path, apps: list[str], shard: list[int], version: str = "v1") -> Path:
+    data = {"linter_version": version, "shard": shard, "apps": {app: {} for app in apps}}
+    path.write_text(json.dumps(data))
+    return path
+
+
+def test_merge(tmp_path: Path) -> None:
+    files = [
+        _shard(tmp_path / "1.json", ["b", "a"], [1, 2]),
+        _shard(tmp_path / "2.json", ["c"], [2, 2]),
+    ]
+    results, problems = merge(files)
+    assert list(results) == ["a", "b", "c"]
+    assert problems == []
+
+
+def test_merge_problems(tmp_path: Path) -> None:
+    files = [
+        _shard(tmp_path / "1.json", ["a"], [1, 3]),
+        _shard(tmp_path / "1bis.json", ["a"], [1, 3], version="v2"),
+    ]
+    assert merge(files)[1] == [
+        "The shards were linted by different linter versions: ['v1', 'v2']",
+        "Missing shards: 2/3, 3/3",
+        "Duplicated shards: 1/3",
+    ]
+
+    files = [
+        _shard(tmp_path / "1.json", ["a"], [1, 2]),
+        _shard(tmp_path / "2.json", ["b"], [2, 3]),
+    ]
+    assert merge(files)[1] == ["The shards are out of different numbers of shards: [2, 3]"]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import datetime as dt
+import os
+import subprocess
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from lib.lib_package_linter import set_catalog_repo
+from tests import test_catalog
+from tests.test_catalog import _refresh_catalog, catalog_commits, git
+
+NOW = dt.datetime.now(tz=dt.UTC)
+
+
+def _commit(work: Path, days_ago: int) -> None:
+    date = f"@{int((NOW - dt.timedelta(days=days_ago)).timestamp())} +0000"
+    (work / "apps.toml").write_text(f'[foo]\nurl = "https://example.org/{days_ago}"\n')
+    env = {"GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}
+    subprocess.check_call(["git", "-C", str(work), "add", "apps.toml"])
+    cmd = ["git", "-C", str(work), "commit", "--quiet", "-m", f"{days_ago} days ago"]
+    subprocess.check_call(cmd, env=os.environ | env)
+    subprocess.check_call(["git", "-C", str(work), "push", "--quiet", "origin", "main"])
+
+
+@pytest.fixture
+def work(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """A clone of a bare catalog repository, whose commits are pushed to it"""
+    for variable in ["GIT_AUTHOR", "GIT_COMMITTER"]:
+        monkeypatch.setenv(f"{variable}_NAME", "Test")
+        monkeypatch.setenv(f"{variable}_EMAIL", "test@example.org")
+    bare = tmp_path / "apps.git"
+    subprocess.check_call(["git", "init", "--quiet", "--bare", "--initial-branch=main", str(bare)])
+    # c.f. the README
+    subprocess.check_call(["git", "-C", str(bare), "config", "uploadpack.allowFilter", "true"])
+    work = tmp_path / "work"
+    subprocess.check_call(["git", "clone", "--quiet", str(bare), str(work)])
+    subprocess.check_call(["git", "-C", str(work), "checkout", "--quiet", "-b", "main"])
+
+    monkeypatch.setattr(test_catalog, "APPS_CACHE", tmp_path / ".apps")
+    set_catalog_repo(str(bare))
+    yield work
+    set_catalog_repo(None)
+
+
+def _dates() -> list[int]:
+    """How many days ago the commits of the clone are, most recent first"""
+    subjects = git("log", "--format=%s", "main").split("\n")
+    return [int(subject.split()[0]) for subject in subjects]
+
+
+def test_refresh_catalog(work: Path) -> None:
+    for days_ago in [700, 600, 500, 300, 100, 10]:
+        _commit(work, days_ago)
+
+    # Only the history looked at, without the files
+    _refresh_catalog()
+    assert git("rev-parse", "--is-shallow-repository") == "true"
+    assert git("config", "remote.origin.partialclonefilter") == "blob:none"
+    assert _dates() == [10, 100, 300]
+    # The files of the past commits are fetched when read (c.f. prefetch_blobs)
+    objects = git("rev-list", "--objects", "--missing=print", "main").split("\n")
+    assert sum(line.startswith("?") for line in objects) == 2
+
+    # Deepened up to the commit the catalog was at at that date
+    commits = catalog_commits(NOW - dt.timedelta(days=550))
+    assert len(commits) == 5
+    assert _dates() == [10, 100, 300, 500, 600]
+
+    # Only the new commit
+    _commit(work, 0)
+    _refresh_catalog()
+    assert _dates() == [0, 10, 100, 300, 500, 600]
+    assert (work.parent / ".apps" / "apps.toml").read_text().endswith('/0"\n')
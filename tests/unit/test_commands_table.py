@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from lib.commands_table import normalized_commands
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "yunohost service add $app --log /var/log/$app.log",
+        "yunohost --quiet service add $app",
+        "yunohost -q service add $app",
+        "yunohost --output-as none service add $app",
+        "yunohost --debug --timeout 30 service add $app",
+        "ynh_exec_warn_less yunohost -q service add $app",
+    ],
+)
+def test_yunohost_global_options(line: str) -> None:
+    assert "yunohost service add" in normalized_commands(line.split())
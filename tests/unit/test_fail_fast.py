@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from lib import lib_package_linter
+from lib.app_source import open_app
+from lib.lib_package_linter import reset_reports, set_stop_on
+from tests import test_catalog, test_issues
+from tests.test_app import App
+
+
+@pytest.fixture(autouse=True)
+def _reset() -> Iterator[None]:
+    yield
+    reset_reports()
+    set_stop_on([])
+
+
+def test_no_network_once_verdict_known(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    app_path = tmp_path / "foo_ynh"
+    (app_path / "scripts").mkdir(parents=True)
+    # The mandatory fields are missing: critical
+    (app_path / "manifest.toml").write_text('packaging_format = 2\nid = "foo"\n')
+
+    def offline(*_: object) -> None:
+        msg = "the network shouldn't be needed"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(test_catalog, "fetch_catalog", offline)
+    monkeypatch.setattr(test_issues, "repo_issues", offline)
+    set_stop_on(["critical"])
+
+    App(open_app(app_path)).analyze()
+
+    assert lib_package_linter.verdict_known.is_set()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import json
+import re
+import threading
+import urllib.parse
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, ClassVar
+
+import pytest
+
+from lib.github_issues import SEARCH_MAX_RESULTS, fetch_repo_issues, search_issues
+from lib.lib_package_linter import set_github_api
+
+REPO = "YunoHost-Apps/foo_ynh"
+
+
+def _issue(number: int) -> dict[str, Any]:
+    labels = [
+        label
+        for label, every in [("bug", 2), ("linter error", 5), ("help", 3)]
+        if not number % every
+    ]
+    issue = {
+        "number": number,
+        "title": f"Issue {number}",
+        "url": f"https://api.github.com/repos/{REPO}/issues/{number}",
+        "repository_url": f"https://api.github.com/repos/{REPO}",
+        "labels": [{"name": label} for label in labels],
+    }
+    if not number % 7:
+        issue["pull_request"] = {}
+    return issue
+
+
+# 250 open issues and PRs, most recent first
+ISSUES = [_issue(number) for number in range(250, 0, -1)]
+# The issues (not the PRs) having any of the labels the Issues suite looks at
+EXPECTED = [
+    number for number in range(250, 0, -1) if number % 7 and not (number % 2 and number % 5)
+]
+
+
+class MockAPI(BaseHTTPRequestHandler):
+    requests: ClassVar[list[str]] = []
+    # Whether the search queries overflow even when narrowed to a single label
+    overflow_all = False
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        self.requests.append(url.path)
+        page, per_page = int(params["page"]), int(params["per_page"])
+
+        if url.path == f"/repos/{REPO}/issues":
+            items: Any = ISSUES[(page - 1) * per_page : page * per_page]
+        elif url.path == "/search/issues":
+            query = re.search(r'label:((?:"[^"]+",?)+)', params["q"])
+            assert query is not None
+            labels = re.findall(r'"([^"]+)"', query.group(1))
+            # Past the limit when asked for several labels at once
+            overflow = self.overflow_all or len(labels) > 1
+            matching = [
+                issue
+                for issue in ISSUES
+                if "pull_request" not in issue
+                and any(label["name"] in labels for label in issue["labels"])
+            ]
+            items = {
+                "total_count": SEARCH_MAX_RESULTS + 1 if overflow else len(matching),
+                "incomplete_results": False,
+                "items": matching[(page - 1) * per_page : page * per_page],
+            }
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(items).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture(autouse=True)
+def api() -> Iterator[type[MockAPI]]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockAPI)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    set_github_api(f"http://127.0.0.1:{server.server_address[1]}")
+    MockAPI.requests = []
+    MockAPI.overflow_all = False
+    yield MockAPI
+    set_github_api(None)
+    server.shutdown()
+
+
+def test_fetch_repo_issues(api: type[MockAPI]) -> None:
+    code, issues = fetch_repo_issues(REPO)
+
+    assert code == 200
+    assert [issue["number"] for issue in issues] == EXPECTED
+    # 3 pages
+    assert len(api.requests) == 3
+
+
+def test_search_issues(api: type[MockAPI]) -> None:
+    issues = search_issues([REPO])
+
+    assert [issue["number"] for issue in issues[REPO.lower()]] == EXPECTED
+    # The query for all the labels overflows, then one query per label, the bugs taking 2 pages
+    assert len(api.requests) == 1 + 2 + 1 + 1
+
+
+def test_search_issues_overflow(api: type[MockAPI], capsys: pytest.CaptureFixture[str]) -> None:
+    api.overflow_all = True
+
+    assert search_issues([REPO]) == {}
+    assert "Couldn't prefetch the issues of the apps of yunohost-apps" in capsys.readouterr().out
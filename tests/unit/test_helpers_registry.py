@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+from pathlib import Path
+
+from lib.helpers_registry import index_helpers
+
+HELPERS = """\
+# Install the dependencies
+#
+# Requires YunoHost version 2.6.4 or higher.
+ynh_install_app_dependencies() {
+    true
+}
+
+# Remove the dependencies
+#
+# [deprecated] Use the apt resource instead
+ynh_remove_app_dependencies() {
+    true
+}
+
+# Find a free port, the deprecated ports being skipped
+ynh_find_port() {
+    true
+}
+
+# Get the values of the config panel
+ynh_app_config_get() {
+    true
+}
+"""
+
+
+def test_index_helpers(tmp_path: Path) -> None:
+    helpers_dir = tmp_path / "helpers.v2.1.d"
+    helpers_dir.mkdir()
+    (helpers_dir / "apt").write_text(HELPERS)
+
+    helpers = index_helpers(tmp_path)["helpers"]
+
+    assert helpers["ynh_install_app_dependencies"]["requires"] == "2.6.4"
+    assert helpers["ynh_install_app_dependencies"]["helpers_versions"] == ["2.1"]
+    assert helpers["ynh_remove_app_dependencies"]["deprecated"]
+    # Only mentioning the word doesn't make a helper deprecated
+    assert not helpers["ynh_find_port"]["deprecated"]
+    # The config panel helpers may be overridden by the apps
+    assert "ynh_app_config_get" not in helpers
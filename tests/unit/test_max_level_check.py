@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+from collections.abc import Iterator
+
+import pytest
+
+from lib.lib_package_linter import (
+    ReportWarning,
+    level_unreachable,
+    reset_reports,
+    set_max_level_check,
+    tests_reports,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset() -> Iterator[None]:
+    yield
+    reset_reports()
+    set_max_level_check(None)
+
+
+def test_warnings_only() -> None:
+    tests_reports["warning"].append(("Script.foo", ReportWarning("Don't do that")))
+
+    # Level 7 requires not even a warning
+    set_max_level_check(7)
+    assert level_unreachable() == ["warning"]
+    set_max_level_check(6)
+    assert level_unreachable() == []
+    set_max_level_check(None)
+    assert level_unreachable() == []
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lib.print import _print, section
+
+JOBS = 8
+
+
+def test_concurrent_sections(capsys: pytest.CaptureFixture[str]) -> None:
+    # The suites are all within their section when the other thread prints
+    in_sections = threading.Barrier(JOBS + 1)
+    printed = threading.Event()
+
+    def suite(i: int) -> None:
+        with section():
+            _print(f"{i} start")
+            in_sections.wait()
+            printed.wait()
+            _print(f"{i} end")
+
+    def outside() -> None:
+        in_sections.wait()
+        _print("outside")
+        printed.set()
+
+    with ThreadPoolExecutor(JOBS + 1) as executor:
+        futures = [executor.submit(suite, i) for i in range(JOBS)]
+        futures.append(executor.submit(outside))
+        for future in futures:
+            future.result()
+
+    lines = capsys.readouterr().out.splitlines()
+    # Written right away rather than within one of the sections
+    assert lines[0] == "outside"
+    # Each section is written at once
+    sections = [lines[i : i + 2] for i in range(1, len(lines), 2)]
+    assert sorted(sections) == sorted([f"{i} start", f"{i} end"] for i in range(JOBS))
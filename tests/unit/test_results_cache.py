@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from lib.results_cache import PACKAGE_LINTER_DIR, files_digest
+
+DIGEST = """
+from lib.lib_package_linter import code_digest
+
+def test(files):
+    if any(file.startswith("doc/") for file in files):
+        return {"a", "b", "c"}
+
+print(code_digest(test.__code__))
+"""
+
+
+def test_code_digest_across_processes() -> None:
+    # The nested code objects are at other addresses, and the sets hashed otherwise
+    digests = {
+        subprocess.check_output(
+            [sys.executable, "-c", DIGEST],
+            cwd=PACKAGE_LINTER_DIR,
+            env=os.environ | {"PYTHONHASHSEED": str(seed)},
+            text=True,
+        )
+        for seed in range(3)
+    }
+    assert len(digests) == 1
+
+
+def test_files_digest(tmp_path: Path) -> None:
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "package_linter.py").write_text("")
+    helpers = tmp_path / "lib" / "official_helpers.json"
+    helpers.write_text("{}")
+    digest = files_digest(tmp_path)
+
+    # Not part of the linter
+    (tmp_path / "README.md").write_text("")
+    assert files_digest(tmp_path) == digest
+
+    helpers.write_text('{"ynh_foo": {}}')
+    assert files_digest(tmp_path) != digest
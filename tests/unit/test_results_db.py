@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import time
+from contextlib import closing
+from pathlib import Path
+
+from lib.batch import failed_result, store_results
+from lib.results_db import connect, regressions
+
+
+def _result(app: str, level: int, started_at: float) -> dict[str, object]:
+    reports = [
+        {
+            "suite": "manifest",
+            "test": f"Manifest.test_{i}",
+            "type": "warning" if i % 2 else "success",
+            "message": "...",
+            "path": "manifest.toml",
+            "line": i,
+            "elapsed_s": 0.001,
+        }
+        for i in range(20)
+    ]
+    return {
+        "id": app,
+        "level": level,
+        "commit": "0" * 40,
+        "time": started_at,
+        "elapsed_s": 1.5,
+        "reports": reports,
+    }
+
+
+def test_store_catalog_run(tmp_path: Path) -> None:
+    db_path = tmp_path / "results.db"
+    week_ago = time.time() - 7 * 24 * 3600
+    store_results(
+        db_path, {f"apps/app{i}_ynh": _result(f"app{i}", 8, week_ago) for i in range(500)}, "1"
+    )
+
+    now = time.time()
+    results = {f"apps/app{i}_ynh": _result(f"app{i}", 6 if i < 3 else 8, now) for i in range(500)}
+    results["apps/broken_ynh"] = failed_result(ValueError("oops"))
+    start = time.monotonic()
+    store_results(db_path, results, "2")
+    assert time.monotonic() - start < 1
+
+    with closing(connect(db_path)) as db:
+        assert db.execute("SELECT count(*) FROM runs").fetchone()[0] == 1000
+        assert db.execute("SELECT count(*) FROM reports").fetchone()[0] == 1000 * 20
+        assert [r.app for r in regressions(db, 7, now - 1)] == ["app0", "app1", "app2"]
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+
+from lib.rule_impact import network_tests, unknown_tests
+
+TESTS = [
+    "Manifest.license",
+    "Manifest.manifest_schema",
+    "Configurations.tests_toml",
+    "Script.bad_if_syntax",
+]
+
+
+def test_network_tests() -> None:
+    assert unknown_tests(TESTS) == []
+    # Skipped by the offline workers, they would never report anything
+    assert network_tests(TESTS) == sorted(TESTS[:3])
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import os
+import time
+from pathlib import Path
+
+from lib.work_queue import CLAIM_TIMEOUT_S, MAX_ATTEMPTS, WorkQueue
+
+
+def _abandon(claim: Path) -> None:
+    stale = time.time() - CLAIM_TIMEOUT_S - 1
+    os.utime(claim, (stale, stale))
+
+
+def test_claim_is_fresh(tmp_path: Path) -> None:
+    queue = WorkQueue(tmp_path / "queue")
+    queue.create([tmp_path / "a" / "foo_ynh"], {})
+    # Queued long ago
+    _abandon(next(queue.todo.iterdir()))
+
+    claim = queue.claim()
+
+    assert claim is not None
+    assert time.time() - claim.stat().st_mtime < CLAIM_TIMEOUT_S
+
+
+def test_given_up_after_max_attempts(tmp_path: Path) -> None:
+    queue = WorkQueue(tmp_path / "queue")
+    apps = [tmp_path / "a" / "foo_ynh", tmp_path / "b" / "foo_ynh"]
+    queue.create(apps, {str(apps[0]): 2.0, str(apps[1]): 1.0})
+
+    for _ in range(MAX_ATTEMPTS):
+        claim = queue.claim()
+        assert claim is not None
+        assert queue.read(claim) == {"app": str(apps[0]), "path": str(apps[0].resolve())}
+        # The worker crashed
+        _abandon(claim)
+    claim = queue.claim()
+    assert claim is not None
+    queue.complete(claim, str(apps[1]), {"level": 6})
+
+    results = queue.results()
+    assert results[str(apps[1])] == {"level": 6}
+    assert "stopped responding 3 times" in results[str(apps[0])]["error"]
+    assert queue.pending() == []
+    assert queue.claim() is None
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Break down the time spent importing the linter (python -X importtime), and
+# check that the heavy modules are only imported on first use, such that
+# short lints don't pay for what they don't run.
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+PACKAGE_LINTER_DIR = Path(__file__).resolve().parent.parent
+
+ENTRY_POINTS = ["package_linter", "tests.test_app"]
+
+# Modules which must not be imported at startup
+LAZY_MODULES = [
+    "jsonschema",
+    "packaging",
+    "pyparsing",
+    "lib.nginxparser.nginxparser",
+    "urllib.request",
+]
+
+# Modules which the command line must not import at startup, such that asking the
+# daemon to lint an app stays cheap
+DAEMON_CLIENT_ENTRY_POINT = "package_linter"
+NOT_IN_DAEMON_CLIENT = ["lib.lib_package_linter", "lib.helpers_registry", "tests.test_app"]
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def import_times(module: str) -> list[ImportTime]:
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    stderr = subprocess.run(
+        cmd, cwd=PACKAGE_LINTER_DIR, capture_output=True, text=True, check=True
+    ).stderr
+
+    # import time: self [us] | cumulative | imported package
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times.append(ImportTime(name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Break down the import time of the linter")
+    parser.add_argument("--top", type=int, default=15, help="Number of modules to show")
+    args = parser.parse_args()
+
+    eager_lazy_modules = False
+    for entry_point in ENTRY_POINTS:
+        times = import_times(entry_point)
+        total = next(t.cumulative_us for t in times if t.module == entry_point)
+        print(f"import {entry_point}: {total / 1000:.1f}ms")
+        for t in sorted(times, key=lambda t: t.cumulative_us, reverse=True)[: args.top]:
+            print(f"  {t.cumulative_us / 1000:8.1f}ms {t.self_us / 1000:8.1f}ms  {t.module}")
+
+        imported = {t.module for t in times}
+        for module in LAZY_MODULES:
+            if module in imported:
+                print(f"  ✘ {module} should only be imported on first use")
+                eager_lazy_modules = True
+        if entry_point == DAEMON_CLIENT_ENTRY_POINT:
+            for module in NOT_IN_DAEMON_CLIENT:
+                if module in imported:
+                    print(f"  ✘ {module} should only be imported when linting in-process")
+                    eager_lazy_modules = True
+
+    if eager_lazy_modules:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()